@@ -9,4 +9,75 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 300
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
-OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
\ No newline at end of file
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+# Caché de embeddings (data/embed_cache.sqlite): máximo de vectores antes de desalojar
+EMBED_CACHE_MAX_ITEMS = int(os.getenv("EMBED_CACHE_MAX_ITEMS", "50000"))
+
+# Embeddings por lotes: tokens/ítems máximos por request, hilos concurrentes y reintentos
+EMBED_BATCH_MAX_TOKENS = int(os.getenv("EMBED_BATCH_MAX_TOKENS", "100000"))
+EMBED_BATCH_MAX_ITEMS = int(os.getenv("EMBED_BATCH_MAX_ITEMS", "512"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "4"))
+
+# Backend del índice RAG: flat | ivf_flat | ivf_pq | hnsw (ver scripts/bench_index.py)
+RAG_INDEX_TYPE = os.getenv("RAG_INDEX_TYPE", "flat")
+RAG_IVF_NLIST = int(os.getenv("RAG_IVF_NLIST", "0"))      # 0 = automático (~4*sqrt(N))
+RAG_PQ_M = int(os.getenv("RAG_PQ_M", "64"))               # sub-vectores de PQ (8 bits c/u)
+RAG_HNSW_M = int(os.getenv("RAG_HNSW_M", "32"))
+RAG_NPROBE = int(os.getenv("RAG_NPROBE", "8"))            # listas IVF visitadas por consulta
+RAG_EF_SEARCH = int(os.getenv("RAG_EF_SEARCH", "64"))     # frontera de búsqueda HNSW
+# Vectores comprimidos en el índice: none | fp16 | sq8 | pq (los exactos quedan en disco para el rerank)
+RAG_VECTOR_CODEC = os.getenv("RAG_VECTOR_CODEC", "none")
+RAG_EMBED_DIMS = int(os.getenv("RAG_EMBED_DIMS", "0"))    # 0 = dimensión completa del modelo (1536)
+# Proveedor de embeddings: openai | hashing (local, sin red; dimensión EMBED_HASH_DIM)
+EMBED_PROVIDER = os.getenv("EMBED_PROVIDER", "openai")
+EMBED_HASH_DIM = int(os.getenv("EMBED_HASH_DIM", "512"))
+RAG_RERANK = int(os.getenv("RAG_RERANK", "4"))            # candidatos = k * RAG_RERANK; 0/1 = sin rerank
+# Cada cuánto (s) un worker revisa si otro publicó un índice nuevo (data/rag_snapshots/CURRENT)
+RAG_RELOAD_CHECK_S = float(os.getenv("RAG_RELOAD_CHECK_S", "1.0"))
+# Snapshots del índice que se conservan para rollback (data/rag_snapshots)
+RAG_SNAPSHOTS_KEEP = int(os.getenv("RAG_SNAPSHOTS_KEEP", "3"))
+
+# Caché de respuestas del asistente (exacta + semántica)
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "3600"))          # segundos
+ANSWER_CACHE_MAX_ITEMS = int(os.getenv("ANSWER_CACHE_MAX_ITEMS", "1000"))
+ANSWER_CACHE_MIN_SIM = float(os.getenv("ANSWER_CACHE_MIN_SIM", "0.95"))  # coseno mínimo
+
+# Reindexado en segundo plano: espera antes de arrancar para agrupar pedidos seguidos
+RAG_JOB_DEBOUNCE_S = float(os.getenv("RAG_JOB_DEBOUNCE_S", "2.0"))
+RAG_JOB_POLL_S = float(os.getenv("RAG_JOB_POLL_S", "5.0"))   # cada cuánto mira la cola compartida
+
+# Búsqueda RAG: hybrid (BM25 + vectores, RRF) | vector | lexical
+RAG_SEARCH_MODE = os.getenv("RAG_SEARCH_MODE", "hybrid")
+RAG_RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+RAG_LEXICAL_MARGIN = float(os.getenv("RAG_LEXICAL_MARGIN", "1.5"))   # ventaja del 1º para el atajo léxico
+RAG_QUERY_EMBED_TIMEOUT = float(os.getenv("RAG_QUERY_EMBED_TIMEOUT", "5"))  # segundos
+# Contexto del prompt: presupuesto de tokens, candidatos extra (k * factor) para MMR
+# y balance relevancia (1.0) / diversidad (0.0)
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "1200"))
+RAG_CONTEXT_FETCH = int(os.getenv("RAG_CONTEXT_FETCH", "3"))
+RAG_MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.7"))
+
+# Hilos para trabajo bloqueante del chat (OpenAI, FAISS, commits) fuera del event loop
+AI_EXECUTOR_WORKERS = int(os.getenv("AI_EXECUTOR_WORKERS", "16"))
+
+# Parseo de documentos en paralelo (procesos) y tiempo máximo por archivo (segundos)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+INGEST_FILE_TIMEOUT = float(os.getenv("INGEST_FILE_TIMEOUT", "120"))
+# Tamaño de chunk (caracteres) y solape al trocear documentos
+RAG_CHUNK_SIZE = int(os.getenv("RAG_CHUNK_SIZE", "900"))
+RAG_CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", "150"))
+
+# Deduplicación de chunks casi idénticos antes de embeber (MinHash/LSH sobre shingles de 5 palabras)
+RAG_DEDUP = os.getenv("RAG_DEDUP", "1").lower() in ("1", "true", "yes")
+RAG_DEDUP_THRESHOLD = float(os.getenv("RAG_DEDUP_THRESHOLD", "0.9"))   # Jaccard estimado mínimo
+
+# Contadores de KPIs (kpi_contadores): cada cuántos segundos se reconcilian contra las tablas (0 = nunca)
+KPI_RECONCILE_S = float(os.getenv("KPI_RECONCILE_S", "3600"))
+
+# Caché de /analytics/resumen y /analytics/dashboard: TTL fresco, ventana extra en la que se
+# sirve el valor viejo mientras se recalcula en segundo plano, y backend memory | file
+# (file: data/analytics_cache, compartido entre workers de uvicorn)
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "15"))            # segundos (0 = sin caché)
+ANALYTICS_CACHE_STALE = float(os.getenv("ANALYTICS_CACHE_STALE", "60"))        # segundos
+ANALYTICS_CACHE_BACKEND = os.getenv("ANALYTICS_CACHE_BACKEND", "memory")
@@ -4,7 +4,11 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy import text
 
-from .database import engine, Base
+from .database import engine, Base, SessionLocal
+from .services import ventas as ventas_service
+from .services import contadores as contadores_service
+from .services import activos as activos_service
+from .services import rag as rag_service
 
 # Importar modelos con alias (asegura creación de tablas)
 from .models import (
@@ -17,6 +21,9 @@ from .models import (
     token_recuperacion as m_token_recuperacion,
     verificacion as m_verificacion,
     comprobante as m_comprobante,
+    venta_diaria as m_venta_diaria,
+    kpi_contador as m_kpi_contador,
+    actividad_hll as m_actividad_hll,
 )
 
 # Routers HTTP
@@ -55,6 +62,30 @@ def ensure_columns():
         """))
 ensure_columns()
 
+# --- NEW: llenar ventas_diarias y los sketches de usuarios activos la primera vez
+# (después, scripts/backfill_ventas_diarias.py y scripts/backfill_usuarios_activos.py) ---
+def ensure_ventas_diarias():
+    db = SessionLocal()
+    try:
+        ventas_service.backfill_si_vacio(db)
+        activos_service.backfill_si_vacio(db)
+    finally:
+        db.close()
+ensure_ventas_diarias()
+
+# --- NEW: contadores de KPIs: se llenan la primera vez y se reconcilian cada KPI_RECONCILE_S ---
+def ensure_kpi_contadores():
+    db = SessionLocal()
+    try:
+        contadores_service.inicializar(db)
+    finally:
+        db.close()
+    contadores_service.iniciar_reconciliacion()
+ensure_kpi_contadores()
+
+# --- NEW: índice RAG suelto (anterior a los snapshots): se migra una vez, antes de servir búsquedas ---
+rag_service.migrate_legacy_index()
+
 # Montar /media para archivos subidos (comprobantes)
 os.makedirs("media", exist_ok=True)
 app.mount("/media", StaticFiles(directory="media"), name="media")
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, Date, SmallInteger
+from ..database import Base
+
+# --- NEW: sketch HyperLogLog de usuarios activos por día (una fila por registro no vacío) ---
+class ActividadHLL(Base):
+    __tablename__ = "usuarios_activos_hll"
+
+    fecha = Column(Date, primary_key=True)            # día UTC de la actividad
+    registro = Column(Integer, primary_key=True)      # 0 .. 2^p - 1
+    rho = Column(SmallInteger, nullable=False)        # máximo "ceros a la izquierda + 1" visto
@@ -0,0 +1,9 @@
+from sqlalchemy import Column, String, Float
+from ..database import Base
+
+# --- NEW: contadores de KPIs del resumen admin (se mantienen en cada alta/baja/cambio de estado) ---
+class KpiContador(Base):
+    __tablename__ = "kpi_contadores"
+
+    clave = Column(String(60), primary_key=True)          # "usuarios", "pedidos", "pedidos_estado:abierto", ...
+    valor = Column(Float, nullable=False, default=0.0)    # conteos y ventas_totales en la misma columna
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, Date, Float
+from ..database import Base
+
+# --- NEW: rollup de ventas por día (se actualiza al crear cada pedido) ---
+class VentaDiaria(Base):
+    __tablename__ = "ventas_diarias"
+
+    fecha = Column(Date, primary_key=True)                 # día UTC del pedido
+    pedidos = Column(Integer, nullable=False, default=0)   # pedidos creados ese día
+    ingresos = Column(Float, nullable=False, default=0.0)  # SUM(cantidad * precio_unitario)
+    compradores = Column(Integer, nullable=False, default=0)  # usuarios distintos con pedido ese día
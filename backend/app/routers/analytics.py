@@ -1,8 +1,9 @@
 # backend/app/routers/analytics.py
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, cast, Date
-from datetime import datetime, timedelta
+from sqlalchemy import func
+from datetime import date, datetime, timedelta
+from typing import Optional
 
 from ..database import SessionLocal
 from ..utils.seguridad import verificar_admin
@@ -10,8 +11,7 @@ from ..models.usuario import Usuario
 from ..models.producto import Producto
 from ..models.pedido import Pedido
 from ..models.detalle_pedido import DetallePedido
-from ..models.chat import ChatSession
-from ..models.mensaje import ChatMessage
+from ..services import ventas, contadores, activos, analytics_cache
 
 router = APIRouter(prefix="/analytics", tags=["Analytics"])
 
@@ -25,46 +25,48 @@ def get_db():
 # ---------- ENDPOINT QUE ESPERA TU FRONT ----------
 @router.get("/resumen")
 def resumen(_: Usuario = Depends(verificar_admin), db: Session = Depends(get_db)):
-    # KPIs "clásicos"
-    total_usuarios  = db.query(func.count(Usuario.id)).scalar() or 0
-    total_productos = db.query(func.count(Producto.id)).scalar() or 0
-    total_pedidos   = db.query(func.count(Pedido.id)).scalar() or 0
-
-    ventas_totales = (
-        db.query(
-            func.coalesce(func.sum(DetallePedido.cantidad * DetallePedido.precio_unitario), 0.0)
-        )
-        .scalar()
-        or 0.0
-    )
-
-    # pedidos por estado (para el “orders_by_status” del front)
-    pedidos_por_estado = (
-        db.query(Pedido.estado, func.count(Pedido.id))
-        .group_by(Pedido.estado)
-        .all()
+    # una sola lectura de kpi_contadores (se mantienen en cada alta/baja/cambio de estado)
+    return analytics_cache.cached("resumen", contadores.resumen, db)
+
+# --- NEW: estado de los contadores de KPIs y de la caché de analytics; reconciliación manual ---
+@router.get("/contadores")
+def contadores_estado(_: Usuario = Depends(verificar_admin)):
+    return contadores.estado_reconciliacion()
+
+@router.get("/cache")
+def cache_estado(_: Usuario = Depends(verificar_admin)):
+    return analytics_cache.cache_stats()
+
+@router.post("/contadores/reconciliar")
+def contadores_reconciliar(_: Usuario = Depends(verificar_admin), db: Session = Depends(get_db)):
+    """Recalcula los contadores desde las tablas; devuelve los que estaban desviados."""
+    return {"diferencias": contadores.reconciliar(db)}
+
+# --- NEW: consultas agrupadas del dashboard (cantidad fija de sentencias) ---
+IMPORTE = ventas.IMPORTE
+_dia = ventas.dia
+
+def _ingresos(por_dia, d) -> float:
+    fila = por_dia.get(d)
+    return fila.ingresos if fila is not None else 0.0
+
+def _pedidos_con_total(db: Session, *cols, fecha_col=None):
+    """Pedidos con el total de sus detalles en una sola consulta (LEFT JOIN + GROUP BY)."""
+    extra = [fecha_col.label("fecha")] if fecha_col is not None else []
+    return (
+        db.query(Pedido.id, Pedido.usuario_id, Pedido.estado, *extra,
+                 func.coalesce(func.sum(IMPORTE), 0.0).label("total"))
+        .outerjoin(DetallePedido, DetallePedido.pedido_id == Pedido.id)
+        .group_by(Pedido.id, Pedido.usuario_id, Pedido.estado, *cols)
     )
-    pedidos_por_estado = [{"estado": e or "desconocido", "cantidad": c} for (e, c) in pedidos_por_estado]
-
-    # chats/mensajes por si lo usas luego
-    total_chats    = db.query(func.count(ChatSession.id)).scalar() or 0
-    total_mensajes = db.query(func.count(ChatMessage.id)).scalar() or 0
-
-    return {
-        "kpis": {
-            "usuarios":  total_usuarios,
-            "productos": total_productos,
-            "pedidos":   total_pedidos,
-            "ventas_totales": float(ventas_totales),
-            "chats": total_chats,
-            "mensajes": total_mensajes,
-        },
-        "pedidos_por_estado": pedidos_por_estado,
-    }
 
 # ---------- TU DASHBOARD "AVANZADO" (lo dejamos también disponible) ----------
 @router.get("/dashboard")
 def dashboard(_: Usuario = Depends(verificar_admin), db: Session = Depends(get_db)):
+    # varias pestañas admin consultando a la vez: un solo cálculo (TTL + stale-while-revalidate)
+    return analytics_cache.cached("dashboard", _dashboard, db)
+
+def _dashboard(db: Session):
     total_usuarios   = db.query(func.count(Usuario.id)).scalar() or 0
     total_productos  = db.query(func.count(Producto.id)).scalar() or 0
     pendientes = (
@@ -78,92 +80,40 @@ def dashboard(_: Usuario = Depends(verificar_admin), db: Session = Depends(get_d
     day0        = now.date()
     week_start  = (now - timedelta(days=6)).date()
     prev_start  = (now - timedelta(days=13)).date()
-    prev_end    = (now - timedelta(days=7)).date()
 
     fecha_col = getattr(Pedido, "fecha", None) or getattr(Pedido, "creado_en", None)
 
     if fecha_col is None:
-        ventas_semana_total = 0.0
-        weekly_current = [0]*7
-        weekly_prev    = [0]*7
-        last_orders = db.query(Pedido.id, Pedido.usuario_id, Pedido.estado).order_by(Pedido.id.desc()).limit(10).all()
-        orders_rows = []
-        for pid, uid, st in last_orders:
-            total = (
-                db.query(func.coalesce(func.sum(DetallePedido.cantidad * DetallePedido.precio_unitario), 0.0))
-                .filter(DetallePedido.pedido_id == pid)
-                .scalar()
-                or 0.0
-            )
-            orders_rows.append({"id": pid, "cliente_id": uid, "estado": st, "total": float(total), "fecha": None})
+        weekly_current = [0.0]*7
+        weekly_prev    = [0.0]*7
+        last_orders = _pedidos_con_total(db).order_by(Pedido.id.desc()).limit(10).all()
+        orders_rows = [
+            {"id": pid, "cliente_id": uid, "estado": st, "total": float(total), "fecha": None}
+            for pid, uid, st, total in last_orders
+        ]
     else:
-        ventas_semana_total = (
-            db.query(func.coalesce(func.sum(DetallePedido.cantidad * DetallePedido.precio_unitario), 0.0))
-            .join(Pedido, Pedido.id == DetallePedido.pedido_id)
-            .filter(cast(fecha_col, Date) >= week_start)
-            .scalar()
-            or 0.0
-        )
+        # ventas por día de las dos semanas, leídas del rollup ventas_diarias
+        por_dia = ventas.ventas_por_dia(db, prev_start, day0)
+        weekly_current = [float(_ingresos(por_dia, week_start + timedelta(days=i))) for i in range(7)]
+        weekly_prev    = [float(_ingresos(por_dia, prev_start + timedelta(days=i))) for i in range(7)]
 
         orders_today = (
-            db.query(Pedido.id, Pedido.usuario_id, Pedido.estado, fecha_col.label("fecha"))
-            .filter(cast(fecha_col, Date) == day0)
+            _pedidos_con_total(db, fecha_col, fecha_col=fecha_col)
+            .filter(_dia(fecha_col) == day0)
             .order_by(fecha_col.desc())
             .all()
         )
-        orders_rows = []
-        for pid, uid, st, fecha in orders_today:
-            total = (
-                db.query(func.coalesce(func.sum(DetallePedido.cantidad * DetallePedido.precio_unitario), 0.0))
-                .filter(DetallePedido.pedido_id == pid)
-                .scalar()
-                or 0.0
-            )
-            orders_rows.append({
+        orders_rows = [
+            {
                 "id": pid, "cliente_id": uid, "estado": st, "total": float(total),
                 "fecha": fecha.isoformat() if fecha else None
-            })
-
-        days_current = [week_start + timedelta(days=i) for i in range(7)]
-        weekly_current = []
-        for d in days_current:
-            total_d = (
-                db.query(func.coalesce(func.sum(DetallePedido.cantidad * DetallePedido.precio_unitario), 0.0))
-                .join(Pedido, Pedido.id == DetallePedido.pedido_id)
-                .filter(cast(fecha_col, Date) == d)
-                .scalar()
-                or 0.0
-            )
-            weekly_current.append(float(total_d))
-
-        days_prev = [prev_start + timedelta(days=i) for i in range(7)]
-        weekly_prev = []
-        for d in days_prev:
-            total_d = (
-                db.query(func.coalesce(func.sum(DetallePedido.cantidad * DetallePedido.precio_unitario), 0.0))
-                .join(Pedido, Pedido.id == DetallePedido.pedido_id)
-                .filter(cast(fecha_col, Date) == d)
-                .scalar()
-                or 0.0
-            )
-            weekly_prev.append(float(total_d))
-
-    activos_ids = set()
-    if fecha_col is not None:
-        ids_ped = db.query(Pedido.usuario_id).filter(cast(fecha_col, Date) >= week_start).distinct().all()
-        activos_ids.update([uid for (uid,) in ids_ped])
-
-    msj_col = getattr(ChatMessage, "creado_en", None)
-    if msj_col is not None:
-        ids_msg = (
-            db.query(ChatSession.usuario_id)
-            .join(ChatMessage, ChatMessage.sesion_id == ChatSession.id)
-            .filter(cast(msj_col, Date) >= week_start)
-            .distinct()
-            .all()
-        )
-        activos_ids.update([uid for (uid,) in ids_msg])
-    total_activos = len(activos_ids)
+            }
+            for pid, uid, st, fecha, total in orders_today
+        ]
+    ventas_semana_total = sum(weekly_current)
+
+    # HyperLogLog por día (pedidos + chat): unión de 7 sketches, sin traer ids
+    total_activos = activos.estimar(db, week_start, day0)["usuarios"]
 
     def fmt_labels(start):
         return [(start + timedelta(days=i)).strftime("%d/%m") for i in range(7)]
@@ -184,3 +134,19 @@ def dashboard(_: Usuario = Depends(verificar_admin), db: Session = Depends(get_d
             "previous": weekly_prev
         }
     }
+
+# --- NEW: usuarios activos (aproximado, HyperLogLog) para cualquier ventana ---
+@router.get("/usuarios-activos")
+def usuarios_activos(
+    dias: int = Query(7, ge=1, le=366),
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    _: Usuario = Depends(verificar_admin),
+    db: Session = Depends(get_db),
+):
+    """Ventana de los últimos `dias` días (incluye hoy) o [desde, hasta] si se indican."""
+    hasta = hasta or datetime.utcnow().date()
+    desde = desde or hasta - timedelta(days=dias - 1)
+    if desde > hasta:
+        raise HTTPException(status_code=400, detail="'desde' no puede ser posterior a 'hasta'")
+    return activos.estimar(db, desde, hasta)
@@ -4,6 +4,7 @@ from pydantic import BaseModel, conint, confloat
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import List, Optional
+from datetime import datetime
 
 from ..database import SessionLocal
 from ..models.usuario import Usuario
@@ -11,6 +12,7 @@ from ..models.producto import Producto
 from ..models.pedido import Pedido
 from ..models.detalle_pedido import DetallePedido
 from ..utils.seguridad import obtener_usuario_actual, verificar_admin
+from ..services import ventas, contadores, activos, analytics_cache
 
 router = APIRouter(prefix="/pedidos", tags=["Pedidos"])
 
@@ -36,6 +38,12 @@ class PedidoIn(BaseModel):
     detalles: List[DetalleIn]
     total: Optional[confloat(ge=0)] = None  # opcional (calculamos en servidor)
 
+# Estados que maneja el panel admin (frontend/src/pages/admin/Orders.jsx)
+ESTADOS_PEDIDO = ("abierto", "pendiente", "en_proceso", "entregado", "cerrado", "cancelado")
+
+class EstadoIn(BaseModel):
+    estado: str
+
 # ------------------------
 # Crear pedido (cliente autenticado)
 # ------------------------
@@ -64,11 +72,10 @@ def crear_pedido(
         precio = precio_map[d.producto_id]
         total += precio * d.cantidad
 
-    # Crear cabecera
-    ped = Pedido(usuario_id=user.id, total=total, estado="abierto")
+    # Cabecera, detalles y rollup de ventas en una sola transacción
+    ped = Pedido(usuario_id=user.id, total=total, estado="abierto", fecha=datetime.utcnow())
     db.add(ped)
-    db.commit()
-    db.refresh(ped)
+    db.flush()  # asigna ped.id
 
     # Crear detalles usando precios de la BD
     bulk = []
@@ -82,7 +89,11 @@ def crear_pedido(
             )
         )
     db.bulk_save_objects(bulk)
+    ventas.registrar_pedido(db, ped, total)
+    activos.registrar(db, user.id, ped.fecha)
+    contadores.sumar(db, {"pedidos": 1, contadores.clave_estado(ped.estado): 1, "ventas_totales": total})
     db.commit()
+    analytics_cache.invalidar()  # después del commit: el recálculo ya ve el pedido
 
     return {"id": ped.id, "estado": ped.estado, "total": float(ped.total)}
 
@@ -179,4 +190,29 @@ def todos_pedidos_admin(
             "total": float(p.total or 0),
         }
         for p in rows
-    ]
\ No newline at end of file
+    ]
+
+# ------------------------
+# Cambiar estado de un pedido (solo admin)
+# ------------------------
+@router.patch("/{pedido_id}/estado", summary="Actualiza el estado del pedido (admin)")
+def cambiar_estado(
+    pedido_id: int,
+    payload: EstadoIn,
+    _: Usuario = Depends(verificar_admin),
+    db: Session = Depends(get_db),
+):
+    estado = payload.estado.strip().lower()
+    if estado not in ESTADOS_PEDIDO:
+        raise HTTPException(status_code=400, detail=f"Estado inválido. Usa uno de: {', '.join(ESTADOS_PEDIDO)}.")
+
+    p = db.query(Pedido).filter(Pedido.id == pedido_id).with_for_update().first()
+    if not p:
+        raise HTTPException(status_code=404, detail="Pedido no encontrado")
+
+    # el contador por estado se mueve en la misma transacción que el pedido
+    contadores.cambio_estado(db, p.estado, estado)
+    p.estado = estado
+    db.commit()
+    analytics_cache.invalidar()
+    return {"id": p.id, "estado": p.estado, "total": float(p.total or 0)}
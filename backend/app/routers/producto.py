@@ -6,6 +6,7 @@ from ..models.producto import Producto
 from ..models.usuario import Usuario
 from ..schemas.producto import ProductoCrear, ProductoRespuesta
 from ..utils.seguridad import verificar_admin
+from ..services import contadores
 
 router = APIRouter(prefix="/productos", tags=["Productos"])
 
@@ -29,6 +30,7 @@ def crear_producto(
     data = producto.model_dump(mode = "json")
     nuevo = Producto(**data)
     db.add(nuevo)
+    contadores.sumar(db, {"productos": 1})
     db.commit()
     db.refresh(nuevo)
     return nuevo
@@ -86,5 +88,6 @@ def eliminar_producto(
     if not p:
         raise HTTPException(404, "Producto no encontrado")
     db.delete(p)
+    contadores.sumar(db, {"productos": -1})
     db.commit()
     return {"mensaje": "Producto eliminado correctamente"}
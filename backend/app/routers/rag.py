@@ -1,12 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from pathlib import Path
+from typing import Optional
 import os
 
 from ..utils.seguridad import verificar_admin
 from ..models.usuario import Usuario
 
-from ..services.rag import search, compose_context, ensure_loaded, build_index
-from ..services.doc_ingest import collect_chunks
+from ..services.rag import (
+    search_context, ensure_loaded, list_snapshots, rollback, embedder_status, docs_recursive,
+)
+from ..services.context_builder import context_stats
+from ..services.embed_cache import cache_stats
+from ..services.answer_cache import cached_answer, answer_cache_stats
+from ..services.doc_ingest import iter_doc_files
+from ..services.rag_jobs import submit_reindex, get_job, last_job
 from ..services.ai import ask_openai
 
 
@@ -23,21 +30,45 @@ ALLOWED_MIMES = {
 
 @router.get("/status")
 def rag_status():
-    return {"loaded": ensure_loaded()}
+    return {
+        "loaded": ensure_loaded(),
+        "snapshot": next((s["version"] for s in list_snapshots() if s["current"]), None),
+        "embedder": embedder_status(),
+        "context": context_stats(),
+        "embed_cache": cache_stats(),
+        "answer_cache": answer_cache_stats(),
+        "reindex": last_job(),
+    }
 
 
 @router.get("/search")
-def rag_search(q: str, k: int = 4):
+def rag_search(
+    q: str,
+    k: int = 4,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    mode: Optional[str] = None,
+):
     """
     Devuelve hits + respuesta resumida generada por el modelo a partir del contexto.
+    nprobe / ef_search: ajustes de búsqueda para índices IVF / HNSW.
+    mode: hybrid | vector | lexical (por defecto RAG_SEARCH_MODE).
+    context_stats: tokens del contexto y ahorro frente a pegar los k hits tal cual.
     """
-    hits = search(q, top_k=k)
-    context = compose_context(hits)
-    # si hay contexto, que OpenAI genere respuesta resumida
+    try:
+        hits, context, qvec, stats = search_context(q, top_k=k, nprobe=nprobe, ef_search=ef_search, mode=mode)
+    except RuntimeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # si hay contexto, que OpenAI genere respuesta resumida (o se toma de la caché)
     if context.strip():
-        answer = ask_openai([{"role": "user", "content": q}], context=context)
-        return {"query": q, "hits": hits, "context": context, "answer": answer}
-    return {"query": q, "hits": hits, "context": "", "answer": "No se encontró información relevante."}
+        answer, cached = cached_answer(
+            q, context, qvec,
+            lambda: ask_openai([{"role": "user", "content": q}], context=context),
+        )
+        return {"query": q, "hits": hits, "context": context, "context_stats": stats,
+                "answer": answer, "cached": cached}
+    return {"query": q, "hits": hits, "context": "", "context_stats": stats,
+            "answer": "No se encontró información relevante."}
 
 @router.post("/upload")
 @router.post("/upload/")
@@ -71,20 +102,41 @@ def rag_upload(
     return {"guardado": True, "filename": file.filename, "path": str(dest)}
 
 #Reindexar
-@router.post("/reindex")
-@router.post("/reindex/")
-def rag_reindex(_: Usuario = Depends(verificar_admin)):
+@router.post("/reindex", status_code=202)
+@router.post("/reindex/", status_code=202)
+def rag_reindex(full: bool = False, _: Usuario = Depends(verificar_admin)):
     """
-    Reconstruir el índice leyendo TODO lo que haya en backend/docs.
+    Encola un reindexado incremental de backend/docs (solo se embeben archivos nuevos
+    o modificados). Con ?full=true se reconstruye TODO el índice.
+    El avance se consulta en GET /rag/jobs/{id}.
     """
-    chunks = collect_chunks(DOCS_DIR)
-    if not chunks:
+    # mismo recorrido que hará sync_index (con subcarpetas si el índice las incluye)
+    if next(iter_doc_files(DOCS_DIR, docs_recursive()), None) is None:
         raise HTTPException(status_code=400, detail="No hay documentos en backend/docs para indexar.")
-    try:
-        build_index(chunks)
-    except RuntimeError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    return {"ok": True, "chunks": len(chunks)}
+    return {"ok": True, "job": submit_reindex(DOCS_DIR, full=full)}
+
+@router.get("/jobs/{job_id}")
+def rag_job(job_id: str, _: Usuario = Depends(verificar_admin)):
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado.")
+    return job
+
+# Snapshots del índice: listar y volver a uno anterior (sin re-embeber)
+@router.get("/snapshots")
+def rag_snapshots(_: Usuario = Depends(verificar_admin)):
+    return {"snapshots": list_snapshots()}
+
+@router.post("/snapshots/{version}/rollback")
+def rag_rollback(version: str, _: Usuario = Depends(verificar_admin)):
+    """
+    Publica de nuevo un snapshot conservado (RAG_SNAPSHOTS_KEEP). Todos los workers
+    lo toman en su próxima comprobación; el siguiente reindexado parte de él.
+    """
+    snap = rollback(version)
+    if snap is None:
+        raise HTTPException(status_code=404, detail="Snapshot no encontrado.")
+    return {"ok": True, "snapshot": snap}
 
 # CRUD de archivos (listar y eliminar) + reindex tras borrar
 @router.get("/files")
@@ -104,9 +156,7 @@ def rag_delete_file(fname: str, _: Usuario = Depends(verificar_admin)):
 
     p.unlink()
 
-    # Reindexar después del delete
-    chunks = collect_chunks(DOCS_DIR)
-    if chunks:
-        build_index(chunks)
+    # Reindexar después del delete (en segundo plano; solo quita los vectores de ese archivo)
+    job = submit_reindex(DOCS_DIR)
 
-    return {"ok": True, "reindexed": len(chunks)}
+    return {"ok": True, "job": job}
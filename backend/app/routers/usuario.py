@@ -13,6 +13,7 @@ from datetime import datetime, timedelta
 import secrets
 from ..models.verificacion import VerificacionCorreo
 from ..schemas.usuarios_extra import VerificarIn, ReenvioIn
+from ..services import contadores
 
 router = APIRouter(prefix="/usuarios", tags=["Usuarios"])
 
@@ -45,6 +46,7 @@ def registrar_usuario(
         is_verificado=False
     )
     db.add(usuario)
+    contadores.sumar(db, {"usuarios": 1})
     db.commit()
     db.refresh(usuario)
 
@@ -0,0 +1,150 @@
+# backend/app/services/activos.py
+# --- NEW: usuarios activos aproximados con HyperLogLog por día (pedidos + chat) ---
+from __future__ import annotations
+import hashlib
+import math
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..database import dialect_insert
+from ..models.actividad_hll import ActividadHLL
+from ..models.pedido import Pedido
+from ..models.chat import ChatSession
+from ..models.mensaje import ChatMessage
+from .ventas import dia
+
+# 2^12 registros: error estándar 1.04 / sqrt(4096) ≈ 1.6 %. Cambiarlo invalida los sketches guardados.
+P = 12
+M = 1 << P
+ERROR_ESTANDAR = 1.04 / math.sqrt(M)
+
+def _registro(usuario_id: int) -> Tuple[int, int]:
+    """(registro, rho) del usuario: primeros P bits del hash y posición del primer 1 en el resto."""
+    h = int.from_bytes(hashlib.blake2b(str(usuario_id).encode(), digest_size=8).digest(), "big")
+    resto = h & ((1 << (64 - P)) - 1)
+    return h >> (64 - P), (64 - P) - resto.bit_length() + 1
+
+def registrar(db: Session, usuario_id: int, cuando: Optional[datetime] = None) -> None:
+    """
+    Marca al usuario como activo el día de `cuando` (por defecto hoy, UTC). No hace commit:
+    corre en la transacción del pedido o mensaje. Si el registro ya tiene un rho igual o
+    mayor (lo normal para un usuario que ya estuvo activo ese día) no se escribe nada.
+    """
+    fecha = (cuando or datetime.utcnow()).date()
+    registro, rho = _registro(usuario_id)
+    insert = dialect_insert(db)
+    if insert is not None:
+        stmt = insert(ActividadHLL).values(fecha=fecha, registro=registro, rho=rho)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[ActividadHLL.fecha, ActividadHLL.registro],
+            set_={"rho": stmt.excluded.rho},
+            where=ActividadHLL.rho < stmt.excluded.rho,
+        ))
+        return
+    fila = db.get(ActividadHLL, (fecha, registro), with_for_update=True)
+    if fila is None:
+        db.add(ActividadHLL(fecha=fecha, registro=registro, rho=rho))
+    elif fila.rho < rho:
+        fila.rho = rho
+
+def _sigma(x: float) -> float:
+    if x == 1.0:
+        return math.inf
+    y, z = 1.0, x
+    while True:
+        x *= x
+        z_prev, z = z, z + x * y
+        y += y
+        if z == z_prev:
+            return z
+
+def _tau(x: float) -> float:
+    if x == 0.0 or x == 1.0:
+        return 0.0
+    y, z = 1.0, 1.0 - x
+    while True:
+        x = math.sqrt(x)
+        y *= 0.5
+        z_prev, z = z, z - (1.0 - x) ** 2 * y
+        if z == z_prev:
+            return z / 3
+
+def _estimar(registros: Dict[int, int]) -> float:
+    """
+    Estimador "mejorado" de Ertl (2017) sobre el histograma de registros: sin sesgo en
+    todo el rango, sin tablas empíricas ni el salto a linear counting del HLL clásico.
+    """
+    q = 64 - P
+    hist = [0] * (q + 2)
+    for r in registros.values():
+        hist[r] += 1
+    hist[0] = M - len(registros)
+    z = M * _tau(1.0 - hist[q + 1] / M)
+    for k in range(q, 0, -1):
+        z = 0.5 * (z + hist[k])
+    z += M * _sigma(hist[0] / M)
+    return M * M / (2 * math.log(2) * z)
+
+def estimar(db: Session, desde: date, hasta: date) -> Dict:
+    """
+    Usuarios distintos activos en [desde, hasta]: une los sketches diarios con un
+    MAX(rho) por registro (a lo sumo 2^P filas, sin importar el tráfico).
+    """
+    filas = (
+        db.query(ActividadHLL.registro, func.max(ActividadHLL.rho))
+        .filter(ActividadHLL.fecha >= desde, ActividadHLL.fecha <= hasta)
+        .group_by(ActividadHLL.registro)
+        .all()
+    )
+    return {
+        "desde": desde.isoformat(),
+        "hasta": hasta.isoformat(),
+        "usuarios": int(round(_estimar(dict(filas)))) if filas else 0,
+        "error_relativo": round(ERROR_ESTANDAR, 4),   # 1 desvío estándar
+    }
+
+def _pares(db: Session, desde: Optional[date], hasta: Optional[date]) -> Iterable[Tuple[date, int]]:
+    """(día, usuario) distintos de pedidos y mensajes de chat en el rango."""
+    d_ped, d_msg = dia(Pedido.fecha), dia(ChatMessage.creado_en)
+    consultas = [
+        (d_ped, db.query(d_ped, Pedido.usuario_id)),
+        (d_msg, db.query(d_msg, ChatSession.usuario_id)
+                .join(ChatSession, ChatSession.id == ChatMessage.sesion_id)),
+    ]
+    for d, q in consultas:
+        q = q.filter(d.isnot(None))
+        if desde is not None:
+            q = q.filter(d >= desde)
+        if hasta is not None:
+            q = q.filter(d <= hasta)
+        yield from q.distinct()
+
+def backfill(db: Session, desde: Optional[date] = None, hasta: Optional[date] = None) -> int:
+    """
+    Reconstruye los sketches de [desde, hasta] (opcionales, inclusive) desde pedidos y
+    mensajes, y hace commit. Devuelve la cantidad de filas (día, registro) escritas.
+    """
+    sketches: Dict[Tuple[date, int], int] = {}
+    for d, uid in _pares(db, desde, hasta):
+        registro, rho = _registro(uid)
+        key = (d, registro)
+        sketches[key] = max(sketches.get(key, 0), rho)
+
+    borrar = db.query(ActividadHLL)
+    if desde is not None:
+        borrar = borrar.filter(ActividadHLL.fecha >= desde)
+    if hasta is not None:
+        borrar = borrar.filter(ActividadHLL.fecha <= hasta)
+    borrar.delete(synchronize_session=False)
+    db.add_all([ActividadHLL(fecha=d, registro=r, rho=rho) for (d, r), rho in sketches.items()])
+    db.commit()
+    return len(sketches)
+
+def backfill_si_vacio(db: Session, dias: int = 90) -> int:
+    """Primer arranque con la tabla nueva: arma los sketches de los últimos `dias` días."""
+    if db.query(ActividadHLL.fecha).first() is not None:
+        return 0
+    return backfill(db, datetime.utcnow().date() - timedelta(days=dias))
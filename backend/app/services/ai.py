@@ -1,4 +1,4 @@
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterator
 from openai import OpenAI
 from ..config import OPENAI_API_KEY, OPENAI_MODEL
 
@@ -10,15 +10,18 @@ SYSTEM_PROMPT = (
     "Cualquier otra pregunta fuera del negocio del sistema deberas de responder, literalmente :no poseo esa informacion"
 )
 
+def _build_messages(messages: List[Dict[str, str]], context: Optional[str]) -> List[Dict[str, str]]:
+    if client is None:
+        raise RuntimeError("El servicio de IA no está disponible")
+    sys = SYSTEM_PROMPT if not context else f"{SYSTEM_PROMPT}\n\nContexto:\n{context}"
+    return [{"role": "system", "content": sys}] + messages
+
 def ask_openai(messages: List[Dict[str, str]], context: Optional[str] = None) -> str:
     """
     messages: [{"role":"system|user|assistant","content":"..."}]
     context: texto opcional (RAG) que se adjunta al prompt del sistema
     """
-    if client is None:
-        raise RuntimeError("El servicio de IA no está disponible")
-    sys = SYSTEM_PROMPT if not context else f"{SYSTEM_PROMPT}\n\nContexto:\n{context}"
-    msgs = [{"role": "system", "content": sys}] + messages
+    msgs = _build_messages(messages, context)
 
     resp = client.chat.completions.create(
         model=OPENAI_MODEL,
@@ -26,3 +29,23 @@ def ask_openai(messages: List[Dict[str, str]], context: Optional[str] = None) ->
         temperature=0.3,
     )
     return resp.choices[0].message.content.strip()
+
+def stream_openai(messages: List[Dict[str, str]], context: Optional[str] = None) -> Iterator[str]:
+    """
+    Igual que ask_openai, pero va entregando los fragmentos (deltas) de la respuesta
+    a medida que el modelo los genera.
+    """
+    msgs = _build_messages(messages, context)
+
+    stream = client.chat.completions.create(
+        model=OPENAI_MODEL,
+        messages=msgs,
+        temperature=0.3,
+        stream=True,
+    )
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
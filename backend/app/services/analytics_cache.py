@@ -0,0 +1,187 @@
+# backend/app/services/analytics_cache.py
+# --- NEW: caché de respuestas de analytics (TTL + stale-while-revalidate, invalidada por escrituras) ---
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from sqlalchemy.orm import Session
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock entre procesos
+    fcntl = None
+
+from ..config import ANALYTICS_CACHE_TTL, ANALYTICS_CACHE_STALE, ANALYTICS_CACHE_BACKEND
+from ..database import SessionLocal
+
+CACHE_DIR = Path(__file__).resolve().parents[2] / "data" / "analytics_cache"
+BACKENDS = ("memory", "file")
+
+class _MemoryStore:
+    """Entradas en el proceso: cada worker calcula y ve solo sus propias invalidaciones."""
+
+    def __init__(self):
+        self._entries: Dict[str, Dict] = {}
+        self._generation = 0
+        self._locks: Dict[str, threading.Lock] = {}
+        self._mutex = threading.Lock()
+
+    def get(self, nombre: str) -> Optional[Dict]:
+        return self._entries.get(nombre)
+
+    def put(self, nombre: str, entry: Dict) -> None:
+        self._entries[nombre] = entry
+
+    def generation(self) -> int:
+        return self._generation
+
+    def bump(self) -> None:
+        self._generation = time.time_ns()
+
+    @contextmanager
+    def lock(self, nombre: str, blocking: bool = True):
+        with self._mutex:
+            lk = self._locks.setdefault(nombre, threading.Lock())
+        ok = lk.acquire(blocking)
+        try:
+            yield ok
+        finally:
+            if ok:
+                lk.release()
+
+class _FileStore:
+    """
+    Entradas como JSON en data/analytics_cache, compartidas por todos los workers: el
+    resultado, la invalidación (archivo GENERATION) y el cálculo (flock por endpoint).
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def _write(self, name: str, text: str) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp = self.path / f".{name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, self.path / name)  # atómico: nadie lee un archivo a medio escribir
+
+    def get(self, nombre: str) -> Optional[Dict]:
+        try:
+            return json.loads((self.path / f"{nombre}.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def put(self, nombre: str, entry: Dict) -> None:
+        self._write(f"{nombre}.json", json.dumps(entry, ensure_ascii=False))
+
+    def generation(self) -> int:
+        try:
+            return int((self.path / "GENERATION").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return 0
+
+    def bump(self) -> None:
+        self._write("GENERATION", str(time.time_ns()))
+
+    @contextmanager
+    def lock(self, nombre: str, blocking: bool = True):
+        self.path.mkdir(parents=True, exist_ok=True)
+        f = open(self.path / f"{nombre}.lock", "a")
+        try:
+            ok = True
+            if fcntl:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+                except BlockingIOError:
+                    ok = False
+            yield ok
+        finally:
+            f.close()  # libera el flock
+
+_store = _FileStore(CACHE_DIR) if ANALYTICS_CACHE_BACKEND == "file" else _MemoryStore()
+_lock = threading.Lock()
+_refreshing: set = set()
+_stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "invalidations": 0}
+
+def _count(key: str) -> None:
+    with _lock:
+        _stats[key] += 1
+
+def _fresh(entry: Optional[Dict], generation: int, max_age: float) -> bool:
+    return entry is not None and entry["gen"] == generation and time.time() - entry["ts"] < max_age
+
+def _compute(nombre: str, compute: Callable[[Session], Dict], db: Session) -> Dict:
+    # la generación se lee antes de calcular: si una escritura invalida mientras tanto,
+    # el resultado queda guardado como viejo y la próxima llamada recalcula
+    generation = _store.generation()
+    value = compute(db)
+    _store.put(nombre, {"ts": time.time(), "gen": generation, "value": value})
+    return value
+
+def _refresh(nombre: str, compute: Callable[[Session], Dict]) -> None:
+    try:
+        with _store.lock(nombre, blocking=False) as ok:
+            if not ok:
+                return  # otro hilo o worker ya está recalculando
+            db = SessionLocal()  # la sesión del request ya se cerró
+            try:
+                _compute(nombre, compute, db)
+                _count("refreshes")
+            except Exception:
+                pass  # se sigue sirviendo el valor viejo hasta que venza la ventana
+            finally:
+                db.close()
+    finally:
+        with _lock:
+            _refreshing.discard(nombre)
+
+def cached(nombre: str, compute: Callable[[Session], Dict], db: Session) -> Dict:
+    """
+    Resultado de `compute(db)` para el endpoint `nombre`:
+      - más nuevo que ANALYTICS_CACHE_TTL: se devuelve tal cual
+      - hasta ANALYTICS_CACHE_STALE más: se devuelve y se recalcula en segundo plano
+      - vacío, invalidado o más viejo: un solo cálculo; las llamadas simultáneas
+        (otras pestañas, otros workers con backend file) esperan y lo reutilizan
+    """
+    if ANALYTICS_CACHE_TTL <= 0:
+        return compute(db)
+
+    generation = _store.generation()
+    entry = _store.get(nombre)
+    if _fresh(entry, generation, ANALYTICS_CACHE_TTL):
+        _count("hits")
+        return entry["value"]
+    if _fresh(entry, generation, ANALYTICS_CACHE_TTL + ANALYTICS_CACHE_STALE):
+        _count("stale_hits")
+        with _lock:
+            start = nombre not in _refreshing
+            _refreshing.add(nombre)
+        if start:
+            threading.Thread(target=_refresh, args=(nombre, compute),
+                             name=f"analytics-cache-{nombre}", daemon=True).start()
+        return entry["value"]
+
+    with _store.lock(nombre):
+        entry = _store.get(nombre)
+        if _fresh(entry, _store.generation(), ANALYTICS_CACHE_TTL):
+            _count("hits")  # lo calculó quien tenía el lock
+            return entry["value"]
+        _count("misses")
+        return _compute(nombre, compute, db)
+
+def invalidar() -> None:
+    """Marca viejos todos los resultados (también en los otros workers con backend file)."""
+    _store.bump()
+    _count("invalidations")
+
+def cache_stats() -> Dict:
+    with _lock:
+        return {
+            **_stats,
+            "backend": ANALYTICS_CACHE_BACKEND if ANALYTICS_CACHE_BACKEND in BACKENDS else "memory",
+            "ttl_s": ANALYTICS_CACHE_TTL,
+            "stale_s": ANALYTICS_CACHE_STALE,
+        }
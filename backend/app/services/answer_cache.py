@@ -0,0 +1,154 @@
+# backend/app/services/answer_cache.py
+# --- NEW: caché de respuestas del asistente (exacta + semántica), TTL + LRU ---
+from __future__ import annotations
+import hashlib
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from ..config import ANSWER_CACHE_TTL, ANSWER_CACHE_MAX_ITEMS, ANSWER_CACHE_MIN_SIM
+
+# Nota: caché en memoria por proceso; se vacía al reconstruir el índice RAG.
+# La búsqueda semántica mira a lo sumo las últimas SEMANTIC_SCAN_MAX preguntas del mismo contexto.
+SEMANTIC_SCAN_MAX = 256
+
+_lock = threading.Lock()
+_entries: "OrderedDict[str, Dict]" = OrderedDict()
+_by_context: Dict[str, "OrderedDict[str, None]"] = {}  # hash del contexto -> claves
+_stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "invalidations": 0}
+
+def _normalize(question: str) -> str:
+    q = " ".join(question.lower().split())
+    return q.strip("¿?¡!. ")
+
+def _context_hash(context: str) -> str:
+    return hashlib.sha256(context.encode("utf-8")).hexdigest()
+
+def _key(question: str, ctx_hash: str) -> str:
+    return hashlib.sha256(f"{_normalize(question)}\0{ctx_hash}".encode("utf-8")).hexdigest()
+
+def _alive(entry: Dict, now: float) -> bool:
+    return now - entry["ts"] < ANSWER_CACHE_TTL
+
+def _drop(key: str) -> None:
+    entry = _entries.pop(key)
+    group = _by_context.get(entry["ctx"])
+    if group is not None:
+        group.pop(key, None)
+        if not group:
+            del _by_context[entry["ctx"]]
+
+def _touch(key: str) -> None:
+    _entries.move_to_end(key)
+    _by_context[_entries[key]["ctx"]].move_to_end(key)
+
+def _get_exact(key: str, now: float) -> Optional[str]:
+    entry = _entries.get(key)
+    if entry is None:
+        return None
+    if not _alive(entry, now):
+        _drop(key)
+        return None
+    _touch(key)
+    return entry["answer"]
+
+def _get_semantic(qvec: np.ndarray, ctx_hash: str, now: float) -> Optional[str]:
+    # solo preguntas respondidas con el mismo contexto: tras un reindexado (o un rollback)
+    # que no pasó por invalidate(), una paráfrasis no se responde con documentos viejos
+    group = _by_context.get(ctx_hash)
+    if not group:
+        return None
+    best_key, best_sim = None, ANSWER_CACHE_MIN_SIM
+    for key in list(itertools.islice(reversed(group), SEMANTIC_SCAN_MAX)):
+        entry = _entries[key]
+        if not _alive(entry, now):
+            _drop(key)
+            continue
+        vec = entry["vec"]
+        if vec is None or vec.shape != qvec.shape:
+            continue
+        sim = float(np.dot(vec, qvec))  # vectores normalizados -> coseno
+        if sim >= best_sim:
+            best_key, best_sim = key, sim
+    if best_key is None:
+        return None
+    _touch(best_key)
+    return _entries[best_key]["answer"]
+
+def lookup(
+    question: str,
+    context: str,
+    qvec: Optional[np.ndarray],
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    (respuesta, tipo_de_hit) con tipo "exact" o "semantic"; (None, None) si no hay.
+    1) pregunta normalizada + hash del contexto, 2) coseno del embedding de la
+    pregunta >= ANSWER_CACHE_MIN_SIM entre las guardadas con ese mismo contexto.
+    """
+    ctx_hash = _context_hash(context)
+    key = _key(question, ctx_hash)
+    now = time.time()
+    with _lock:
+        answer = _get_exact(key, now)
+        if answer is not None:
+            _stats["exact_hits"] += 1
+            return answer, "exact"
+        if qvec is not None:
+            answer = _get_semantic(np.asarray(qvec, dtype="float32").reshape(-1), ctx_hash, now)
+            if answer is not None:
+                _stats["semantic_hits"] += 1
+                return answer, "semantic"
+        _stats["misses"] += 1
+    return None, None
+
+def store(question: str, context: str, qvec: Optional[np.ndarray], answer: str) -> None:
+    ctx_hash = _context_hash(context)
+    key = _key(question, ctx_hash)
+    vec = None if qvec is None else np.asarray(qvec, dtype="float32").reshape(-1)
+    with _lock:
+        _entries[key] = {"answer": answer, "vec": vec, "ts": time.time(), "ctx": ctx_hash}
+        _by_context.setdefault(ctx_hash, OrderedDict())[key] = None
+        _touch(key)
+        while len(_entries) > ANSWER_CACHE_MAX_ITEMS:
+            _drop(next(iter(_entries)))
+
+def cached_answer(
+    question: str,
+    context: str,
+    qvec: Optional[np.ndarray],
+    compute: Callable[[], str],
+) -> Tuple[str, Optional[str]]:
+    """
+    Devuelve (respuesta, tipo_de_hit) donde tipo_de_hit es "exact", "semantic" o None.
+    Si no hay hit llama a `compute()` y guarda el resultado.
+    """
+    answer, kind = lookup(question, context, qvec)
+    if answer is not None:
+        return answer, kind
+    answer = compute()
+    store(question, context, qvec, answer)
+    return answer, None
+
+def invalidate() -> None:
+    """Vacía la caché (el índice RAG cambió y las respuestas pueden estar obsoletas)."""
+    with _lock:
+        _entries.clear()
+        _by_context.clear()
+        _stats["invalidations"] += 1
+
+def answer_cache_stats() -> Dict:
+    with _lock:
+        size = len(_entries)
+    hits = _stats["exact_hits"] + _stats["semantic_hits"]
+    total = hits + _stats["misses"]
+    return {
+        **_stats,
+        "hit_rate": round(hits / total, 4) if total else 0.0,
+        "items": size,
+        "ttl_s": ANSWER_CACHE_TTL,
+        "min_sim": ANSWER_CACHE_MIN_SIM,
+    }
@@ -0,0 +1,257 @@
+# backend/app/services/chunk_store.py
+# --- NEW: almacén de chunks en SQLite (texto/metadata por id de vector, lectura perezosa) ---
+from __future__ import annotations
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from .lexical import term_counts
+from .dedup import signature, band_keys
+from .doc_ingest import chunk_id
+
+class ChunkStore:
+    """
+    Guarda cada chunk bajo su id de vector FAISS. A diferencia del antiguo
+    rag.meta.json no se carga nada al arrancar: search() solo lee las filas top-k.
+    También mantiene el índice invertido (postings + longitudes) para BM25 y las
+    firmas MinHash (+ buckets LSH) para deduplicar chunks nuevos contra los indexados.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                " vid INTEGER PRIMARY KEY, chunk_id TEXT NOT NULL, filename TEXT,"
+                " chunk_index INTEGER, text TEXT NOT NULL, meta TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS postings ("
+                " term TEXT NOT NULL, vid INTEGER NOT NULL, tf INTEGER NOT NULL,"
+                " PRIMARY KEY (term, vid)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_postings_vid ON postings(vid)")
+            conn.execute("CREATE TABLE IF NOT EXISTS doclen (vid INTEGER PRIMARY KEY, n_terms INTEGER NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS signatures (vid INTEGER PRIMARY KEY, sig BLOB NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS lsh ("
+                " bucket TEXT NOT NULL, vid INTEGER NOT NULL, PRIMARY KEY (bucket, vid)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_lsh_vid ON lsh(vid)")
+            # vectores exactos (float32) cuando el índice los guarda comprimidos: rerank
+            conn.execute("CREATE TABLE IF NOT EXISTS vectors (vid INTEGER PRIMARY KEY, vec BLOB NOT NULL)")
+            self._conn = conn
+            self._backfill_postings(conn)
+            self._backfill_signatures(conn)
+        return self._conn
+
+    def _index_terms(self, conn: sqlite3.Connection, rows: Iterable[Tuple[int, str]]) -> None:
+        posts, lens = [], []
+        for vid, text in rows:
+            counts, n = term_counts(text)
+            posts.extend((term, vid, tf) for term, tf in counts.items())
+            lens.append((vid, n))
+        conn.executemany("INSERT OR REPLACE INTO postings VALUES (?, ?, ?)", posts)
+        conn.executemany("INSERT OR REPLACE INTO doclen VALUES (?, ?)", lens)
+
+    def _backfill_postings(self, conn: sqlite3.Connection) -> None:
+        # stores creados antes del índice léxico: se indexan una sola vez
+        has_chunks = conn.execute("SELECT 1 FROM chunks LIMIT 1").fetchone()
+        has_lens = conn.execute("SELECT 1 FROM doclen LIMIT 1").fetchone()
+        if has_chunks and not has_lens:
+            self._index_terms(conn, conn.execute("SELECT vid, text FROM chunks").fetchall())
+            conn.commit()
+
+    def _index_signatures(self, conn: sqlite3.Connection, items: Iterable[Tuple[int, np.ndarray]]) -> None:
+        sigs, buckets = [], []
+        for vid, sig in items:
+            sigs.append((vid, np.asarray(sig, dtype=np.uint64).tobytes()))
+            buckets.extend((key, vid) for key in band_keys(sig))
+        conn.executemany("INSERT OR REPLACE INTO signatures VALUES (?, ?)", sigs)
+        conn.executemany("INSERT OR REPLACE INTO lsh VALUES (?, ?)", buckets)
+
+    def _backfill_signatures(self, conn: sqlite3.Connection) -> None:
+        has_chunks = conn.execute("SELECT 1 FROM chunks LIMIT 1").fetchone()
+        has_sigs = conn.execute("SELECT 1 FROM signatures LIMIT 1").fetchone()
+        if has_chunks and not has_sigs:
+            rows = conn.execute("SELECT vid, text FROM chunks").fetchall()
+            self._index_signatures(conn, ((vid, signature(text)) for vid, text in rows))
+            conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._get_conn().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def vids(self) -> List[int]:
+        with self._lock:
+            return [r[0] for r in self._get_conn().execute("SELECT vid FROM chunks ORDER BY vid")]
+
+    def next_vid(self) -> int:
+        with self._lock:
+            return self._get_conn().execute("SELECT COALESCE(MAX(vid) + 1, 0) FROM chunks").fetchone()[0]
+
+    def get_many(self, vids: Iterable[int]) -> Dict[int, Dict]:
+        """{vid: {id, text, meta}} solo para los ids pedidos."""
+        vids = [int(v) for v in vids]
+        if not vids:
+            return {}
+        marks = ",".join("?" * len(vids))
+        with self._lock:
+            rows = self._get_conn().execute(
+                f"SELECT vid, chunk_id, text, meta FROM chunks WHERE vid IN ({marks})", vids
+            ).fetchall()
+        return {vid: {"id": cid, "text": text, "meta": json.loads(meta)} for vid, cid, text, meta in rows}
+
+    def add_signatures(self, items: Iterable[Tuple[int, np.ndarray]]) -> None:
+        with self._lock:
+            conn = self._get_conn()
+            self._index_signatures(conn, ((int(vid), sig) for vid, sig in items))
+            conn.commit()
+
+    def add_vectors(self, items: Iterable[Tuple[int, np.ndarray]]) -> None:
+        rows = [(int(vid), np.asarray(v, dtype="float32").tobytes()) for vid, v in items]
+        with self._lock:
+            conn = self._get_conn()
+            conn.executemany("INSERT OR REPLACE INTO vectors VALUES (?, ?)", rows)
+            conn.commit()
+
+    def get_vectors(self, vids: Iterable[int]) -> Dict[int, np.ndarray]:
+        """{vid: vector float32 exacto} de los ids pedidos que lo tengan guardado."""
+        vids = [int(v) for v in vids]
+        if not vids:
+            return {}
+        marks = ",".join("?" * len(vids))
+        with self._lock:
+            rows = self._get_conn().execute(
+                f"SELECT vid, vec FROM vectors WHERE vid IN ({marks})", vids
+            ).fetchall()
+        return {vid: np.frombuffer(vec, dtype="float32") for vid, vec in rows}
+
+    def candidates(self, keys: List[str]) -> Dict[int, np.ndarray]:
+        """{vid: firma} de los chunks que comparten algún bucket LSH con `keys`."""
+        marks = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._get_conn().execute(
+                f"SELECT s.vid, s.sig FROM signatures s WHERE s.vid IN"
+                f" (SELECT vid FROM lsh WHERE bucket IN ({marks}))",
+                keys,
+            ).fetchall()
+        return {vid: np.frombuffer(sig, dtype=np.uint64) for vid, sig in rows}
+
+    def copy_chunks(self, items: Iterable[Tuple[int, int, Dict]]) -> None:
+        """
+        Copia chunks [(vid, vid_nuevo, meta_nueva)] con la misma fila de texto, postings,
+        firma y vector exacto. Las filas ya publicadas no se modifican nunca: los snapshots
+        conservados (rollback) siguen viendo la metadata con la que se construyeron.
+        """
+        with self._lock:
+            conn = self._get_conn()
+            for old, new, meta in items:
+                row = conn.execute("SELECT chunk_id, filename, chunk_index, text FROM chunks WHERE vid=?",
+                                   (old,)).fetchone()
+                if row is None:
+                    continue
+                cid, filename, idx, text = row
+                if (meta.get("filename"), meta.get("chunk_index")) != (filename, idx):
+                    cid = chunk_id(meta.get("filename"), meta.get("chunk_index"))
+                conn.execute("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?, ?)",
+                             (new, cid, meta.get("filename"), meta.get("chunk_index"), text,
+                              json.dumps(meta, ensure_ascii=False)))
+                for table, cols in (("postings", "term, ?, tf"), ("doclen", "?, n_terms"),
+                                    ("signatures", "?, sig"), ("lsh", "bucket, ?"), ("vectors", "?, vec")):
+                    conn.execute(f"INSERT OR REPLACE INTO {table} SELECT {cols} FROM {table} WHERE vid=?",
+                                 (new, old))
+            conn.commit()
+
+    def add_many(self, items: Iterable[Tuple[int, Dict]]) -> None:
+        rows = []
+        for vid, c in items:
+            meta = c.get("meta", {})
+            rows.append((int(vid), c.get("id", ""), meta.get("filename"), meta.get("chunk_index"),
+                         c["text"], json.dumps(meta, ensure_ascii=False)))
+        with self._lock:
+            conn = self._get_conn()
+            conn.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._index_terms(conn, [(r[0], r[4]) for r in rows])
+            conn.commit()
+
+    def delete_many(self, vids: Iterable[int]) -> None:
+        keys = [(int(v),) for v in vids]
+        with self._lock:
+            conn = self._get_conn()
+            conn.executemany("DELETE FROM chunks WHERE vid=?", keys)
+            conn.executemany("DELETE FROM postings WHERE vid=?", keys)
+            conn.executemany("DELETE FROM doclen WHERE vid=?", keys)
+            conn.executemany("DELETE FROM signatures WHERE vid=?", keys)
+            conn.executemany("DELETE FROM lsh WHERE vid=?", keys)
+            conn.executemany("DELETE FROM vectors WHERE vid=?", keys)
+            conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            conn = self._get_conn()
+            for table in ("chunks", "postings", "doclen", "signatures", "lsh", "vectors"):
+                conn.execute(f"DELETE FROM {table}")
+            conn.commit()
+
+    def doc_stats(self, vids: Iterable[int]) -> Tuple[int, float]:
+        """(cantidad, longitud media) de los chunks `vids` con postings, p. ej. los de un snapshot."""
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS stat_vids (vid INTEGER PRIMARY KEY)")
+            conn.executemany("INSERT OR IGNORE INTO stat_vids VALUES (?)", ((int(v),) for v in vids))
+            n, avgdl = conn.execute(
+                "SELECT COUNT(*), AVG(d.n_terms) FROM doclen d JOIN stat_vids s ON s.vid = d.vid"
+            ).fetchone()
+            conn.execute("DELETE FROM stat_vids")
+            conn.commit()
+        return n, float(avgdl or 0.0)
+
+    def corpus_stats(self) -> Tuple[int, float]:
+        """(cantidad, longitud media) de todos los chunks con postings (recorre doclen entera)."""
+        with self._lock:
+            n, avgdl = self._get_conn().execute("SELECT COUNT(*), AVG(n_terms) FROM doclen").fetchone()
+        return n, float(avgdl or 0.0)
+
+    def postings(self, terms: List[str]) -> Dict[str, List[Tuple[int, int, int]]]:
+        """
+        {term: [(vid, tf, longitud_doc)]} para BM25; las estadísticas del corpus van aparte
+        (corpus_stats o doc_stats).
+        """
+        marks = ",".join("?" * len(terms))
+        with self._lock:
+            conn = self._get_conn()
+            rows = conn.execute(
+                f"SELECT p.term, p.vid, p.tf, d.n_terms FROM postings p"
+                f" JOIN doclen d ON d.vid = p.vid WHERE p.term IN ({marks})",
+                terms,
+            ).fetchall()
+        out: Dict[str, List[Tuple[int, int, int]]] = {}
+        for term, vid, tf, dl in rows:
+            out.setdefault(term, []).append((vid, tf, dl))
+        return out
+
+def meta_with_sources(meta: Dict, extra: List[Dict]) -> Dict:
+    """Metadata con más referencias {filename, chunk_index} (duplicados colapsados)."""
+    own = {"filename": meta.get("filename"), "chunk_index": meta.get("chunk_index")}
+    return {**meta, "sources": list(meta.get("sources") or [own]) + list(extra)}
+
+def meta_without_sources(meta: Dict, filenames: Iterable[str]) -> Dict:
+    """Metadata sin las referencias de `filenames` (nunca el representativo, ver rag._orphaned_sources)."""
+    gone = set(filenames)
+    sources = [s for s in meta.get("sources", []) if s.get("filename") not in gone]
+    out = {k: v for k, v in meta.items() if k != "sources"}
+    if len(sources) > 1:
+        out["sources"] = sources
+    return out
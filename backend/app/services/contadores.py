@@ -0,0 +1,209 @@
+# backend/app/services/contadores.py
+# --- NEW: contadores de KPIs (kpi_contadores) para el resumen admin, con reconciliación periódica ---
+from __future__ import annotations
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..config import KPI_RECONCILE_S
+from ..database import SessionLocal, dialect_insert
+from ..models.kpi_contador import KpiContador
+from ..models.usuario import Usuario
+from ..models.producto import Producto
+from ..models.pedido import Pedido
+from ..models.detalle_pedido import DetallePedido
+from ..models.chat import ChatSession
+from ..models.mensaje import ChatMessage
+
+ESTADO = "pedidos_estado:"   # prefijo de los contadores por estado de pedido
+# fila con la hora de la última reconciliación periódica: una sola por intervalo entre
+# todos los workers (no es un KPI; leer() y reconciliar() la saltean)
+MARCA = "_reconciliado_en"
+
+_lock = threading.Lock()
+_ultima: Dict = {"ts": None, "diferencias": {}, "error": None}
+_worker: Optional[threading.Thread] = None
+
+def clave_estado(estado: Optional[str]) -> str:
+    return ESTADO + (estado or "desconocido")
+
+def sumar(db: Session, deltas: Dict[str, float]) -> None:
+    """
+    Suma `deltas` ({clave: delta}) a los contadores. No hace commit: corre dentro de la
+    transacción del alta/baja que lo origina, así el contador y la fila cambian juntos.
+    Las filas se bloquean en orden de clave (igual que reconciliar): dos transacciones
+    con las mismas claves no se cruzan en un deadlock.
+    """
+    insert = dialect_insert(db)
+    for clave, delta in sorted(deltas.items()):
+        if not delta:
+            continue
+        if insert is not None:
+            stmt = insert(KpiContador).values(clave=clave, valor=float(delta))
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[KpiContador.clave],
+                set_={"valor": KpiContador.valor + stmt.excluded.valor},
+            )
+            db.execute(stmt)
+            continue
+        fila = db.query(KpiContador).filter(KpiContador.clave == clave).with_for_update().first()
+        if fila is None:
+            db.add(KpiContador(clave=clave, valor=float(delta)))
+        else:
+            fila.valor += delta
+
+def cambio_estado(db: Session, anterior: Optional[str], nuevo: Optional[str]) -> None:
+    """Mueve un pedido de un contador de estado a otro (sin commit)."""
+    if clave_estado(anterior) != clave_estado(nuevo):
+        sumar(db, {clave_estado(anterior): -1, clave_estado(nuevo): 1})
+
+def leer(db: Session) -> Dict[str, float]:
+    """Todos los contadores en una sola lectura."""
+    return {clave: valor for clave, valor in db.query(KpiContador.clave, KpiContador.valor)
+            if clave != MARCA}
+
+def resumen(db: Session) -> Dict:
+    """KPIs y pedidos por estado con la forma de /analytics/resumen."""
+    c = leer(db)
+    pedidos_por_estado = [
+        {"estado": clave[len(ESTADO):], "cantidad": int(valor)}
+        for clave, valor in sorted(c.items())
+        if clave.startswith(ESTADO) and valor > 0
+    ]
+    return {
+        "kpis": {
+            "usuarios":  int(c.get("usuarios", 0)),
+            "productos": int(c.get("productos", 0)),
+            "pedidos":   int(c.get("pedidos", 0)),
+            "ventas_totales": float(c.get("ventas_totales", 0.0)),
+            "chats": int(c.get("chats", 0)),
+            "mensajes": int(c.get("mensajes", 0)),
+        },
+        "pedidos_por_estado": pedidos_por_estado,
+    }
+
+_CONTEOS = {
+    "usuarios":  lambda db: db.query(func.count(Usuario.id)).scalar(),
+    "productos": lambda db: db.query(func.count(Producto.id)).scalar(),
+    "pedidos":   lambda db: db.query(func.count(Pedido.id)).scalar(),
+    "ventas_totales": lambda db: db.query(
+        func.coalesce(func.sum(DetallePedido.cantidad * DetallePedido.precio_unitario), 0.0)
+    ).scalar(),
+    "chats":    lambda db: db.query(func.count(ChatSession.id)).scalar(),
+    "mensajes": lambda db: db.query(func.count(ChatMessage.id)).scalar(),
+}
+
+def contar(db: Session, claves: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    """
+    Valores reales recorriendo las tablas (lo que antes hacía cada llamada a /resumen).
+    claves: solo esas (None = todas); una clave de estado sin pedidos vale 0.
+    """
+    claves = None if claves is None else set(claves)
+    reales = {k: fn(db) or 0 for k, fn in _CONTEOS.items() if claves is None or k in claves}
+    if claves is None or any(k.startswith(ESTADO) for k in claves):
+        for estado, n in db.query(Pedido.estado, func.count(Pedido.id)).group_by(Pedido.estado):
+            reales[clave_estado(estado)] = n
+    if claves is not None:
+        reales = {k: reales.get(k, 0) for k in claves}
+    return {k: float(v) for k, v in reales.items()}
+
+def _diferencias(actuales: Dict[str, float], reales: Dict[str, float]) -> Dict[str, Dict[str, float]]:
+    diferencias = {}
+    for clave in sorted(set(actuales) | set(reales)):
+        real = reales.get(clave, 0.0)
+        if abs(actuales.get(clave, 0.0) - real) > 1e-6:
+            diferencias[clave] = {"contador": actuales.get(clave, 0.0), "real": real}
+    return diferencias
+
+def reconciliar(db: Session) -> Dict[str, Dict[str, float]]:
+    """
+    Recalcula los contadores desde las tablas y corrige los que se desviaron (altas por
+    fuera de la API, ediciones a mano). El recuento completo corre sin bloquear nada; solo
+    las claves que no coinciden se bloquean (en orden de clave, como sumar) y se vuelven a
+    contar con el bloqueo tomado: un alta concurrente espera y suma sobre el valor
+    corregido en vez de perderse, y las demás altas no esperan al recuento.
+    Devuelve {clave: {contador, real}} de los que no coincidían.
+    """
+    candidatas = _diferencias(leer(db), contar(db))
+    diferencias: Dict[str, Dict[str, float]] = {}
+    if candidatas:
+        actuales = {
+            f.clave: f.valor
+            for f in db.query(KpiContador).filter(KpiContador.clave.in_(list(candidatas)))
+            .order_by(KpiContador.clave).with_for_update()
+        }
+        diferencias = _diferencias(actuales, contar(db, candidatas))
+
+    insert = dialect_insert(db)
+    for clave, d in diferencias.items():
+        valor = d["real"]
+        if insert is not None:
+            stmt = insert(KpiContador).values(clave=clave, valor=valor)
+            db.execute(stmt.on_conflict_do_update(index_elements=[KpiContador.clave],
+                                                  set_={"valor": stmt.excluded.valor}))
+        else:
+            db.merge(KpiContador(clave=clave, valor=valor))
+    db.commit()
+
+    with _lock:
+        _ultima.update(ts=time.time(), diferencias=diferencias, error=None)
+    return diferencias
+
+def inicializar(db: Session) -> None:
+    """Primer arranque con la tabla nueva: la llena desde las tablas si está vacía."""
+    if db.query(KpiContador.clave).filter(KpiContador.clave != MARCA).first() is None:
+        reconciliar(db)
+
+def estado_reconciliacion() -> Dict:
+    with _lock:
+        return {**_ultima, "intervalo_s": KPI_RECONCILE_S}
+
+def _tomar_turno(db: Session) -> bool:
+    """
+    True si a este worker le toca reconciliar: mueve MARCA a ahora solo si la última
+    reconciliación fue hace más de ~un intervalo (UPDATE condicional, atómico entre workers).
+    """
+    ahora = time.time()
+    insert = dialect_insert(db)
+    if insert is not None:
+        db.execute(insert(KpiContador).values(clave=MARCA, valor=0.0)
+                   .on_conflict_do_nothing(index_elements=[KpiContador.clave]))
+    elif db.get(KpiContador, MARCA) is None:
+        db.add(KpiContador(clave=MARCA, valor=0.0))
+        db.flush()
+    # margen del 10%: los hilos de cada worker no despiertan exactamente a la vez
+    tomado = db.query(KpiContador).filter(
+        KpiContador.clave == MARCA, KpiContador.valor <= ahora - KPI_RECONCILE_S * 0.9,
+    ).update({KpiContador.valor: ahora}, synchronize_session=False)
+    db.commit()
+    return tomado == 1
+
+def _run() -> None:
+    while True:
+        time.sleep(KPI_RECONCILE_S)
+        db = SessionLocal()
+        try:
+            if _tomar_turno(db):
+                reconciliar(db)
+        except Exception as e:
+            db.rollback()
+            with _lock:
+                _ultima.update(ts=time.time(), error=str(e))
+        finally:
+            db.close()
+
+def iniciar_reconciliacion() -> None:
+    """
+    Hilo de fondo que reconcilia cada KPI_RECONCILE_S segundos (0 = desactivado). Corre en
+    cada worker, pero en cada intervalo reconcilia uno solo (ver _tomar_turno).
+    """
+    global _worker
+    if KPI_RECONCILE_S <= 0:
+        return
+    with _lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name="kpi-reconcile", daemon=True)
+            _worker.start()
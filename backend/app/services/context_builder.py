@@ -0,0 +1,158 @@
+# backend/app/services/context_builder.py
+# --- NEW: contexto del prompt con presupuesto de tokens (MMR + fusión de chunks vecinos) ---
+from __future__ import annotations
+import math
+import threading
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from ..config import RAG_CONTEXT_TOKENS, RAG_MMR_LAMBDA, RAG_CHUNK_OVERLAP
+from .embeddings import estimate_tokens
+from .lexical import term_counts
+
+SEP = "\n\n---\n\n"
+MIN_OVERLAP_CHARS = 20      # solapes más cortos no se consideran texto repetido
+MIN_TAIL_TOKENS = 40        # un bloque recortado a menos de esto no aporta: se corta ahí
+
+_lock = threading.Lock()
+_stats = {"requests": 0, "tokens": 0, "naive_tokens": 0, "saved_tokens": 0, "truncated": 0}
+
+def _format(filename: str, text: str) -> str:
+    # mismo formato que rag.compose_context
+    return f"[{filename}] {text}"
+
+def _cosine(a: Counter, b: Counter) -> float:
+    if not a or not b:
+        return 0.0
+    dot = sum(v * b.get(t, 0) for t, v in a.items())
+    return dot / (math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values())))
+
+def _relevance(hits: List[Dict]) -> List[float]:
+    """Scores llevados a [0, 1] (RRF, coseno y BM25 tienen escalas distintas); sin rango, por posición."""
+    scores = [float(h.get("score") or 0.0) for h in hits]
+    lo, hi = min(scores), max(scores)
+    if hi - lo < 1e-9:
+        return [1.0 - i / len(hits) for i in range(len(hits))]
+    return [(s - lo) / (hi - lo) for s in scores]
+
+def mmr_select(hits: List[Dict], k: int, lam: float = RAG_MMR_LAMBDA) -> List[int]:
+    """
+    Maximal marginal relevance: elige k hits maximizando
+    lam * relevancia - (1 - lam) * (similitud máxima con los ya elegidos).
+    La similitud es el coseno de los términos (detecta los solapes entre chunks).
+    Devuelve las posiciones elegidas, en orden de selección.
+    """
+    rel = _relevance(hits)
+    terms = [term_counts(h.get("text") or "")[0] for h in hits]
+    chosen: List[int] = []
+    left = list(range(len(hits)))
+    while left and len(chosen) < k:
+        best = max(left, key=lambda i: lam * rel[i] - (1 - lam) * max(
+            (_cosine(terms[i], terms[j]) for j in chosen), default=0.0))
+        chosen.append(best)
+        left.remove(best)
+    return chosen
+
+def _join_overlap(a: str, b: str, max_overlap: int) -> str:
+    """Une dos chunks consecutivos quitando el texto que repiten (final de a == inicio de b)."""
+    for n in range(min(len(a), len(b), max_overlap), MIN_OVERLAP_CHARS - 1, -1):
+        if a.endswith(b[:n]):
+            return a + b[n:]
+    return f"{a} {b}"
+
+def _blocks(hits: List[Dict]) -> List[Tuple[str, str]]:
+    """
+    Agrupa los hits elegidos en bloques [(archivo, texto)]: chunks consecutivos del mismo
+    archivo se funden en uno sin el solape. Orden: el del primer hit de cada bloque.
+    """
+    slack = int(RAG_CHUNK_OVERLAP * 1.5) + 10  # el corte del chunk anterior se ajusta a un espacio
+    runs: List[Dict] = []
+    for pos, h in enumerate(hits):
+        meta = h.get("meta", {})
+        runs.append({"file": meta.get("filename", "doc"), "idx": meta.get("chunk_index"),
+                     "text": h.get("text") or "", "pos": pos})
+
+    merged: List[Dict] = []
+    for r in sorted(runs, key=lambda r: (r["file"], r["idx"] if r["idx"] is not None else -1)):
+        last = merged[-1] if merged else None
+        if (last and r["idx"] is not None and last["file"] == r["file"]
+                and last["end"] is not None and r["idx"] == last["end"] + 1):
+            last["text"] = _join_overlap(last["text"], r["text"], slack)
+            last["end"] = r["idx"]
+            last["pos"] = min(last["pos"], r["pos"])
+            continue
+        merged.append({**r, "end": r["idx"]})
+    merged.sort(key=lambda b: b["pos"])
+    return [(b["file"], b["text"]) for b in merged]
+
+def _trim_to_tokens(text: str, tokens: int) -> str:
+    # recorte proporcional en caracteres, en el último espacio
+    cut = int(len(text) * tokens / max(1, estimate_tokens(text)))
+    cut = text.rfind(" ", 0, cut) if " " in text[:cut] else cut
+    return text[:max(0, cut)].rstrip() + " …"
+
+def assemble_context(
+    hits: List[Dict],
+    top_k: int = 4,
+    budget: int = RAG_CONTEXT_TOKENS,
+    lam: float = RAG_MMR_LAMBDA,
+) -> Tuple[str, List[Dict], Dict]:
+    """
+    Arma el contexto a partir de los candidatos `hits` (ordenados por relevancia):
+    MMR elige top_k, los chunks vecinos del mismo archivo se funden sin el texto
+    solapado y se agregan bloques hasta el presupuesto de tokens (el último se recorta).
+
+    Devuelve (contexto, hits_elegidos, stats). stats compara contra el contexto ingenuo
+    (los top_k primeros pegados tal cual): {candidates, selected, blocks, tokens,
+    naive_tokens, saved_tokens, truncated}.
+    """
+    naive = SEP.join(_format(h.get("meta", {}).get("filename", "doc"), h.get("text") or "") for h in hits[:top_k])
+    naive_tokens = estimate_tokens(naive) if naive else 0
+
+    chosen = [hits[i] for i in mmr_select(hits, top_k, lam)] if hits else []
+    parts: List[str] = []
+    used, truncated = 0, False
+    sep_tokens = estimate_tokens(SEP)
+    blocks = _blocks(chosen)
+    for filename, text in blocks:
+        part = _format(filename, text)
+        cost = estimate_tokens(part) + (sep_tokens if parts else 0)
+        if used + cost > budget:
+            room = budget - used - (sep_tokens if parts else 0)
+            if room >= MIN_TAIL_TOKENS:
+                part = _trim_to_tokens(part, room)
+                parts.append(part)
+            truncated = True
+            break
+        parts.append(part)
+        used += cost
+    context = SEP.join(parts)
+
+    tokens = estimate_tokens(context) if context else 0
+    stats = {
+        "candidates": len(hits),
+        "selected": len(chosen),
+        "blocks": len(blocks),
+        "tokens": tokens,
+        "naive_tokens": naive_tokens,
+        "saved_tokens": naive_tokens - tokens,
+        "truncated": truncated,
+    }
+    with _lock:
+        _stats["requests"] += 1
+        _stats["tokens"] += tokens
+        _stats["naive_tokens"] += naive_tokens
+        _stats["saved_tokens"] += naive_tokens - tokens
+        _stats["truncated"] += int(truncated)
+    return context, chosen, stats
+
+def context_stats() -> Dict:
+    """Acumulado del proceso: tokens de contexto enviados y ahorrados frente al contexto ingenuo."""
+    with _lock:
+        n = _stats["requests"]
+        return {
+            **_stats,
+            "budget": RAG_CONTEXT_TOKENS,
+            "avg_tokens": round(_stats["tokens"] / n, 1) if n else 0.0,
+            "avg_saved_tokens": round(_stats["saved_tokens"] / n, 1) if n else 0.0,
+        }
@@ -0,0 +1,96 @@
+# backend/app/services/dedup.py
+# --- NEW: deduplicación de chunks casi idénticos (MinHash + LSH) antes de embeber ---
+from __future__ import annotations
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import RAG_DEDUP_THRESHOLD
+
+SHINGLE_WORDS = 5
+NUM_PERM = 64
+BANDS = 16                      # 16 bandas x 4 filas: candidato casi seguro desde ~0.8 de Jaccard
+ROWS = NUM_PERM // BANDS
+_PRIME = (1 << 61) - 1
+
+_rng = np.random.default_rng(20240601)   # semilla fija: firmas comparables entre ejecuciones
+_A = _rng.integers(1, 1 << 31, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 31, NUM_PERM, dtype=np.uint64)
+
+# candidatos(claves_de_banda) -> {vid: firma} de chunks ya indexados
+CandidatesFn = Callable[[List[str]], Dict[int, np.ndarray]]
+
+def _shingles(text: str) -> List[str]:
+    words = text.lower().split()
+    if len(words) <= SHINGLE_WORDS:
+        return [" ".join(words)]
+    return [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+
+def signature(text: str) -> np.ndarray:
+    """Firma MinHash (NUM_PERM uint64) de los shingles de palabras del texto."""
+    x = np.array([zlib.crc32(s.encode("utf-8")) for s in set(_shingles(text))], dtype=np.uint64)
+    return ((np.outer(_A, x) + _B[:, None]) % _PRIME).min(axis=1)
+
+def band_keys(sig: np.ndarray) -> List[str]:
+    """Una clave por banda: dos chunks que comparten alguna son candidatos a duplicado."""
+    return [
+        f"{b}:{zlib.crc32(sig[b * ROWS:(b + 1) * ROWS].tobytes()):08x}" for b in range(BANDS)
+    ]
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Jaccard estimado: fracción de posiciones iguales en las firmas."""
+    return float(np.mean(a == b))
+
+def _source(c: Dict) -> Dict:
+    meta = c.get("meta", {})
+    return {"filename": meta.get("filename"), "chunk_index": meta.get("chunk_index")}
+
+def dedup_chunks(
+    chunks: List[Dict],
+    threshold: float = RAG_DEDUP_THRESHOLD,
+    candidates: Optional[CandidatesFn] = None,
+) -> Tuple[List[Dict], List[np.ndarray], Dict[int, List[Dict]], int]:
+    """
+    Colapsa chunks casi idénticos (Jaccard estimado >= threshold).
+
+    Devuelve (únicos, firmas_de_únicos, ya_indexados, eliminados):
+      - únicos: el primer chunk de cada grupo (orden estable); si absorbió otros,
+        meta["sources"] lista todas las referencias {filename, chunk_index}
+      - ya_indexados: {vid: [sources]} para chunks que duplican un vector existente
+        (solo si se pasa `candidates`)
+      - eliminados: cuántos chunks no se van a embeber
+    """
+    unique: List[Dict] = []
+    sigs: List[np.ndarray] = []
+    buckets: Dict[str, List[int]] = {}
+    existing: Dict[int, List[Dict]] = {}
+    removed = 0
+
+    for c in chunks:
+        sig = signature(c["text"])
+        keys = band_keys(sig)
+
+        if candidates is not None:
+            match = next((vid for vid, other in candidates(keys).items()
+                          if similarity(sig, other) >= threshold), None)
+            if match is not None:
+                existing.setdefault(match, []).append(_source(c))
+                removed += 1
+                continue
+
+        seen = {i for k in keys for i in buckets.get(k, [])}
+        match = next((i for i in sorted(seen) if similarity(sig, sigs[i]) >= threshold), None)
+        if match is not None:
+            rep = unique[match]
+            meta = rep.setdefault("meta", {})
+            meta.setdefault("sources", [_source(rep)]).append(_source(c))
+            removed += 1
+            continue
+
+        for k in keys:
+            buckets.setdefault(k, []).append(len(unique))
+        unique.append({**c, "meta": dict(c.get("meta", {}))})
+        sigs.append(sig)
+
+    return unique, sigs, existing, removed
@@ -1,12 +1,34 @@
 # backend/app/services/doc_ingest.py
 # --- NEW: lector simple de PDF/TXT/MD + chunking ---
 from __future__ import annotations
+import hashlib
+import multiprocessing
+import signal
+import threading
+import time
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator, Optional
 from pypdf import PdfReader
 
+from ..config import INGEST_WORKERS, INGEST_FILE_TIMEOUT, RAG_CHUNK_SIZE, RAG_CHUNK_OVERLAP
+
 DOC_EXTS = {".pdf", ".txt", ".md"}
 
+TXT_BLOCK_CHARS = 16 * 1024
+
+# --- NEW: lectura y chunking en streaming (memoria acotada por el tamaño de chunk) ---
+def iter_txt_md(path: Path) -> Iterator[str]:
+    """Texto del archivo en bloques de TXT_BLOCK_CHARS caracteres."""
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        for block in iter(lambda: f.read(TXT_BLOCK_CHARS), ""):
+            yield block
+
+def iter_pdf_pages(path: Path) -> Iterator[str]:
+    """Texto de cada página; el salto de línea final equivale al "\n".join de antes."""
+    reader = PdfReader(str(path))
+    for page in reader.pages:
+        yield (page.extract_text() or "") + "\n"
+
 def read_txt_md(path: Path) -> str:
     try:
         return path.read_text(encoding="utf-8", errors="ignore")
@@ -14,62 +36,214 @@ def read_txt_md(path: Path) -> str:
         return path.read_text(encoding="latin-1", errors="ignore")
 
 def read_pdf(path: Path) -> str:
-    out = []
-    reader = PdfReader(str(path))
-    for page in reader.pages:
-        t = page.extract_text() or ""
-        out.append(t)
-    return "\n".join(out)
+    return "".join(iter_pdf_pages(path)).rstrip("\n")
 
-def chunk_text(text: str, max_len: int = 800, overlap: int = 120) -> List[str]:
+def normalize_stream(pieces: Iterable[str]) -> Iterator[str]:
     """
-    --- NEW: chunking super simple por ventana deslizante ---
-    max_len: tamaño de chunk aproximado en caracteres
-    overlap: solape entre chunks para contexto
+    Equivalente en streaming a " ".join(texto.split()): colapsa espacios entre
+    fragmentos sin juntar el documento. Una palabra partida entre dos fragmentos
+    se guarda hasta completar.
     """
-    text = " ".join(text.split())
-    if not text:
-        return []
-    chunks = []
+    emitted = False
+    carry = ""
+    for piece in pieces:
+        s = carry + piece
+        words = s.split()
+        carry = words.pop() if words and not s[-1].isspace() else ""
+        if words:
+            yield (" " if emitted else "") + " ".join(words)
+            emitted = True
+    if carry:
+        yield (" " if emitted else "") + carry
+
+def iter_chunks(pieces: Iterable[str], max_len: int = 800, overlap: int = 120) -> Iterator[str]:
+    """
+    Chunking por ventana deslizante sobre un flujo de texto. Produce exactamente los
+    mismos cortes que chunk_text() sobre el texto completo, pero solo mantiene en
+    memoria la ventana actual (más el fragmento en curso).
+    """
+    stream = normalize_stream(pieces)
+    buf = ""        # texto normalizado desde la posición absoluta `base`
+    base = 0
     start = 0
-    n = len(text)
-    while start < n:
-        end = min(start + max_len, n)
+    exhausted = False
+    while True:
+        # hace falta ver max_len + 1 caracteres para saber si este es el último chunk
+        while not exhausted and len(buf) - (start - base) <= max_len:
+            try:
+                buf += next(stream)
+            except StopIteration:
+                exhausted = True
+        s = start - base
+        if s >= len(buf):
+            return
+        end = min(s + max_len, len(buf))
+        last = exhausted and end == len(buf)
         # intenta cortar en espacio para no partir palabras
-        if end < n:
-            space = text.rfind(" ", start + int(max_len * 0.6), end)
+        if not last:
+            space = buf.rfind(" ", s + int(max_len * 0.6), end)
             if space != -1:
                 end = space
-        chunks.append(text[start:end].strip())
-        if end == n:
-            break
-        start = max(0, end - overlap)
-    return [c for c in chunks if c]
+        chunk = buf[s:end].strip()
+        if chunk:
+            yield chunk
+        if last:
+            return
+        start = max(0, base + end - overlap)
+        # descarta lo ya consumido (en bloque, para no copiar el buffer en cada chunk)
+        if start - base > len(buf) // 2:
+            buf = buf[start - base:]
+            base = start
 
-def collect_chunks(docs_dir: Path) -> List[Dict]:
+def chunk_text(text: str, max_len: int = 800, overlap: int = 120) -> List[str]:
     """
-    --- NEW: recorre backend/docs y produce [{id, text, meta}, ...] ---
+    --- NEW: chunking super simple por ventana deslizante ---
+    max_len: tamaño de chunk aproximado en caracteres
+    overlap: solape entre chunks para contexto
     """
-    docs_dir.mkdir(parents=True, exist_ok=True)
-    items: List[Dict] = []
+    return list(iter_chunks([text], max_len=max_len, overlap=overlap))
 
-    for path in docs_dir.glob("*"):
+def iter_doc_files(docs_dir: Path, recursive: bool = False) -> Iterator[Path]:
+    """
+    --- NEW: archivos indexables de docs_dir (orden estable por nombre) ---
+    recursive: incluye subcarpetas
+    """
+    docs_dir.mkdir(parents=True, exist_ok=True)
+    for path in sorted(docs_dir.rglob("*") if recursive else docs_dir.glob("*")):
         if not path.is_file():
             continue
         if path.suffix.lower() not in DOC_EXTS:
             continue
+        yield path
+
+def doc_name(path: Path, docs_dir: Path) -> str:
+    """
+    --- NEW: nombre del documento en el índice: ruta relativa a docs_dir ("manual.pdf",
+    "garantias/tv.pdf"); para archivos de primer nivel coincide con path.name ---
+    """
+    return path.relative_to(docs_dir).as_posix()
+
+def file_sha256(path: Path) -> str:
+    """
+    --- NEW: hash del contenido, para saber si un archivo cambió desde el último índice ---
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def chunk_id(filename: str, chunk_index: int) -> str:
+    """Id legible del chunk (p. ej. "c.txt::chunk2")."""
+    return f"{filename}::chunk{chunk_index}"
+
+def file_chunks(path: Path, name: Optional[str] = None) -> List[Dict]:
+    """
+    --- NEW: chunks [{id, text, meta}] de un solo archivo ---
+    name: nombre en el índice (por defecto path.name)
+    """
+    name = name or path.name
+    if path.suffix.lower() == ".pdf":
+        pieces = iter_pdf_pages(path)
+    else:
+        pieces = iter_txt_md(path)
+
+    return [
+        {
+            "id": chunk_id(name, i),
+            "text": ch,
+            "meta": {"filename": name, "chunk_index": i}
+        }
+        for i, ch in enumerate(iter_chunks(pieces, max_len=RAG_CHUNK_SIZE, overlap=RAG_CHUNK_OVERLAP))
+    ]
+
+# --- NEW: parseo en paralelo (pool de procesos, timeout por archivo) ---
+def _on_alarm(signum, frame):
+    raise TimeoutError("tiempo de parseo agotado")
 
-        if path.suffix.lower() == ".pdf":
-            full = read_pdf(path)
-        else:
-            full = read_txt_md(path)
+def _init_worker() -> None:
+    # en los workers las tareas corren en el hilo principal: SIGALRM corta un PDF colgado
+    if hasattr(signal, "SIGALRM"):
+        signal.signal(signal.SIGALRM, _on_alarm)
 
-        parts = chunk_text(full, max_len=900, overlap=150)
-        for i, ch in enumerate(parts):
-            items.append({
-                "id": f"{path.name}::chunk{i}",
-                "text": ch,
-                "meta": {"filename": path.name, "chunk_index": i}
-            })
+def _alarm_usable() -> bool:
+    # SIGALRM solo se puede instalar (y solo se entrega) en el hilo principal
+    return hasattr(signal, "SIGALRM") and threading.current_thread() is threading.main_thread()
 
+def _parse_one(path: Path, name: str, timeout: Optional[float] = None) -> Dict:
+    t0 = time.perf_counter()
+    use_alarm = bool(timeout) and hasattr(signal, "SIGALRM")
+    try:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        chunks, error = file_chunks(path, name), None
+    except Exception as e:
+        chunks, error = [], f"{type(e).__name__}: {e}"
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return {
+        "filename": name,
+        "chunks": chunks,
+        "parse_ms": round((time.perf_counter() - t0) * 1000, 1),
+        "error": error,
+    }
+
+def parse_files(
+    paths: List[Path],
+    workers: int = INGEST_WORKERS,
+    timeout: float = INGEST_FILE_TIMEOUT,
+    names: Optional[List[str]] = None,
+) -> List[Dict]:
+    """
+    Parsea y trocea `paths` en un pool de procesos. Devuelve, en el mismo orden de
+    entrada, [{filename, chunks, parse_ms, error}]. Un archivo que falla o supera
+    `timeout` segundos queda con chunks=[] y `error`, sin frenar al resto.
+    Con workers <= 1 se parsea en el proceso actual si el timeout se puede cortar con
+    SIGALRM (hilo principal) o si timeout <= 0; si no, en un pool de un solo proceso.
+    names: nombre de cada archivo en el índice (por defecto path.name)
+    """
+    paths = list(paths)
+    names = list(names) if names is not None else [p.name for p in paths]
+    if not paths:
+        return []
+    workers = max(1, min(workers, len(paths)))
+    if workers == 1 and timeout <= 0:
+        return [_parse_one(p, n) for p, n in zip(paths, names)]
+    if workers == 1 and _alarm_usable():
+        previous = signal.signal(signal.SIGALRM, _on_alarm)
+        try:
+            return [_parse_one(p, n, timeout) for p, n in zip(paths, names)]
+        finally:
+            signal.signal(signal.SIGALRM, previous)
+
+    # spawn: se llama desde el hilo de reindexado; fork con hilos vivos no es seguro
+    ctx = multiprocessing.get_context("spawn")
+    pool = ctx.Pool(processes=workers, initializer=_init_worker)
+    try:
+        pending = [(n, pool.apply_async(_parse_one, (p, n, timeout))) for p, n in zip(paths, names)]
+        results = []
+        for name, res in pending:
+            try:
+                # margen extra: en plataformas sin SIGALRM el corte lo hace este get()
+                results.append(res.get(timeout=timeout + 5 if timeout > 0 else None))
+            except multiprocessing.TimeoutError:
+                results.append({"filename": name, "chunks": [], "parse_ms": timeout * 1000,
+                                "error": f"TimeoutError: más de {timeout:g}s"})
+            except Exception as e:
+                results.append({"filename": name, "chunks": [], "parse_ms": None,
+                                "error": f"{type(e).__name__}: {e}"})
+        return results
+    finally:
+        # terminate (no close/join): mata también a un worker que siga colgado
+        pool.terminate()
+
+def collect_chunks(docs_dir: Path, recursive: bool = False) -> List[Dict]:
+    """
+    --- NEW: recorre backend/docs y produce [{id, text, meta}, ...] ---
+    """
+    paths = list(iter_doc_files(docs_dir, recursive))
+    items: List[Dict] = []
+    for parsed in parse_files(paths, names=[doc_name(p, docs_dir) for p in paths]):
+        items.extend(parsed["chunks"])
     return items
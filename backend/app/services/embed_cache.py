@@ -0,0 +1,132 @@
+# backend/app/services/embed_cache.py
+# --- NEW: caché persistente de embeddings (modelo + hash del texto -> vector float32) ---
+from __future__ import annotations
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from ..config import EMBED_CACHE_MAX_ITEMS
+
+CACHE_PATH = Path(__file__).resolve().parents[2] / "data" / "embed_cache.sqlite"
+
+_lock = threading.Lock()
+_conn: sqlite3.Connection | None = None
+_stats = {"hits": 0, "misses": 0, "evicted": 0}
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+def cache_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{_normalize(text)}".encode("utf-8")).hexdigest()
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(CACHE_PATH), check_same_thread=False, timeout=30)
+        # WAL: varios workers de uvicorn pueden leer mientras otro escribe
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vec BLOB NOT NULL, used REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_used ON embeddings(used)")
+        _conn = conn
+    return _conn
+
+def _evict(conn: sqlite3.Connection) -> None:
+    """Si se supera el máximo, borra el 10% menos usado recientemente (LRU)."""
+    total = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+    if total <= EMBED_CACHE_MAX_ITEMS:
+        return
+    n = total - EMBED_CACHE_MAX_ITEMS + EMBED_CACHE_MAX_ITEMS // 10
+    conn.execute(
+        "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY used LIMIT ?)", (n,)
+    )
+    _stats["evicted"] += n
+
+def cached_embed(
+    texts: List[str],
+    model: str,
+    embed_fn: Callable[[List[str]], np.ndarray],
+) -> np.ndarray:
+    """
+    Devuelve los embeddings de `texts` (shape [N, D]) usando la caché.
+    Solo los textos no cacheados (deduplicados) se mandan a `embed_fn`.
+    """
+    keys = [cache_key(model, t) for t in texts]
+    found: Dict[str, np.ndarray] = {}
+    now = time.time()
+
+    with _lock:
+        conn = _get_conn()
+        uniq = list(dict.fromkeys(keys))
+        for i in range(0, len(uniq), 500):
+            part = uniq[i:i + 500]
+            marks = ",".join("?" * len(part))
+            for key, vec in conn.execute(
+                f"SELECT key, vec FROM embeddings WHERE key IN ({marks})", part
+            ):
+                found[key] = np.frombuffer(vec, dtype="float32")
+        if found:
+            conn.executemany("UPDATE embeddings SET used=? WHERE key=?", [(now, k) for k in found])
+            conn.commit()
+
+    missing: Dict[str, str] = {}
+    for k, t in zip(keys, texts):
+        if k not in found:
+            missing.setdefault(k, t)
+    hits = len(texts) - sum(1 for k in keys if k in missing)
+    _stats["hits"] += hits
+    _stats["misses"] += len(texts) - hits
+
+    if missing:
+        vecs = np.asarray(embed_fn(list(missing.values())), dtype="float32")
+        rows = []
+        for k, v in zip(missing.keys(), vecs):
+            found[k] = v
+            rows.append((k, int(v.shape[0]), v.tobytes(), now))
+        with _lock:
+            conn = _get_conn()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings(key, dim, vec, used) VALUES (?, ?, ?, ?)", rows
+            )
+            _evict(conn)
+            conn.commit()
+
+    if not texts:
+        return np.zeros((0, 0), dtype="float32")
+    return np.vstack([found[k] for k in keys]).astype("float32", copy=False)
+
+def cached_count(texts: List[str], model: str) -> int:
+    """Cuántos de `texts` ya están en la caché (no actualiza el LRU ni los contadores)."""
+    keys = [cache_key(model, t) for t in texts]
+    present = set()
+    with _lock:
+        conn = _get_conn()
+        uniq = list(dict.fromkeys(keys))
+        for i in range(0, len(uniq), 500):
+            part = uniq[i:i + 500]
+            marks = ",".join("?" * len(part))
+            present.update(k for (k,) in conn.execute(
+                f"SELECT key FROM embeddings WHERE key IN ({marks})", part
+            ))
+    return sum(1 for k in keys if k in present)
+
+def cache_stats() -> Dict:
+    """Contadores del proceso actual + tamaño de la caché en disco."""
+    with _lock:
+        items = _get_conn().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+    total = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "hit_rate": round(_stats["hits"] / total, 4) if total else 0.0,
+        "items": items,
+        "max_items": EMBED_CACHE_MAX_ITEMS,
+    }
@@ -1,12 +1,36 @@
-from typing import List
+import abc
+import random
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
 import numpy as np
-from ..config import OPENAI_API_KEY
+from ..config import (
+    OPENAI_API_KEY, EMBED_BATCH_MAX_TOKENS, EMBED_BATCH_MAX_ITEMS,
+    EMBED_WORKERS, EMBED_MAX_RETRIES, EMBED_PROVIDER, EMBED_HASH_DIM, RAG_EMBED_DIMS,
+)
+from .embed_cache import cached_embed
+from .lexical import tokenize
 try:
-    from openai import OpenAI
+    from openai import OpenAI, APIConnectionError, APITimeoutError, RateLimitError, InternalServerError
+    _RETRYABLE = (APIConnectionError, APITimeoutError, RateLimitError, InternalServerError)
 except ImportError:
     OpenAI = None
+    _RETRYABLE = (ConnectionError, TimeoutError)
+try:
+    import tiktoken
+    _enc = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _enc = None
 
 EMBEDDING_MODEL = "text-embedding-3-small"  # barato y suficiente
+MAX_TOKENS_PER_INPUT = 8191
+# dimensión completa de cada modelo de OpenAI (sin `dimensions`)
+OPENAI_DIMS = {"text-embedding-3-small": 1536, "text-embedding-3-large": 3072, "text-embedding-ada-002": 1536}
+EMBED_PROVIDERS = ("openai", "hashing")
+
+# progress(hechos, total): avance en número de textos embebidos
+ProgressFn = Callable[[int, int], None]
 
 _client = OpenAI(api_key=OPENAI_API_KEY) if (OpenAI and OPENAI_API_KEY) else None
 
@@ -14,13 +38,183 @@ def _ensure_client():
     if _client is None:
         raise RuntimeError("Embeddings: falta OPENAI_API_KEY o el paquete 'openai'.")
 
-def embed_texts(texts: List[str]) -> np.ndarray:
-    """Devuelve matriz (n, d) flotante32 normalizada."""
-    _ensure_client()
-    # OpenAI permite hasta ~8k tokens por item; ya troceamos antes
-    resp = _client.embeddings.create(model=EMBEDDING_MODEL, input=texts)
-    arr = np.array([d.embedding for d in resp.data], dtype=np.float32)
-    # normalizar a norma-1 (o L2). Usamos L2 para cosine con FAISS (inner product)
-    norms = np.linalg.norm(arr, axis=1, keepdims=True) + 1e-12
-    arr = arr / norms
-    return arr
+def estimate_tokens(text: str) -> int:
+    """Tokens del texto (tiktoken si está instalado; si no, ~4 caracteres por token)."""
+    if _enc is not None:
+        return len(_enc.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+def plan_batches(
+    texts: List[str],
+    max_tokens: int = EMBED_BATCH_MAX_TOKENS,
+    max_items: int = EMBED_BATCH_MAX_ITEMS,
+) -> List[List[int]]:
+    """
+    Agrupa los índices de `texts` (en orden) en lotes que respetan el límite de
+    tokens e ítems por request.
+    """
+    batches: List[List[int]] = []
+    cur: List[int] = []
+    cur_tokens = 0
+    for i, t in enumerate(texts):
+        n = min(estimate_tokens(t), MAX_TOKENS_PER_INPUT)
+        if cur and (cur_tokens + n > max_tokens or len(cur) >= max_items):
+            batches.append(cur)
+            cur, cur_tokens = [], 0
+        cur.append(i)
+        cur_tokens += n
+    if cur:
+        batches.append(cur)
+    return batches
+
+def _with_retry(fn: Callable[[List[str]], np.ndarray], texts: List[str]) -> np.ndarray:
+    for attempt in range(EMBED_MAX_RETRIES + 1):
+        try:
+            return fn(texts)
+        except _RETRYABLE:
+            if attempt == EMBED_MAX_RETRIES:
+                raise
+            # backoff exponencial con jitter: 1s, 2s, 4s, ...
+            time.sleep(2 ** attempt + random.random())
+
+def embed_batched(
+    texts: List[str],
+    embed_fn: Callable[[List[str]], np.ndarray],
+    progress: Optional[ProgressFn] = None,
+    workers: int = EMBED_WORKERS,
+) -> np.ndarray:
+    """
+    Embebe `texts` en lotes concurrentes (pool acotado), reintenta los lotes
+    fallidos y devuelve los vectores en el mismo orden de entrada.
+    """
+    batches = plan_batches(texts)
+    results: List[Optional[np.ndarray]] = [None] * len(batches)
+    done = 0
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(batches)))) as ex:
+        futs = {
+            ex.submit(_with_retry, embed_fn, [texts[i] for i in batch]): n
+            for n, batch in enumerate(batches)
+        }
+        for fut in as_completed(futs):
+            n = futs[fut]
+            results[n] = fut.result()
+            done += len(batches[n])
+            if progress:
+                progress(done, len(texts))
+    return np.vstack(results).astype("float32", copy=False)
+
+def _normalize_rows(arr: np.ndarray) -> np.ndarray:
+    # norma L2 = 1: el producto interno de FAISS equivale al coseno
+    return arr / (np.linalg.norm(arr, axis=1, keepdims=True) + 1e-12)
+
+# --- NEW: proveedores de embeddings intercambiables ---
+class EmbeddingProvider(abc.ABC):
+    """
+    Interfaz de un backend de embeddings. `model_id` y `dim` quedan guardados en el
+    índice: un índice construido con otro modelo/dimensión se rechaza al cargarlo.
+    remote=True: cada llamada va por red (se cachea en disco y se embebe por lotes).
+    """
+    model_id: str = ""
+    dim: int = 0
+    remote: bool = False
+
+    @abc.abstractmethod
+    def embed(self, texts: List[str], timeout: Optional[float] = None) -> np.ndarray:
+        """Matriz [N, dim] float32 con filas normalizadas."""
+
+class OpenAIEmbedder(EmbeddingProvider):
+    remote = True
+
+    def __init__(self, model: str = EMBEDDING_MODEL, dims: int = 0):
+        self.model = model
+        self.dims = dims
+        # con dimensiones reducidas los vectores son otros: id (y clave de caché) aparte
+        self.model_id = f"{model}@{dims}" if dims else model
+        self.dim = dims or OPENAI_DIMS.get(model, 1536)
+
+    def embed(self, texts: List[str], timeout: Optional[float] = None) -> np.ndarray:
+        _ensure_client()
+        client = _client.with_options(timeout=timeout, max_retries=1) if timeout else _client
+        # OpenAI permite hasta ~8k tokens por item; ya troceamos antes
+        # text-embedding-3-* acepta `dimensions` (vectores más cortos, casi la misma calidad)
+        extra = {"dimensions": self.dims} if self.dims else {}
+        resp = client.embeddings.create(model=self.model, input=texts, **extra)
+        return _normalize_rows(np.array([d.embedding for d in resp.data], dtype=np.float32))
+
+class HashingEmbedder(EmbeddingProvider):
+    """
+    Embeddings locales sin red ni modelo: proyección por hashing (con signo) de
+    términos, bigramas de términos y trigramas de caracteres, con tf sublineal.
+    Recupera por vocabulario compartido (no sinónimos), en microsegundos por consulta.
+    """
+    remote = False
+    VERSION = 1  # cambia los vectores: sube el id y obliga a reindexar
+
+    def __init__(self, dim: int = EMBED_HASH_DIM):
+        self.dim = dim
+        self.model_id = f"hashing-v{self.VERSION}@{dim}"
+
+    def _features(self, text: str) -> Dict[str, float]:
+        terms = tokenize(text)
+        feats: Dict[str, float] = {}
+        for t in terms:
+            feats[t] = feats.get(t, 0.0) + 1.0
+            w = f"<{t}>"
+            for i in range(len(w) - 2):
+                g = "#" + w[i:i + 3]
+                feats[g] = feats.get(g, 0.0) + 0.5
+        for a, b in zip(terms, terms[1:]):
+            g = f"{a} {b}"
+            feats[g] = feats.get(g, 0.0) + 1.0
+        return feats
+
+    def embed(self, texts: List[str], timeout: Optional[float] = None) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            feats = self._features(text)
+            if not feats:
+                continue
+            h = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in feats), dtype=np.uint64, count=len(feats))
+            w = 1.0 + np.log(np.fromiter(feats.values(), dtype=np.float32, count=len(feats)) + 1e-6)
+            sign = np.where((h >> np.uint64(31)) & np.uint64(1), -1.0, 1.0).astype(np.float32)
+            np.add.at(out[row], (h % np.uint64(self.dim)).astype(np.int64), sign * np.maximum(w, 0.1))
+        return _normalize_rows(out)
+
+_embedder: Optional[EmbeddingProvider] = None
+
+def get_embedder(name: Optional[str] = None) -> EmbeddingProvider:
+    """Proveedor configurado (EMBED_PROVIDER) o el pedido por nombre."""
+    global _embedder
+    if name is None and _embedder is not None:
+        return _embedder
+    kind = name or EMBED_PROVIDER
+    if kind == "openai":
+        provider: EmbeddingProvider = OpenAIEmbedder(EMBEDDING_MODEL, RAG_EMBED_DIMS)
+    elif kind == "hashing":
+        provider = HashingEmbedder(EMBED_HASH_DIM)
+    else:
+        raise RuntimeError(f"EMBED_PROVIDER inválido: {kind} (usa {', '.join(EMBED_PROVIDERS)})")
+    if name is None:
+        _embedder = provider
+    return provider
+
+def embed_texts(
+    texts: List[str],
+    progress: Optional[ProgressFn] = None,
+    known: Optional[Dict[str, np.ndarray]] = None,
+) -> np.ndarray:
+    """
+    Devuelve matriz (n, d) flotante32 normalizada (con caché en disco si el proveedor es remoto).
+    known: {texto: vector} ya calculados (p. ej. el checkpoint de ingest_docs); no
+    dependen de que la caché (LRU) los conserve
+    """
+    emb = get_embedder()
+    if not texts:
+        return np.zeros((0, emb.dim), dtype="float32")
+    if known:
+        missing = list(dict.fromkeys(t for t in texts if t not in known))
+        fresh = dict(zip(missing, embed_texts(missing, progress)))
+        return np.vstack([known[t] if t in known else fresh[t] for t in texts]).astype("float32")
+    if not emb.remote:
+        return emb.embed(texts)
+    return cached_embed(texts, emb.model_id, lambda miss: embed_batched(miss, emb.embed, progress))
@@ -0,0 +1,100 @@
+# backend/app/services/lexical.py
+# --- NEW: búsqueda léxica BM25 sobre el índice invertido del chunk store ---
+from __future__ import annotations
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+K1 = 1.5
+B = 0.75
+
+# palabras vacías frecuentes en las preguntas de clientes (no aportan al ranking)
+STOPWORDS = {
+    "a", "al", "algo", "como", "con", "cual", "cuando", "de", "del", "donde", "el", "en", "es",
+    "esta", "este", "hay", "la", "las", "lo", "los", "me", "mi", "mis", "no", "o", "para",
+    "pero", "por", "puedo", "que", "se", "si", "su", "sus", "tiene", "un", "una", "y", "yo",
+    "the", "of", "and", "to", "is", "in",
+}
+
+_TOKEN_RE = re.compile(r"[0-9a-zñ]+(?:[-_/.][0-9a-zñ]+)*")
+
+def _fold(text: str) -> str:
+    # minúsculas y sin acentos (conserva la ñ)
+    text = text.lower().replace("ñ", "\0")
+    text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return text.replace("\0", "ñ")
+
+def tokenize(text: str) -> List[str]:
+    """
+    Términos del texto. Los códigos compuestos (SKU-123, A/B) se indexan completos
+    y también por partes, para que coincidan tanto "sku-123" como "123".
+    """
+    out: List[str] = []
+    for tok in _TOKEN_RE.findall(_fold(text)):
+        if tok in STOPWORDS:
+            continue
+        out.append(tok)
+        if not tok.isalnum():
+            out.extend(p for p in re.split(r"[-_/.]", tok) if p and p not in STOPWORDS)
+    return out
+
+def term_counts(text: str) -> Tuple[Counter, int]:
+    toks = tokenize(text)
+    return Counter(toks), len(toks)
+
+def bm25_search(
+    store, query: str, top_k: int, allowed: Optional[np.ndarray] = None,
+    doc_stats: Optional[Tuple[int, float]] = None,
+) -> List[Tuple[int, float, int]]:
+    """
+    Devuelve [(vid, score, términos_coincidentes)] ordenado por score BM25.
+    `store` es el ChunkStore (postings + longitudes de documento).
+    `allowed`: ids válidos (ordenados), p. ej. los del snapshot publicado; None = todos.
+    El IDF y la longitud media salen solo de `allowed` (los chunks que el store conserva
+    para otros snapshots no cambian los scores); `doc_stats` = store.doc_stats(allowed)
+    ya calculado.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return []
+    postings = store.postings(terms)
+    if allowed is None:
+        n_docs, avgdl = store.corpus_stats()
+    else:
+        n_docs, avgdl = doc_stats if doc_stats is not None else store.doc_stats(allowed)
+        postings = {term: [r for r, ok in zip(rows, np.isin([r[0] for r in rows], allowed)) if ok]
+                    for term, rows in postings.items()}
+    if not n_docs:
+        return []
+
+    scores: Dict[int, float] = {}
+    matched: Dict[int, int] = {}
+    for term, rows in postings.items():
+        df = len(rows)
+        if not df:
+            continue
+        idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        for vid, tf, dl in rows:
+            norm = tf * (K1 + 1) / (tf + K1 * (1 - B + B * dl / (avgdl or 1)))
+            scores[vid] = scores.get(vid, 0.0) + idf * norm
+            matched[vid] = matched.get(vid, 0) + 1
+
+    ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:top_k]
+    return [(vid, score, matched[vid]) for vid, score in ranked]
+
+def is_strong_match(results: List[Tuple[int, float, int]], query: str, margin: float) -> bool:
+    """
+    Coincidencia léxica "fuerte": el primer resultado contiene todos los términos
+    de la consulta y supera al segundo por `margin` veces (o es el único).
+    """
+    if not results:
+        return False
+    n_terms = len(set(tokenize(query)))
+    _, top, matched = results[0]
+    if matched < n_terms:
+        return False
+    return len(results) == 1 or top >= margin * results[1][1]
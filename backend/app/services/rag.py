@@ -1,134 +1,937 @@
 # backend/app/services/rag.py
-# --- NEW: RAG con OpenAI embeddings + FAISS ---
+# --- NEW: RAG con embeddings (OpenAI o locales) + FAISS ---
 from __future__ import annotations
 import json
+import math
+import os
+import shutil
+import threading
+import time
+import warnings
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
 
 import faiss
 import numpy as np
-from openai import OpenAI
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock entre procesos
+    fcntl = None
 
-from ..config import OPENAI_API_KEY
+from ..config import (
+    RAG_INDEX_TYPE, RAG_IVF_NLIST, RAG_PQ_M, RAG_HNSW_M, RAG_NPROBE, RAG_EF_SEARCH,
+    RAG_SEARCH_MODE, RAG_RRF_K, RAG_LEXICAL_MARGIN, RAG_QUERY_EMBED_TIMEOUT, RAG_DEDUP,
+    RAG_VECTOR_CODEC, RAG_RERANK, RAG_CONTEXT_FETCH, RAG_RELOAD_CHECK_S, RAG_SNAPSHOTS_KEEP,
+)
+from .doc_ingest import iter_doc_files, doc_name, file_sha256, parse_files
+from .embed_cache import cached_embed
+from .embeddings import embed_texts, get_embedder, EmbeddingProvider, EMBEDDING_MODEL, ProgressFn
+from .answer_cache import invalidate as invalidate_answers
+from .chunk_store import ChunkStore, meta_with_sources, meta_without_sources
+from .lexical import bm25_search, is_strong_match
+from .dedup import dedup_chunks
+from .context_builder import assemble_context
 
 # Rutas para índice y metadatos
 DATA_DIR = Path(__file__).resolve().parents[2] / "data"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
-INDEX_PATH = DATA_DIR / "rag.index"
-META_PATH  = DATA_DIR / "rag.meta.json"
+INDEX_PATH = DATA_DIR / "rag.index"               # formato anterior a los snapshots; se copia
+META_PATH  = DATA_DIR / "rag.meta.json"   # formato antiguo; se copia al chunk store
+# --- NEW: texto/metadata de chunks en SQLite, leídos bajo demanda ---
+STORE_PATH = DATA_DIR / "rag.chunks.sqlite"
+# --- NEW: manifiesto {archivo -> hash + ids de vectores} para reindexado incremental ---
+MANIFEST_PATH = DATA_DIR / "rag.manifest.json"     # formato anterior a los snapshots; se migra
+# --- NEW: cada build es un snapshot inmutable (índice + manifiesto) en su propia carpeta;
+# CURRENT apunta al publicado y los workers lo comparan para recargar en caliente ---
+SNAPSHOTS_DIR = DATA_DIR / "rag_snapshots"
+CURRENT_PATH = SNAPSHOTS_DIR / "CURRENT"
+SNAPSHOT_INDEX = "index.faiss"
+SNAPSHOT_MANIFEST = "manifest.json"
+LOCK_PATH = DATA_DIR / "rag.lock"
 
-# Modelo de embeddings (barato y suficiente)
-EMBED_MODEL = "text-embedding-3-small"
+# mmap de los vectores (Flat / IVF-Flat): los workers comparten páginas vía page cache
+if not hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+    warnings.warn(
+        f"faiss {faiss.__version__} no tiene IO_FLAG_MMAP_IFC (faiss-cpu >= 1.9.0): el índice "
+        "se carga completo en memoria en cada worker", RuntimeWarning,
+    )
+_MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | faiss.IO_FLAG_READ_ONLY
 
-_client: OpenAI | None = None
-_index: faiss.IndexFlatIP | None = None
-_meta: List[Dict] = []
+# --- NEW: proveedor de embeddings (EMBED_PROVIDER); su model_id es también la clave de caché ---
+EMBEDDER: EmbeddingProvider = get_embedder()
+EMBED_CACHE_MODEL = EMBEDDER.model_id
 
-def _client_ok() -> bool:
-    return bool(OPENAI_API_KEY and isinstance(OPENAI_API_KEY, str) and len(OPENAI_API_KEY) > 0)
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+# --- NEW: codificación de los vectores dentro del índice (none = float32 completo) ---
+VECTOR_CODECS = ("none", "fp16", "sq8", "pq")
+SEARCH_MODES = ("hybrid", "vector", "lexical")
 
-def _get_client() -> OpenAI:
-    global _client
-    if _client is None:
-        if not _client_ok():
-            raise RuntimeError("OPENAI_API_KEY no configurada")
-        _client = OpenAI(api_key=OPENAI_API_KEY)
-    return _client
+_index: faiss.Index | None = None
+_store = ChunkStore(STORE_PATH)  # id de vector (FAISS) -> chunk
+_index_info: Dict = {"type": "flat"}  # backend con el que se construyó el índice cargado
+_live: Optional[np.ndarray] = None  # ids del snapshot cargado (ordenados): filtran resultados BM25
+_live_stats: Tuple[Optional[np.ndarray], Tuple[int, float]] = (None, (0, 0.0))  # BM25 de esos ids
+_swap_lock = threading.Lock()  # índice, info e ids se publican juntos
+_load_lock = threading.Lock()
+_generation: Optional[str] = None  # snapshot cargado en este worker
+_checked_at = 0.0
+_rejected: Optional[str] = None  # motivo si el snapshot publicado no coincide con el proveedor
+_writer_mutex = threading.RLock()
+_writer_depth = 0
 
-def _embed_texts(texts: List[str]) -> np.ndarray:
+def _embed_api(texts: List[str], timeout: Optional[float] = None) -> np.ndarray:
+    return EMBEDDER.embed(texts, timeout=timeout)
+
+def index_spec(n: int, d: int, kind: Optional[str] = None, codec: Optional[str] = None) -> Dict:
     """
-    --- NEW: genera embeddings con OpenAI (shape: [N, D]) normalizados para IP ---
+    --- NEW: elige backend FAISS y parámetros para N vectores de dimensión d ---
+    IVF/PQ necesitan suficientes vectores para entrenar; si no los hay se usa flat.
+    codec: cómo se guardan los vectores (none | fp16 | sq8 | pq); PQ sin datos
+    suficientes para entrenar queda en none.
     """
-    if not texts:
-        return np.zeros((0, 1536), dtype="float32")  # tamaño no importa si vacío
-    client = _get_client()
+    requested = kind or RAG_INDEX_TYPE
+    if requested not in INDEX_TYPES:
+        raise RuntimeError(f"RAG_INDEX_TYPE inválido: {requested} (usa {', '.join(INDEX_TYPES)})")
+    codec = codec or RAG_VECTOR_CODEC
+    if codec not in VECTOR_CODECS:
+        raise RuntimeError(f"RAG_VECTOR_CODEC inválido: {codec} (usa {', '.join(VECTOR_CODECS)})")
+    m = max(x for x in range(1, min(RAG_PQ_M, d) + 1) if d % x == 0)
+    if codec == "pq" and n < 256:  # PQ de 8 bits entrena 256 centroides por sub-vector
+        codec = "none"
+    # "np": sin entrenamiento polisémico (muy lento y no se usa al buscar)
+    storage = {"none": "Flat", "fp16": "SQfp16", "sq8": "SQ8", "pq": f"PQ{m}np"}[codec]
+    spec = {"type": "flat", "requested": requested, "dim": d, "factory": storage,
+            "codec": codec, "embed_model": EMBEDDER.model_id, "ids": "idmap2"}
+
+    if requested in ("ivf_flat", "ivf_pq"):
+        # faiss pide ~39 puntos de entrenamiento por centroide
+        nlist = min(RAG_IVF_NLIST or int(4 * math.sqrt(n)), n // 39)
+        if requested == "ivf_pq":
+            if nlist >= 1 and n >= 256:
+                spec.update(type="ivf_pq", factory=f"IVF{nlist},PQ{m}np", nlist=nlist, pq_m=m, codec="pq", ids="ivf")
+        elif nlist >= 1:
+            spec.update(type="ivf_flat", factory=f"IVF{nlist},{storage}", nlist=nlist, ids="ivf")
+    elif requested == "hnsw":
+        factory = f"HNSW{RAG_HNSW_M}" + ("" if codec == "none" else f",{storage}")
+        spec.update(type="hnsw", factory=factory, hnsw_m=RAG_HNSW_M)
+    return spec
+
+def _embed_model(info: Dict) -> str:
+    # índices anteriores a los proveedores: OpenAI, con `embed_dims` si se redujeron
+    dims = info.get("embed_dims")
+    return info.get("embed_model") or (f"{EMBEDDING_MODEL}@{dims}" if dims else EMBEDDING_MODEL)
+
+def _embedder_mismatch(info: Dict, d: int) -> Optional[str]:
+    """Motivo por el que el índice no sirve con el proveedor actual (None si coincide)."""
+    model = _embed_model(info)
+    if model != EMBEDDER.model_id or d != EMBEDDER.dim:
+        return (f"El índice se construyó con {model} (dim {d}) y el proveedor actual es "
+                f"{EMBEDDER.model_id} (dim {EMBEDDER.dim}); hay que reindexar.")
+    return None
 
-    # La API 1.x: client.embeddings.create(model=..., input=[...])
-    resp = client.embeddings.create(model=EMBED_MODEL, input=texts)
-    vecs = np.array([d.embedding for d in resp.data], dtype="float32")
+def _is_lossy(info: Dict) -> bool:
+    """El índice guarda vectores comprimidos: se conservan los exactos para el rerank."""
+    return info.get("codec", "none") != "none"
 
-    # Normalizar a unidad para usar IndexFlatIP como cos-sim
-    norms = np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-12
-    vecs = vecs / norms
-    return vecs
+def _new_index(spec: Dict, train_vecs: np.ndarray) -> faiss.Index:
+    inner = faiss.index_factory(spec["dim"], spec["factory"], faiss.METRIC_INNER_PRODUCT)
+    if not inner.is_trained:
+        inner.train(train_vecs)
+    if spec.get("ids") == "ivf":
+        # IVF guarda los ids en sus listas y borra sin compactar: IDMap2 (que mapea por
+        # posición) se desincroniza. El direct map por hash da reconstruct(id) y remove_ids.
+        inner.set_direct_map_type(faiss.DirectMap.Hashtable)
+        return inner
+    # IDMap2: ids estables por chunk, permite borrar vectores de un archivo sin reconstruir
+    return faiss.IndexIDMap2(inner)
+
+def _search_params(info: Dict, nprobe: Optional[int], ef_search: Optional[int], top_k: int):
+    kind = info.get("type", "flat")
+    if kind in ("ivf_flat", "ivf_pq"):
+        return faiss.SearchParametersIVF(nprobe=nprobe or RAG_NPROBE)
+    if kind == "hnsw":
+        return faiss.SearchParametersHNSW(efSearch=max(ef_search or RAG_EF_SEARCH, top_k))
+    return None
+
+def _remove_vectors(
+    index: faiss.Index, stale: List[int], keep: List[int], moved: Optional[Dict[int, int]] = None
+) -> faiss.Index:
+    """
+    Quita ids del índice; HNSW no soporta borrado y se reconstruye con los vectores restantes.
+    moved: {id: id_nuevo} de chunks copiados a otro id (el vector se mueve con ellos).
+    `keep` no puede estar vacío: sin vectores no hay con qué entrenar el codec (ver _sync_locked).
+    """
+    moved = moved or {}
+    source = {new: old for old, new in moved.items()}
+    # con codec se parte de los vectores exactos (reconstruct devolvería la versión comprimida)
+    exact = _store.get_vectors(keep) if _is_lossy(_index_info) else {}
 
-def _save_index(index: faiss.IndexFlatIP, meta: List[Dict]) -> None:
-    faiss.write_index(index, str(INDEX_PATH))
-    META_PATH.write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+    def lookup(vids: List[int]) -> np.ndarray:
+        return np.vstack([exact[v] if v in exact else index.reconstruct(source.get(v, v)) for v in vids])
 
-def _load_index() -> Tuple[faiss.IndexFlatIP | None, List[Dict]]:
-    if not INDEX_PATH.exists() or not META_PATH.exists():
-        return None, []
+    copies = sorted(source)
+    copied = lookup(copies) if copies else None  # antes de quitarlos del índice
     try:
-        idx = faiss.read_index(str(INDEX_PATH))
-        meta = json.loads(META_PATH.read_text(encoding="utf-8"))
-        return idx, meta
+        index.remove_ids(np.array(stale, dtype="int64"))
+    except RuntimeError:
+        vecs = lookup(keep)
+        rebuilt = _new_index(_index_info, vecs)
+        rebuilt.add_with_ids(vecs, np.array(keep, dtype="int64"))
+        return rebuilt
+    if copies:
+        index.add_with_ids(copied, np.array(copies, dtype="int64"))
+    return index
+
+def _snapshot_dir(version: str) -> Path:
+    return SNAPSHOTS_DIR / version
+
+def _read_manifest(path: Path) -> Optional[Dict]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
     except Exception:
-        return None, []
+        return None
+
+def _load_manifest(version: Optional[str] = None) -> Optional[Dict]:
+    """Manifiesto del snapshot `version` (por defecto, el publicado en CURRENT)."""
+    version = version if version is not None else _read_current()
+    if not version:
+        return None
+    return _read_manifest(_snapshot_dir(version) / SNAPSHOT_MANIFEST)
 
-def ensure_loaded() -> bool:
+def _write_atomic(path: Path, write) -> None:
+    # archivo nuevo + rename: quien lea el anterior lo sigue viendo intacto
+    tmp = path.with_name(path.name + ".tmp")
+    write(tmp)
+    os.replace(tmp, path)
+
+def _read_current() -> str:
+    try:
+        return CURRENT_PATH.read_text(encoding="utf-8").strip()
+    except OSError:
+        return ""
+
+def _point_current(version: str) -> None:
+    """Cambio atómico del snapshot publicado ("" = sin índice)."""
+    SNAPSHOTS_DIR.mkdir(parents=True, exist_ok=True)
+    _write_atomic(CURRENT_PATH, lambda p: p.write_text(version, encoding="utf-8"))
+
+def migrate_legacy_index() -> None:
+    """
+    rag.index + rag.manifest.json sueltos (antes de los snapshots) pasan a ser el primer snapshot.
+    Se copian y los originales quedan: rag.index y rag.meta.json vienen en el repo (índice
+    inicial de backend/docs) y el árbol no debe quedar con archivos borrados.
+    Toma el writer_lock: se llama al arrancar y antes de _load_lock, nunca con él tomado
+    (sync_index y rollback toman los dos en el orden inverso).
+    """
+    if CURRENT_PATH.exists() or not INDEX_PATH.exists():
+        return
+    with writer_lock():
+        if CURRENT_PATH.exists() or not INDEX_PATH.exists():
+            return  # otro worker ya migró
+        if META_PATH.exists() and _store.count() == 0:
+            _migrate_legacy_meta()
+        version = _new_version()
+        tmp = SNAPSHOTS_DIR / f".tmp-{version}"
+        tmp.mkdir(parents=True)
+        shutil.copyfile(INDEX_PATH, tmp / SNAPSHOT_INDEX)
+        if MANIFEST_PATH.exists():
+            shutil.copyfile(MANIFEST_PATH, tmp / SNAPSHOT_MANIFEST)
+        os.rename(tmp, _snapshot_dir(version))
+        _point_current(version)
+
+def _new_version() -> str:
+    # número creciente (ordena aunque haya varios builds en el mismo segundo) + fecha legible
+    seqs = [int(p.name.split("-")[0]) for p in SNAPSHOTS_DIR.glob("[0-9]*-*") if p.name.split("-")[0].isdigit()]
+    return f"{max(seqs, default=0) + 1:06d}-{time.strftime('%Y%m%d-%H%M%S')}"
+
+def _save_index(index: faiss.Index, manifest: Dict) -> str:
+    """
+    Escribe índice y manifiesto como un snapshot nuevo e inmutable y mueve CURRENT a él.
+    La carpeta se completa aparte y se renombra entera: nadie ve un índice sin su manifiesto.
+    Devuelve la versión publicada (la detectan los demás workers).
     """
-    --- NEW: carga índice/metadata a memoria si existen ---
+    version = _new_version()
+    tmp = SNAPSHOTS_DIR / f".tmp-{version}"
+    tmp.mkdir(parents=True)
+    faiss.write_index(index, str(tmp / SNAPSHOT_INDEX))
+    (tmp / SNAPSHOT_MANIFEST).write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.rename(tmp, _snapshot_dir(version))
+    _point_current(version)
+    return version
+
+def _snapshot_ids(manifest: Optional[Dict]) -> Optional[np.ndarray]:
+    """Ids de vector del snapshot (ordenados); None si es un índice antiguo sin manifiesto."""
+    if not manifest or "files" not in manifest:
+        return None
+    ids = [vid for entry in manifest["files"].values() for vid in entry.get("ids", [])]
+    return np.unique(np.array(ids, dtype="int64"))
+
+def _prune_snapshots() -> None:
+    """
+    Conserva los últimos RAG_SNAPSHOTS_KEEP snapshots (y siempre el publicado) y borra del
+    chunk store los vectores que ya no usa ninguno. Llamar con el writer_lock tomado.
+    Un worker que aún tenga mapeado un snapshot borrado lo sigue leyendo (Linux) hasta recargar.
+    """
+    current = _read_current()
+    versions = [v["version"] for v in list_snapshots()]
+    keep = set(versions[:max(1, RAG_SNAPSHOTS_KEEP)])
+    if current:
+        keep.add(current)
+    for p in SNAPSHOTS_DIR.iterdir():
+        if p.is_dir() and p.name not in keep:
+            shutil.rmtree(p, ignore_errors=True)
+
+    used = set()
+    for version in keep:
+        ids = _snapshot_ids(_load_manifest(version))
+        if ids is None:
+            return  # snapshot migrado sin manifiesto: no se sabe qué usa, no se borra nada
+        used.update(ids.tolist())
+    _store.delete_many(v for v in _store.vids() if v not in used)
+
+def embedder_status() -> Dict:
+    """Proveedor de embeddings activo y, si lo hay, por qué se rechazó el índice publicado."""
+    return {"model": EMBEDDER.model_id, "dim": EMBEDDER.dim, "remote": EMBEDDER.remote,
+            "index_error": _rejected}
+
+def list_snapshots() -> List[Dict]:
     """
-    global _index, _meta
-    if _index is not None and _meta:
+    --- NEW: snapshots conservados, del más nuevo al más viejo ---
+    [{version, created_at, chunks, files, current}]
+    """
+    if not SNAPSHOTS_DIR.exists():
+        return []
+    current = _read_current()
+    out = []
+    for p in sorted(SNAPSHOTS_DIR.iterdir(), key=lambda p: p.name, reverse=True):
+        if not p.is_dir() or p.name.startswith("."):
+            continue
+        manifest = _read_manifest(p / SNAPSHOT_MANIFEST) or {}
+        ids = _snapshot_ids(manifest)
+        out.append({
+            "version": p.name,
+            "created_at": p.stat().st_mtime,
+            "chunks": int(ids.size) if ids is not None else None,
+            "files": len(manifest.get("files", {})),
+            "current": p.name == current,
+        })
+    return out
+
+def rollback(version: str) -> Optional[Dict]:
+    """
+    --- NEW: vuelve a publicar un snapshot conservado (sin re-embeber nada) ---
+    Devuelve el snapshot publicado o None si no existe.
+    """
+    with writer_lock():
+        if version not in {s["version"] for s in list_snapshots()}:
+            return None
+        _point_current(version)
+        ensure_loaded(fresh=True)
+    invalidate_answers()
+    return next(s for s in list_snapshots() if s["version"] == version)
+
+@contextmanager
+def writer_lock():
+    """
+    Un solo escritor a la vez entre todos los workers (flock sobre data/rag.lock).
+    Reentrante dentro del proceso: sync_index -> migrate_legacy_index no se bloquea.
+    rag_jobs lo toma para reclamar un trabajo de la cola y correrlo.
+    """
+    global _writer_depth
+    with _writer_mutex:
+        f = open(LOCK_PATH, "a") if _writer_depth == 0 else None
+        _writer_depth += 1
+        try:
+            if f is not None and fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+        finally:
+            _writer_depth -= 1
+            if f is not None:
+                f.close()  # libera el flock
+
+def _publish(
+    index: faiss.Index | None, info: Dict, live: Optional[np.ndarray] = None,
+    generation: Optional[str] = None,
+) -> None:
+    """
+    Reemplaza el índice en memoria de una sola vez (doble buffer: las búsquedas en curso
+    terminan con el snapshot anterior, que se libera cuando la última lo suelta).
+    """
+    global _index, _index_info, _live, _generation
+    with _swap_lock:
+        _index, _index_info = index, info
+        _live = live
+        if generation is not None:
+            _generation = generation
+
+def _writable_copy(index: faiss.Index) -> faiss.Index:
+    # clone_index conserva la vista sobre el mmap (solo lectura): se copia serializando
+    return faiss.deserialize_index(faiss.serialize_index(index))
+
+def _is_live(live: Optional[np.ndarray], vid: int) -> bool:
+    if live is None:
         return True
-    idx, meta = _load_index()
-    if idx is None or not meta:
-        _index = None
-        _meta = []
-        return False
-    _index = idx
-    _meta = meta
+    pos = int(np.searchsorted(live, vid))
+    return pos < live.size and int(live[pos]) == vid
+
+def _publish_saved(index: faiss.Index, manifest: Dict, version: str) -> None:
+    # se publica la versión mapeada del disco (la misma que compartirán los demás workers)
+    _publish(_load_index(version) or index, manifest["index"], _snapshot_ids(manifest), version)
+    _prune_snapshots()
+
+def _lexical_search(query: str, top_k: int) -> List[Tuple[int, float, int]]:
+    """BM25 sobre el snapshot publicado (estadísticas de documentos calculadas una vez por snapshot)."""
+    global _live_stats
+    live = _current()[2]
+    if live is None:
+        return bm25_search(_store, query, top_k)
+    cached, stats = _live_stats
+    if cached is not live:
+        stats = _store.doc_stats(live.tolist())
+        _live_stats = (live, stats)
+    return bm25_search(_store, query, top_k, allowed=live, doc_stats=stats)
+
+def _current() -> Tuple[faiss.Index | None, Dict, Optional[np.ndarray]]:
+    with _swap_lock:
+        return _index, _index_info, _live
+
+def _clear_index() -> None:
+    # sin documentos: no se publica índice, pero los snapshots anteriores siguen disponibles
+    _point_current("")
+    _publish(None, {"type": "flat"}, generation="")
+    _prune_snapshots()
+    invalidate_answers()
+
+def _migrate_legacy_meta() -> None:
+    """Importa una sola vez el antiguo rag.meta.json (lista completa de chunks) al chunk store."""
+    rows = json.loads(META_PATH.read_text(encoding="utf-8"))
+    # índices antiguos (sin "vid"): el id es la posición en IndexFlatIP
+    _store.add_many((int(r.pop("vid", pos)), r) for pos, r in enumerate(rows))
+
+def _load_index(version: str) -> faiss.Index | None:
+    path = _snapshot_dir(version) / SNAPSHOT_INDEX
+    if not version or not path.exists():
+        return None
+    try:
+        return faiss.read_index(str(path), _MMAP_FLAGS)
+    except Exception:
+        return None
+
+def ensure_loaded(fresh: bool = False) -> bool:
+    """
+    --- NEW: carga el snapshot publicado (índice mapeado en memoria); los chunks se leen bajo demanda ---
+    Si otro worker publicó o hizo rollback (cambió CURRENT) lo recarga en caliente.
+    La comprobación se hace como mucho cada RAG_RELOAD_CHECK_S segundos (fresh=True la fuerza).
+    """
+    global _checked_at, _rejected
+    if not fresh and (_index is not None or _rejected) and time.monotonic() - _checked_at < RAG_RELOAD_CHECK_S:
+        return _index is not None
+    migrate_legacy_index()  # fuera de _load_lock (toma el writer_lock)
+    with _load_lock:
+        _checked_at = time.monotonic()
+        version = _read_current()
+        if version == _generation and (_rejected or (_index is not None and _index.ntotal > 0)):
+            return _index is not None
+        reloaded = _generation is not None
+        _rejected = None
+        idx = _load_index(version)
+        if idx is None or idx.ntotal == 0:
+            _publish(None, {"type": "flat"}, generation=version)
+            return False
+        # índice y manifiesto salen de la misma carpeta: siempre coinciden
+        manifest = _load_manifest(version) or {}
+        info = manifest.get("index") or {"type": "flat"}
+        # --- NEW: vectores de otro modelo/dimensión no se comparan con las consultas ---
+        _rejected = _embedder_mismatch(info, idx.d)
+        if _rejected:
+            _publish(None, {"type": "flat"}, generation=version)
+            return False
+        _publish(idx, info, _snapshot_ids(manifest), version)
+    if reloaded:
+        # las respuestas cacheadas en este worker venían del índice anterior
+        invalidate_answers()
     return True
 
-def build_index(chunks: List[Dict]) -> None:
+def _add_file_refs(files: Dict[str, Dict], vid: int, sources: List[Dict], hashes: Dict[str, str]) -> None:
+    """Anota el vector en cada archivo que lo referencia (un chunk deduplicado puede tener varios)."""
+    for src in sources:
+        fn = src.get("filename") or ""
+        entry = files.setdefault(fn, {"sha256": hashes.get(fn), "ids": []})
+        if vid not in entry["ids"][-1:]:
+            entry["ids"].append(vid)
+
+def _sources(c: Dict) -> List[Dict]:
+    meta = c.get("meta", {})
+    return meta.get("sources") or [meta]
+
+def build_index(
+    chunks: List[Dict],
+    file_hashes: Optional[Dict[str, str]] = None,
+    progress: Optional[ProgressFn] = None,
+    recursive: bool = False,
+    vectors: Optional[Dict[str, np.ndarray]] = None,
+) -> Dict:
     """
     --- NEW: reconstruye el índice desde chunks [{id, text, meta}] ---
+    file_hashes: {filename: sha256}; si falta, el próximo sync re-procesa ese archivo
+    progress: callback(hechos, total) del embebido por lotes
+    recursive: los documentos incluyen subcarpetas (queda en el manifiesto)
+    vectors: {texto: vector} ya calculados (ver embed_texts)
+    Devuelve {"chunks": vectores indexados, "deduplicated": chunks colapsados}.
     """
     if not chunks:
         raise RuntimeError("No hay chunks para indexar")
 
+    sigs, deduplicated = None, 0
+    if RAG_DEDUP:
+        chunks, sigs, _, deduplicated = dedup_chunks(chunks)
+
     texts = [c["text"] for c in chunks]
-    vecs = _embed_texts(texts)  # [N, D]
+    vecs = embed_texts(texts, progress, known=vectors)  # [N, D]
 
     # FAISS IP (dot product) con vectores normalizados ~ cos-sim
-    d = vecs.shape[1]
-    index = faiss.IndexFlatIP(d)
-    index.add(vecs)
+    spec = index_spec(len(chunks), vecs.shape[1])
+    index = _new_index(spec, vecs)
+    # ids nuevos (después de los actuales): el índice anterior sigue resolviendo sus chunks
+    first = max(int((_load_manifest() or {}).get("next_id", 0)), _store.next_vid())
+    ids = np.arange(first, first + len(chunks), dtype="int64")
+    index.add_with_ids(vecs, ids)
+
+    files: Dict[str, Dict] = {}
+    for vid, c in zip(ids.tolist(), chunks):
+        _add_file_refs(files, vid, _sources(c), file_hashes or {})
+    manifest = {"next_id": first + len(chunks), "index": spec, "files": files, "recursive": recursive}
+
+    _store.add_many(zip(ids.tolist(), chunks))
+    if sigs:
+        _store.add_signatures(zip(ids.tolist(), sigs))
+    if _is_lossy(spec):
+        _store.add_vectors(zip(ids.tolist(), vecs))
+    version = _save_index(index, manifest)
+
+    # refresca en memoria; los chunks del índice anterior se van al podar sus snapshots
+    _publish_saved(index, manifest, version)
+    invalidate_answers()
+    return {"chunks": len(chunks), "deduplicated": deduplicated}
 
-    _save_index(index, chunks)
+def _parse_report(parsed: List[Dict]) -> Dict:
+    """Tiempos de parseo por archivo (ms) y archivos que fallaron o excedieron el timeout."""
+    return {
+        "parse_ms": {r["filename"]: r["parse_ms"] for r in parsed},
+        "failed_files": {r["filename"]: r["error"] for r in parsed if r["error"]},
+    }
 
-    # refresca en memoria
-    global _index, _meta
-    _index = index
-    _meta = chunks
+def _parse_docs(
+    paths: Dict[str, Path], names: List[str], hashes: Dict[str, str], parsed: Optional[Dict[str, Dict]]
+) -> List[Dict]:
+    """parse_files de `names`, reutilizando los resultados de `parsed` con el mismo sha256."""
+    reuse = {fn: r for fn, r in (parsed or {}).items() if r.get("sha256") == hashes.get(fn)}
+    todo = [fn for fn in names if fn not in reuse]
+    fresh = dict(zip(todo, parse_files([paths[fn] for fn in todo], names=todo)))
+    return [reuse[fn] if fn in reuse else fresh[fn] for fn in names]
 
-def search(query: str, top_k: int = 4) -> List[Dict]:
+def sync_index(
+    docs_dir: Path,
+    full: bool = False,
+    progress: Optional[ProgressFn] = None,
+    recursive: Optional[bool] = None,
+    parsed: Optional[Dict[str, Dict]] = None,
+    vectors: Optional[Dict[str, np.ndarray]] = None,
+) -> Dict:
     """
-    --- NEW: búsqueda; retorna hits con score y metadata ---
+    --- NEW: reindexado incremental ---
+    Compara el hash de cada archivo con el manifiesto: solo parsea/embebe archivos
+    nuevos o modificados y elimina del índice los vectores de archivos borrados.
+    Sin manifiesto (índice antiguo) o con full=True hace una reconstrucción completa.
+    Un archivo que no se pudo parsear conserva sus vectores anteriores y se reintenta
+    en el próximo sync.
+    recursive: incluir subcarpetas; None = lo que diga el manifiesto (False si no hay)
+    parsed: {filename: resultado de parse_files + "sha256"} ya parseados (ingest_docs);
+    se usan solo si el archivo no cambió desde entonces
+    vectors: {texto: vector} ya calculados (ver embed_texts)
     """
-    if not ensure_loaded():
-        return []
-    if not query.strip():
+    with writer_lock():
+        # parte de lo último publicado, aunque lo haya escrito otro worker
+        ensure_loaded(fresh=True)
+        return _sync_locked(docs_dir, full, progress, recursive, parsed, vectors)
+
+def _orphaned_sources(files: Dict[str, Dict], dropped: List[str]) -> List[str]:
+    """
+    Archivos que se quedan sin el dueño de un chunk compartido: referencian un vector
+    deduplicado cuyo archivo representativo está en `dropped` (o en otro de la lista:
+    reprocesar un archivo también suelta los chunks que representaba).
+    """
+    gone, out = set(dropped), []
+    while True:
+        stale = {vid for fn in gone for vid in files.get(fn, {}).get("ids", [])}
+        kept = {fn: entry for fn, entry in files.items() if fn not in gone}
+        shared = stale.intersection(vid for entry in kept.values() for vid in entry["ids"])
+        orphaned = {vid for vid, c in _store.get_many(shared).items() if c["meta"].get("filename") in gone}
+        more = sorted(fn for fn, entry in kept.items() if orphaned.intersection(entry["ids"]))
+        if not more:
+            return out
+        gone.update(more)
+        out.extend(more)
+
+def docs_recursive(recursive: Optional[bool] = None) -> bool:
+    """Si se recorren subcarpetas: `recursive` o, si es None, lo del índice publicado (False si no hay)."""
+    if recursive is not None:
+        return recursive
+    return bool((_load_manifest() or {}).get("recursive", False))
+
+def _incremental_manifest(full: bool) -> Optional[Dict]:
+    """
+    Manifiesto publicado si el sync puede ser incremental; None si hay que reconstruir:
+    full, sin índice o con un índice que ya no corresponde a la configuración.
+    """
+    manifest = None if full else _load_manifest()
+    if manifest is None or not ensure_loaded():
+        return None
+    # cambió RAG_INDEX_TYPE o ya hay vectores suficientes para entrenar el backend pedido
+    built = manifest.get("index") or {"type": "flat", "requested": "flat"}
+    built.setdefault("codec", "pq" if built.get("type") == "ivf_pq" else "none")
+    built["embed_model"] = _embed_model(built)
+    # IVF dentro de IDMap2 (índices anteriores) no soporta borrados: se reconstruye
+    built.setdefault("ids", "idmap2")
+    wanted = index_spec(_index.ntotal, built.get("dim", 1))
+    if any(built.get(k, 0) != wanted[k] for k in ("requested", "type", "codec", "embed_model", "ids")):
+        return None
+    return manifest
+
+def _rebuild(
+    chunks: List[Dict], hashes: Dict[str, str], progress: Optional[ProgressFn], recursive: bool,
+    vectors: Optional[Dict[str, np.ndarray]],
+) -> Optional[Dict]:
+    """build_index con `chunks`; sin chunks deja el índice vacío y devuelve None."""
+    if not chunks:
+        _clear_index()
+        return None
+    return build_index(chunks, file_hashes=hashes, progress=progress, recursive=recursive, vectors=vectors)
+
+def _full_sync(
+    paths: Dict[str, Path], hashes: Dict[str, str], preparsed: Optional[Dict[str, Dict]],
+    progress: Optional[ProgressFn], recursive: bool, vectors: Optional[Dict[str, np.ndarray]],
+) -> Dict:
+    parsed = _parse_docs(paths, list(paths), hashes, preparsed)
+    report = _parse_report(parsed)
+    built = _rebuild([c for r in parsed for c in r["chunks"]], hashes, progress, recursive, vectors)
+    if built is None:
+        return {"full": True, "files": 0, "added_files": [], "removed_files": [],
+                "embedded": 0, "chunks": 0, **report}
+    return {"full": True, "files": len(paths),
+            "added_files": sorted(fn for fn in paths if fn not in report["failed_files"]),
+            "removed_files": [], "embedded": built["chunks"], "chunks": built["chunks"],
+            "deduplicated": built["deduplicated"], **report}
+
+def _plan_removals(
+    files: Dict[str, Dict], gone: List[str], paths: Dict[str, Path], hashes: Dict[str, str],
+    preparsed: Optional[Dict[str, Dict]],
+) -> Dict:
+    """
+    Paso 1: archivos que salen del índice. `gone` (borrados y modificados) más los que
+    compartían un chunk cuyo representativo está entre ellos: el texto y el vector de un
+    chunk deduplicado son los de ese archivo, así que se procesan de nuevo con su propio texto.
+    Devuelve {files, reparse, parsed, dropped, stale, shared}: `files` sin los que salen,
+    `parsed` el parseo de `reparse`, `stale` los ids que ya no usa nadie y `shared` los
+    que otro archivo conserva.
+    """
+    files = {fn: dict(v) for fn, v in files.items()}
+    reparse = _orphaned_sources(files, gone)
+    parsed = _parse_docs(paths, reparse, hashes, preparsed) if reparse else []
+    dropped = gone + reparse
+    stale = {vid for fn in dropped for vid in files.get(fn, {}).get("ids", [])}
+    for fn in dropped:
+        files.pop(fn, None)
+    # vectores deduplicados que otro archivo sigue usando (siempre su representativo)
+    shared = stale.intersection(vid for entry in files.values() for vid in entry["ids"])
+    return {"files": files, "reparse": reparse, "parsed": parsed, "dropped": dropped,
+            "stale": stale - shared, "shared": shared}
+
+def _dedup_new_chunks(chunks: List[Dict], stale: set, shared: set, dropped: List[str]) -> Dict:
+    """
+    Paso 2: metadata nueva de los chunks publicados que cambian de referencias y chunks
+    nuevos sin los casi duplicados. Un vector compartido se queda sin las referencias de
+    `dropped`; un chunk nuevo que duplica uno vivo (fuera de `stale`) no se embebe, solo
+    suma sus referencias a ese.
+    Devuelve {chunks, sigs, existing: {id: sources}, metas: {id: meta}, deduplicated}.
+    """
+    current = _store.get_many(shared)
+    metas = {vid: meta_without_sources(c["meta"], dropped) for vid, c in current.items()}
+    sigs, existing, deduplicated = None, {}, 0
+    if RAG_DEDUP and chunks:
+        live = _current()[2]
+        chunks, sigs, existing, deduplicated = dedup_chunks(
+            chunks,
+            candidates=lambda keys: {v: s for v, s in _store.candidates(keys).items()
+                                     if v not in stale and _is_live(live, v)},
+        )
+        # duplicados de vectores ya indexados: solo se agregan las referencias
+        current.update(_store.get_many(v for v in existing if v not in current))
+        for vid, sources in existing.items():
+            metas[vid] = meta_with_sources(metas.get(vid, current[vid]["meta"]), sources)
+    return {"chunks": chunks, "sigs": sigs, "existing": existing, "metas": metas,
+            "deduplicated": deduplicated}
+
+def _move_changed_chunks(
+    files: Dict[str, Dict], metas: Dict[int, Dict], existing: Dict[int, List[Dict]],
+    hashes: Dict[str, str], next_id: int,
+) -> Dict[int, int]:
+    """
+    Paso 3: la fila publicada no se toca (la siguen usando los snapshots conservados): cada
+    chunk de `metas` pasa a un id nuevo, desde next_id, con la metadata actualizada.
+    Reescribe los ids en `files`, suma las referencias de `existing` y devuelve {id: id_nuevo}.
+    """
+    moved = {vid: next_id + i for i, vid in enumerate(sorted(metas))}
+    _store.copy_chunks((old, new, metas[old]) for old, new in moved.items())
+    for entry in files.values():
+        entry["ids"] = [moved.get(vid, vid) for vid in entry["ids"]]
+    for vid, sources in existing.items():
+        _add_file_refs(files, moved[vid], sources, hashes)
+    return moved
+
+def _update_vectors(
+    files: Dict[str, Dict], stale: set, moved: Dict[int, int], chunks: List[Dict],
+    sigs: Optional[List], next_id: int, hashes: Dict[str, str], progress: Optional[ProgressFn],
+    vectors: Optional[Dict[str, np.ndarray]],
+) -> Tuple[faiss.Index, int]:
+    """
+    Paso 4: copia del índice publicado sin los vectores de `stale` (los de `moved` pasan a
+    su id nuevo) y con `chunks` embebidos desde next_id, anotados en `files`.
+    Devuelve (índice, next_id).
+    """
+    keep = sorted({vid for entry in files.values() for vid in entry["ids"]})
+    # se trabaja sobre una copia: search() sigue usando el índice anterior hasta el swap
+    index = _writable_copy(_index)
+    if stale:
+        index = _remove_vectors(index, sorted(stale), keep, moved)
+    if chunks:
+        vecs = embed_texts([c["text"] for c in chunks], progress, known=vectors)
+        ids = np.arange(next_id, next_id + len(chunks), dtype="int64")
+        index.add_with_ids(vecs, ids)
+        next_id += len(chunks)
+        _store.add_many(zip(ids.tolist(), chunks))
+        if sigs:
+            _store.add_signatures(zip(ids.tolist(), sigs))
+        if _is_lossy(_index_info):
+            _store.add_vectors(zip(ids.tolist(), vecs))
+        for vid, c in zip(ids.tolist(), chunks):
+            _add_file_refs(files, vid, _sources(c), hashes)
+    return index, next_id
+
+def _publish_sync(index: faiss.Index, files: Dict[str, Dict], next_id: int, recursive: bool) -> None:
+    """Paso 5: guarda el índice como snapshot nuevo y lo publica (vacío: sin índice)."""
+    if index.ntotal == 0:
+        _clear_index()
+        return
+    manifest = {"next_id": next_id, "index": _index_info, "files": files, "recursive": recursive}
+    # los chunks de `stale` quedan en el store mientras algún snapshot conservado los use
+    _publish_saved(index, manifest, _save_index(index, manifest))
+    invalidate_answers()
+
+def _sync_locked(
+    docs_dir: Path,
+    full: bool,
+    progress: Optional[ProgressFn],
+    recursive: Optional[bool],
+    preparsed: Optional[Dict[str, Dict]] = None,
+    vectors: Optional[Dict[str, np.ndarray]] = None,
+) -> Dict:
+    recursive = docs_recursive(recursive)
+    paths = {doc_name(p, docs_dir): p for p in iter_doc_files(docs_dir, recursive)}
+    hashes = {name: file_sha256(p) for name, p in paths.items()}
+
+    manifest = _incremental_manifest(full)
+    if manifest is None:
+        return _full_sync(paths, hashes, preparsed, progress, recursive, vectors)
+
+    files: Dict[str, Dict] = manifest.get("files", {})
+    removed = [fn for fn in files if fn not in paths]
+    changed = [fn for fn in paths if files.get(fn, {}).get("sha256") != hashes[fn]]
+    parsed = _parse_docs(paths, changed, hashes, preparsed)
+    report = _parse_report(parsed)
+    changed = [fn for fn in changed if fn not in report["failed_files"]]
+    stats = {"full": False, "files": len(paths), "added_files": changed,
+             "removed_files": removed, "embedded": 0, "deduplicated": 0, **report}
+    if not removed and not changed:
+        stats["chunks"] = int(_index.ntotal)
+        return stats
+
+    plan = _plan_removals(files, removed + changed, paths, hashes, preparsed)
+    parsed += plan["parsed"]
+    for key, value in _parse_report(plan["parsed"]).items():
+        stats[key].update(value)
+    stats["reprocessed_files"] = plan["reparse"]
+    files = plan["files"]
+    new_chunks = [c for r in parsed if not r["error"] for c in r["chunks"]]
+    if not any(entry["ids"] for entry in files.values()):
+        # no queda ningún vector anterior: en vez de reentrenar el codec sin datos se
+        # construye de cero con lo nuevo (y el spec se dimensiona para esos chunks)
+        stats["full"] = True
+        built = _rebuild(new_chunks, hashes, progress, recursive, vectors)
+        if built is None:
+            stats["chunks"] = 0
+        else:
+            stats.update(embedded=built["chunks"], chunks=built["chunks"], deduplicated=built["deduplicated"])
+        return stats
+
+    dedup = _dedup_new_chunks(new_chunks, plan["stale"], plan["shared"], plan["dropped"])
+    stats["deduplicated"] = dedup["deduplicated"]
+    # tras un rollback el store ya tiene ids de snapshots más nuevos: no se reutilizan
+    next_id = max(int(manifest.get("next_id", 0)), _store.next_vid())
+    moved = _move_changed_chunks(files, dedup["metas"], dedup["existing"], hashes, next_id)
+    next_id += len(moved)
+    index, next_id = _update_vectors(files, plan["stale"] | set(moved), moved, dedup["chunks"],
+                                     dedup["sigs"], next_id, hashes, progress, vectors)
+    for fn in changed + plan["reparse"]:
+        # archivos sin texto extraíble también quedan registrados (no se re-parsean)
+        files.setdefault(fn, {"sha256": hashes[fn], "ids": []})
+    for fn in stats["failed_files"]:
+        if fn in plan["reparse"]:
+            files[fn] = {"sha256": None, "ids": []}  # perdió sus vectores: se reintenta
+
+    stats["embedded"] = len(dedup["chunks"])
+    stats["chunks"] = int(index.ntotal)
+    _publish_sync(index, files, next_id, recursive)
+    return stats
+
+def embed_query(query: str) -> np.ndarray:
+    """
+    --- NEW: embedding de la consulta ([1, D]); se puede reutilizar en search(qvec=...) ---
+    Con timeout corto: si la API tarda, la búsqueda híbrida sigue con BM25.
+    """
+    if not EMBEDDER.remote:
+        return _embed_api([query])
+    return cached_embed(
+        [query], EMBED_CACHE_MODEL, lambda miss: _embed_api(miss, timeout=RAG_QUERY_EMBED_TIMEOUT)
+    )
+
+def _vector_ranking(
+    qv: np.ndarray, k: int, nprobe: Optional[int], ef_search: Optional[int]
+) -> List[Tuple[int, float]]:
+    index, info, _ = _current()
+    if index is None:
         return []
+    # índice comprimido: se piden más candidatos y se reordenan con los vectores exactos
+    fetch = k * RAG_RERANK if (RAG_RERANK > 1 and _is_lossy(info)) else k
+    params = _search_params(info, nprobe, ef_search, fetch)
+    D, I = index.search(qv, fetch, params=params)  # scores e ids de vector
+    ranked = [(vid, float(score)) for score, vid in zip(D[0].tolist(), I[0].tolist()) if vid >= 0]
+    if fetch > k and ranked:
+        exact = _store.get_vectors(vid for vid, _ in ranked)
+        q = qv.reshape(-1)
+        ranked = sorted(
+            ((vid, float(exact[vid] @ q) if vid in exact else score) for vid, score in ranked),
+            key=lambda vs: vs[1], reverse=True,
+        )
+    return ranked[:k]
 
-    qv = _embed_texts([query])  # [1, D]
-    D, I = _index.search(qv, top_k)  # scores y posiciones
+def _rrf(rankings: List[List[int]]) -> List[Tuple[int, float]]:
+    """Reciprocal rank fusion: score = sum(1 / (k + posición))."""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for pos, vid in enumerate(ranking):
+            scores[vid] = scores.get(vid, 0.0) + 1.0 / (RAG_RRF_K + pos + 1)
+    return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
 
+def _hits(ranked: List[Tuple[int, float]], retrieval: str) -> List[Dict]:
+    # solo se leen del chunk store los top-k
+    found = _store.get_many(vid for vid, _ in ranked)
     hits = []
-    for score, idx in zip(D[0].tolist(), I[0].tolist()):
-        if idx < 0 or idx >= len(_meta):
+    for vid, score in ranked:
+        item = found.get(vid)
+        if item is None:
             continue
-        item = _meta[idx]
         hits.append({
             "score": float(score),
             "id": item.get("id"),
             "text": item.get("text"),
-            "meta": item.get("meta", {})
+            "meta": item.get("meta", {}),
+            "retrieval": retrieval,
         })
     return hits
 
+def search_with_vector(
+    query: str,
+    top_k: int = 4,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    qvec: Optional[np.ndarray] = None,
+    mode: Optional[str] = None,
+) -> Tuple[List[Dict], Optional[np.ndarray]]:
+    """
+    --- NEW: como search(), pero devuelve también el embedding de la consulta
+    (None si no hizo falta calcularlo) para reutilizarlo, p. ej. en la caché de respuestas ---
+    """
+    mode = mode or RAG_SEARCH_MODE
+    if mode not in SEARCH_MODES:
+        raise RuntimeError(f"Modo de búsqueda inválido: {mode} (usa {', '.join(SEARCH_MODES)})")
+    if not ensure_loaded():
+        if _rejected:
+            raise RuntimeError(_rejected)
+        return [], qvec
+    if not query.strip():
+        return [], qvec
+
+    if mode == "lexical":
+        lex = _lexical_search(query, top_k)
+        return _hits([(vid, score) for vid, score, _ in lex], "lexical"), qvec
+
+    if mode == "hybrid":
+        lex = _lexical_search(query, top_k * 4)
+        lex_ranked = [(vid, score) for vid, score, _ in lex]
+        # atajo: coincidencia léxica clara (n.º de pedido, SKU, nombre de política) -> sin embeddings
+        if qvec is None and is_strong_match(lex, query, RAG_LEXICAL_MARGIN):
+            return _hits(lex_ranked[:top_k], "lexical"), None
+        if qvec is None:
+            try:
+                qvec = embed_query(query)
+            except Exception:
+                if not lex_ranked:
+                    raise
+                # API de embeddings lenta o caída: se responde solo con BM25
+                return _hits(lex_ranked[:top_k], "lexical"), None
+        vec = _vector_ranking(qvec, top_k * 4, nprobe, ef_search)
+        fused = _rrf([[vid for vid, _ in vec], [vid for vid, _ in lex_ranked]])
+        return _hits(fused[:top_k], "hybrid"), qvec
+
+    qv = qvec if qvec is not None else embed_query(query)  # [1, D]
+    return _hits(_vector_ranking(qv, top_k, nprobe, ef_search), "vector"), qv
+
+def search(
+    query: str,
+    top_k: int = 4,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    qvec: Optional[np.ndarray] = None,
+    mode: Optional[str] = None,
+) -> List[Dict]:
+    """
+    --- NEW: búsqueda; retorna hits con score y metadata ---
+    nprobe (IVF) / ef_search (HNSW): precisión vs. latencia por consulta
+    qvec: embedding ya calculado de la consulta (evita embeber dos veces)
+    mode: "hybrid" (BM25 + vectores con RRF), "vector" o "lexical" (sin llamada a la API)
+    """
+    return search_with_vector(query, top_k, nprobe, ef_search, qvec, mode)[0]
+
+def search_context(
+    query: str,
+    top_k: int = 4,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    qvec: Optional[np.ndarray] = None,
+    mode: Optional[str] = None,
+) -> Tuple[List[Dict], str, Optional[np.ndarray], Dict]:
+    """
+    --- NEW: búsqueda + contexto para el prompt ---
+    Trae top_k * RAG_CONTEXT_FETCH candidatos, elige top_k con MMR, funde chunks vecinos
+    y corta en RAG_CONTEXT_TOKENS. Devuelve (hits_elegidos, contexto, qvec, stats).
+    """
+    hits, qvec = search_with_vector(query, top_k * max(1, RAG_CONTEXT_FETCH), nprobe, ef_search, qvec, mode)
+    context, chosen, stats = assemble_context(hits, top_k)
+    return chosen, context, qvec, stats
+
 def compose_context(hits: List[Dict], sep: str = "\n\n---\n\n") -> str:
     """
     --- NEW: compone un contexto “pegado” para pasar al prompt del asistente ---
@@ -0,0 +1,172 @@
+# backend/app/services/rag_jobs.py
+# --- NEW: trabajos de reindexado en segundo plano (cola compartida en SQLite, con coalescencia) ---
+from __future__ import annotations
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+from ..config import RAG_JOB_DEBOUNCE_S, RAG_JOB_POLL_S
+from .rag import DATA_DIR, sync_index, writer_lock
+
+# en data/ y no en memoria: el id que devuelve POST /rag/reindex en un worker de uvicorn
+# se consulta en cualquier otro, y los pedidos de todos los workers se agrupan en uno
+JOBS_PATH = DATA_DIR / "rag.jobs.sqlite"
+MAX_JOBS_KEPT = 50
+
+_COLUMNS = ("id", "state", "full", "requests", "docs_dir", "embedded", "total",
+            "created_at", "started_at", "finished_at", "result", "error")
+_SELECT = f"SELECT {', '.join(_COLUMNS)} FROM jobs"
+
+_lock = threading.Lock()
+_conn: sqlite3.Connection | None = None
+_wake = threading.Event()
+_worker: Optional[threading.Thread] = None
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        JOBS_PATH.parent.mkdir(parents=True, exist_ok=True)
+        # autocommit: las lecturas-y-escrituras abren su propia transacción (ver _tx)
+        conn = sqlite3.connect(str(JOBS_PATH), check_same_thread=False, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, state TEXT NOT NULL, full INTEGER NOT NULL,"
+            " requests INTEGER NOT NULL, docs_dir TEXT NOT NULL,"
+            " embedded INTEGER NOT NULL DEFAULT 0, total INTEGER NOT NULL DEFAULT 0,"
+            " created_at REAL NOT NULL, started_at REAL, finished_at REAL, result TEXT, error TEXT)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_state ON jobs(state, created_at)")
+        _conn = conn
+    return _conn
+
+@contextmanager
+def _tx():
+    """BEGIN IMMEDIATE: leer y modificar la cola sin que otro proceso se cuele en el medio."""
+    with _lock:
+        conn = _get_conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+def _update(job_id: str, **fields) -> None:
+    sets = ", ".join(f"{k}=?" for k in fields)
+    with _lock:
+        _get_conn().execute(f"UPDATE jobs SET {sets} WHERE id=?", (*fields.values(), job_id))
+
+def _job(row) -> Dict:
+    job = dict(zip(_COLUMNS, row))
+    job["full"] = bool(job["full"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+def _snapshot(job: Dict) -> Dict:
+    return {k: v for k, v in job.items() if k != "docs_dir"}
+
+def submit_reindex(docs_dir: Path, full: bool = False) -> Dict:
+    """
+    Encola un reindexado y devuelve el trabajo. Si ya hay uno en cola (no iniciado)
+    se reutiliza: cinco borrados seguidos terminan en una sola reconstrucción, aunque
+    lleguen a workers distintos.
+    """
+    docs = str(docs_dir)
+    with _tx() as conn:
+        row = conn.execute(
+            _SELECT + " WHERE state='queued' AND docs_dir=? ORDER BY created_at LIMIT 1", (docs,)
+        ).fetchone()
+        if row is not None:
+            job_id = row[0]
+            conn.execute("UPDATE jobs SET full = full OR ?, requests = requests + 1 WHERE id=?",
+                         (int(full), job_id))
+        else:
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, state, full, requests, docs_dir, created_at)"
+                " VALUES (?, 'queued', ?, 1, ?, ?)",   # queued | running | done | failed
+                (job_id, int(full), docs, time.time()),
+            )
+            conn.execute(
+                "DELETE FROM jobs WHERE state IN ('done', 'failed') AND id NOT IN"
+                " (SELECT id FROM jobs ORDER BY created_at DESC LIMIT ?)", (MAX_JOBS_KEPT,)
+            )
+        job = _job(conn.execute(_SELECT + " WHERE id=?", (job_id,)).fetchone())
+    _ensure_worker()
+    _wake.set()
+    return _snapshot(job)
+
+def get_job(job_id: str) -> Optional[Dict]:
+    with _lock:
+        row = _get_conn().execute(_SELECT + " WHERE id=?", (job_id,)).fetchone()
+    return _snapshot(_job(row)) if row else None
+
+def last_job() -> Optional[Dict]:
+    with _lock:
+        row = _get_conn().execute(_SELECT + " ORDER BY created_at DESC LIMIT 1").fetchone()
+    return _snapshot(_job(row)) if row else None
+
+def _has_queued() -> bool:
+    with _lock:
+        return _get_conn().execute("SELECT 1 FROM jobs WHERE state='queued' LIMIT 1").fetchone() is not None
+
+def _claim() -> Optional[Dict]:
+    """
+    Pasa el trabajo más viejo de la cola a running. Llamar con el writer_lock tomado:
+    así nadie más está corriendo uno, y un "running" que quede es de un worker que murió.
+    """
+    now = time.time()
+    with _tx() as conn:
+        conn.execute("UPDATE jobs SET state='failed', error=?, finished_at=? WHERE state='running'",
+                     ("Interrumpido: el worker que lo corría terminó.", now))
+        row = conn.execute(_SELECT + " WHERE state='queued' ORDER BY created_at LIMIT 1").fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE jobs SET state='running', started_at=? WHERE id=?", (now, row[0]))
+    job = _job(row)
+    job.update(state="running", started_at=now)
+    return job
+
+def _ensure_worker() -> None:
+    global _worker
+    with _lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name="rag-reindex", daemon=True)
+            _worker.start()
+
+def _execute(job: Dict) -> None:
+    def progress(done: int, total: int) -> None:
+        _update(job["id"], embedded=done, total=total)
+
+    try:
+        # search() sigue sirviendo el índice anterior hasta que sync_index hace el swap
+        result = sync_index(Path(job["docs_dir"]), full=job["full"], progress=progress)
+        _update(job["id"], state="done", result=json.dumps(result), finished_at=time.time())
+    except Exception as e:
+        _update(job["id"], state="failed", error=str(e), finished_at=time.time())
+
+def _run() -> None:
+    # cada worker que encoló algo tiene este hilo; el que consigue el writer_lock drena
+    # la cola y los demás, al conseguirlo después, la encuentran vacía (o con lo nuevo)
+    while True:
+        _wake.wait(RAG_JOB_POLL_S)
+        _wake.clear()
+        try:
+            if not _has_queued():
+                continue
+            # ventana de espera: los pedidos que lleguen ahora se suman al mismo trabajo
+            time.sleep(RAG_JOB_DEBOUNCE_S)
+            with writer_lock():
+                job = _claim()
+                if job is not None:
+                    _execute(job)
+                    _wake.set()  # puede haber llegado otro pedido mientras corría
+        except sqlite3.Error:
+            pass  # base ocupada o inaccesible: se reintenta en la próxima vuelta
@@ -0,0 +1,117 @@
+# backend/app/services/ventas.py
+# --- NEW: rollup ventas_diarias (se suma en crear_pedido, se reconstruye con backfill) ---
+from __future__ import annotations
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import Date, func
+from sqlalchemy.orm import Session
+
+from ..database import dialect_insert
+from ..models.pedido import Pedido
+from ..models.detalle_pedido import DetallePedido
+from ..models.venta_diaria import VentaDiaria
+
+IMPORTE = DetallePedido.cantidad * DetallePedido.precio_unitario
+
+def dia(col):
+    """Día de una columna DateTime. date(col) existe en PostgreSQL y en SQLite
+    (en SQLite, CAST(... AS DATE) devuelve solo el año)."""
+    return func.date(col, type_=Date)
+
+def registrar_pedido(db: Session, pedido: Pedido, ingresos: float) -> None:
+    """
+    Suma un pedido recién creado (ya con id y fecha, vía flush) a la fila de su día.
+    No hace commit: corre dentro de la transacción de crear_pedido.
+
+    `compradores` cuenta al usuario solo si no tenía otro pedido ese día. Dos primeros
+    pedidos simultáneos del mismo usuario pueden contarlo dos veces; el backfill lo corrige.
+    """
+    dia_pedido = pedido.fecha.date()
+    inicio = datetime.combine(dia_pedido, time.min)
+    repetido = (
+        db.query(Pedido.id)
+        .filter(
+            Pedido.usuario_id == pedido.usuario_id,
+            Pedido.fecha >= inicio,
+            Pedido.fecha < inicio + timedelta(days=1),
+            Pedido.id != pedido.id,
+        )
+        .first()
+        is not None
+    )
+    nuevo = 0 if repetido else 1
+
+    insert = dialect_insert(db)
+    if insert is not None:
+        stmt = insert(VentaDiaria).values(fecha=dia_pedido, pedidos=1, ingresos=ingresos, compradores=nuevo)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[VentaDiaria.fecha],
+            set_={
+                "pedidos": VentaDiaria.pedidos + stmt.excluded.pedidos,
+                "ingresos": VentaDiaria.ingresos + stmt.excluded.ingresos,
+                "compradores": VentaDiaria.compradores + stmt.excluded.compradores,
+            },
+        )
+        db.execute(stmt)
+        return
+
+    fila = db.query(VentaDiaria).filter(VentaDiaria.fecha == dia_pedido).with_for_update().first()
+    if fila is None:
+        db.add(VentaDiaria(fecha=dia_pedido, pedidos=1, ingresos=ingresos, compradores=nuevo))
+    else:
+        fila.pedidos += 1
+        fila.ingresos += ingresos
+        fila.compradores += nuevo
+
+def backfill(db: Session, desde: Optional[date] = None, hasta: Optional[date] = None) -> int:
+    """
+    Recalcula ventas_diarias desde pedidos/detalles para [desde, hasta] (ambos opcionales,
+    inclusive) y hace commit. Devuelve la cantidad de días escritos.
+    """
+    d = dia(Pedido.fecha)
+    # ingresos por pedido primero: el join con detalles repetiría el usuario y el pedido
+    por_pedido = (
+        db.query(Pedido.id, Pedido.usuario_id, d.label("dia"),
+                 func.coalesce(func.sum(IMPORTE), 0.0).label("importe"))
+        .outerjoin(DetallePedido, DetallePedido.pedido_id == Pedido.id)
+        .filter(Pedido.fecha.isnot(None))
+        .group_by(Pedido.id, Pedido.usuario_id, d)
+    )
+    if desde is not None:
+        por_pedido = por_pedido.filter(d >= desde)
+    if hasta is not None:
+        por_pedido = por_pedido.filter(d <= hasta)
+    sub = por_pedido.subquery()
+    filas = (
+        db.query(sub.c.dia, func.count(sub.c.id), func.sum(sub.c.importe), func.count(func.distinct(sub.c.usuario_id)))
+        .group_by(sub.c.dia)
+        .all()
+    )
+
+    borrar = db.query(VentaDiaria)
+    if desde is not None:
+        borrar = borrar.filter(VentaDiaria.fecha >= desde)
+    if hasta is not None:
+        borrar = borrar.filter(VentaDiaria.fecha <= hasta)
+    borrar.delete(synchronize_session=False)
+    db.add_all([
+        VentaDiaria(fecha=f, pedidos=n, ingresos=float(total or 0.0), compradores=u)
+        for f, n, total, u in filas
+    ])
+    db.commit()
+    return len(filas)
+
+def backfill_si_vacio(db: Session) -> int:
+    """Primer arranque con la tabla nueva: la llena si está vacía y ya hay pedidos."""
+    if db.query(VentaDiaria.fecha).first() is not None or db.query(Pedido.id).first() is None:
+        return 0
+    return backfill(db)
+
+def ventas_por_dia(db: Session, desde: date, hasta: date) -> Dict[date, VentaDiaria]:
+    """{fecha: fila} de los días con ventas en [desde, hasta]."""
+    filas = db.query(VentaDiaria).filter(VentaDiaria.fecha >= desde, VentaDiaria.fecha <= hasta).all()
+    return {f.fecha: f for f in filas}
+
+def ventas_totales(db: Session) -> float:
+    return float(db.query(func.coalesce(func.sum(VentaDiaria.ingresos), 0.0)).scalar() or 0.0)
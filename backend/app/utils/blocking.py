@@ -0,0 +1,48 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Callable, Iterator, TypeVar
+
+from ..config import AI_EXECUTOR_WORKERS
+
+T = TypeVar("T")
+
+# Pool acotado y dedicado: una llamada lenta a OpenAI no bloquea el event loop
+# ni agota el threadpool por defecto que usan las rutas síncronas de FastAPI.
+_executor = ThreadPoolExecutor(max_workers=AI_EXECUTOR_WORKERS, thread_name_prefix="ai-blocking")
+
+_DONE = object()
+
+async def run_blocking(fn: Callable[..., T], *args, **kwargs) -> T:
+    """Ejecuta `fn` (bloqueante) en el pool y espera el resultado sin frenar el loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(fn, *args, **kwargs))
+
+async def iterate_blocking(make_iter: Callable[[], Iterator[T]]) -> AsyncIterator[T]:
+    """
+    Recorre un generador síncrono (p. ej. el stream de OpenAI) en el pool y entrega
+    sus elementos al loop a medida que llegan.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def pump():
+        try:
+            for item in make_iter():
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, _DONE)
+
+    fut = loop.run_in_executor(_executor, pump)
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        await fut
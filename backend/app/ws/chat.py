@@ -1,3 +1,7 @@
+import asyncio
+import time
+from typing import List, Optional, Tuple
+
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from sqlalchemy.orm import Session
 from jose import jwt
@@ -7,9 +11,12 @@ from ..database import SessionLocal
 from ..models.usuario import Usuario
 from ..models.chat import ChatSession
 from ..models.mensaje import ChatMessage
-from ..services.ai import ask_openai
-from ..services.rag import search as rag_search, compose_context
+from ..services.ai import ask_openai, stream_openai
+from ..services.rag import search_context as rag_context
+from ..services.answer_cache import cached_answer, lookup as cache_lookup, store as cache_store
+from ..services import contadores, activos
 from ..config import SECRET_KEY, ALGORITHM
+from ..utils.blocking import run_blocking, iterate_blocking
 
 router = APIRouter()
 
@@ -27,6 +34,83 @@ async def safe_send_json(ws: WebSocket, payload: dict):
     except Exception:
         pass
 
+AI_UNAVAILABLE = "El servicio de IA no está disponible."
+
+# --- Trabajo bloqueante (DB, FAISS, OpenAI): se ejecuta en el pool con run_blocking ---
+def _find_user(db: Session, correo: str):
+    return db.query(Usuario).filter(Usuario.correo == correo).first()
+
+def _open_session(db: Session, usuario_id: int) -> ChatSession:
+    sesion = ChatSession(usuario_id=usuario_id, estado="abierto")
+    db.add(sesion)
+    contadores.sumar(db, {"chats": 1})
+    activos.registrar(db, usuario_id)
+    db.commit(); db.refresh(sesion)
+    return sesion
+
+def _save_message(db: Session, sesion_id: int, role: str, content: str, usuario_id: Optional[int] = None) -> None:
+    db.add(ChatMessage(sesion_id=sesion_id, role=role, content=content))
+    contadores.sumar(db, {"mensajes": 1})
+    if usuario_id is not None:
+        activos.registrar(db, usuario_id)   # sesiones que cruzan la medianoche
+    db.commit()
+
+def _finish(db_gen, sesion: Optional[ChatSession]) -> None:
+    if sesion is not None:
+        try:
+            sesion.estado = "cerrado"
+            Session.object_session(sesion).commit()
+        except Exception:
+            pass
+    try:
+        next(db_gen)  # exhaust generator finally -> close
+    except StopIteration:
+        pass
+
+def _answer(user_text: str) -> str:
+    # respuesta con RAG/IA (tolerante a fallos)
+    try:
+        _, ctx, qvec, _ = rag_context(user_text, top_k=4)
+        answer, _ = cached_answer(
+            user_text, ctx, qvec,
+            lambda: ask_openai([{"role": "user", "content": user_text}], context=ctx),
+        )
+        return answer
+    except Exception:
+        return AI_UNAVAILABLE
+
+def _ms_since(t0: float) -> float:
+    return round((time.perf_counter() - t0) * 1000, 1)
+
+async def _stream_reply(ws: WebSocket, user_text: str, t0: float) -> Tuple[str, Optional[float]]:
+    """
+    Envía la respuesta como frames {"type":"delta"} a medida que llega del modelo.
+    Devuelve (respuesta_completa, ms hasta el primer fragmento).
+    """
+    parts: List[str] = []
+    ttft = None
+    try:
+        _, ctx, qvec, _ = await run_blocking(rag_context, user_text, top_k=4)
+        cached, _ = await run_blocking(cache_lookup, user_text, ctx, qvec)
+        if cached is not None:
+            await safe_send_json(ws, {"type": "delta", "content": cached})
+            return cached, _ms_since(t0)
+        msgs = [{"role": "user", "content": user_text}]
+        async for delta in iterate_blocking(lambda: stream_openai(msgs, context=ctx)):
+            if ttft is None:
+                ttft = _ms_since(t0)
+            parts.append(delta)
+            await safe_send_json(ws, {"type": "delta", "content": delta})
+        answer = "".join(parts).strip()
+        await run_blocking(cache_store, user_text, ctx, qvec, answer)
+        return answer, ttft
+    except Exception:
+        if parts:
+            # se cortó a mitad: se conserva lo que el usuario ya vio
+            return "".join(parts).strip(), ttft
+        await safe_send_json(ws, {"type": "delta", "content": AI_UNAVAILABLE})
+        return AI_UNAVAILABLE, _ms_since(t0)
+
 @router.websocket("/ws/support")
 async def websocket_support(websocket: WebSocket):
     # --- Auth por query param: ?token=Bearer%20<jwt> ---
@@ -45,22 +129,25 @@ async def websocket_support(websocket: WebSocket):
     # DB
     db_gen = get_db()
     db: Session = next(db_gen)
+    sesion = None
     try:
-        usuario = db.query(Usuario).filter(Usuario.correo == correo).first()
+        usuario = await run_blocking(_find_user, db, correo)
         if not usuario:
             await websocket.close(code=4401); return
 
         await websocket.accept()
 
         # crear sesión y bienvenida
-        sesion = ChatSession(usuario_id=usuario.id, estado="abierto")
-        db.add(sesion); db.commit(); db.refresh(sesion)
+        sesion = await run_blocking(_open_session, db, usuario.id)
 
         welcome = "¡Hola! Soy el asistente. ¿En qué te ayudo?"
-        db.add(ChatMessage(sesion_id=sesion.id, role="assistant", content=welcome))
-        db.commit()
+        await run_blocking(_save_message, db, sesion.id, "assistant", welcome)
         await safe_send_json(websocket, {"role": "assistant", "content": welcome})
 
+        # streaming: ?stream=1 para toda la sesión, o {"stream": true} por mensaje
+        stream_default = websocket.query_params.get("stream") in ("1", "true")
+        ttfts: List[float] = []   # tiempo hasta el primer token (ms) de cada respuesta
+
         # bucle
         while True:
             data = await websocket.receive_json()
@@ -77,39 +164,42 @@ async def websocket_support(websocket: WebSocket):
             if not user_text:
                 continue
 
+            t0 = time.perf_counter()
+
             # guarda mensaje del usuario
-            msg_user = ChatMessage(sesion_id=sesion.id, role="user", content=user_text)
-            db.add(msg_user); db.commit()
-
-            # respuesta con RAG/IA (tolerante a fallos)
-            try:
-                hits = rag_search(user_text, top_k=4)
-                ctx = compose_context(hits) if hits else ""
-                answer = ask_openai([{"role": "user", "content": user_text}], context=ctx)
-            except Exception:
-                answer = "El servicio de IA no está disponible."
-
-            db.add(ChatMessage(sesion_id=sesion.id, role="assistant", content=answer))
-            db.commit()
+            await run_blocking(_save_message, db, sesion.id, "user", user_text, usuario.id)
+
+            if data.get("stream", stream_default):
+                answer, ttft = await _stream_reply(websocket, user_text, t0)
+                if ttft is not None:
+                    ttfts.append(ttft)
+                # se persiste una sola vez, ya ensamblada
+                await run_blocking(_save_message, db, sesion.id, "assistant", answer)
+                await safe_send_json(websocket, {
+                    "type": "done",
+                    "role": "assistant",
+                    "content": answer,
+                    "ttft_ms": ttft,
+                    "session_ttft_ms": {
+                        "n": len(ttfts),
+                        "avg": round(sum(ttfts) / len(ttfts), 1) if ttfts else None,
+                        "max": max(ttfts) if ttfts else None,
+                    },
+                })
+                continue
+
+            answer = await run_blocking(_answer, user_text)
+            await run_blocking(_save_message, db, sesion.id, "assistant", answer)
             await safe_send_json(websocket, {"role": "assistant", "content": answer})
 
     except WebSocketDisconnect:
-        try:
-            sesion.estado = "cerrado"; db.commit()
-        except Exception:
-            pass
+        pass
     except Exception:
         # cierra limpio si algo truena
-        try:
-            sesion.estado = "cerrado"; db.commit()
-        except Exception:
-            pass
         try:
             await websocket.close(code=1011)
         except Exception:
             pass
     finally:
-        try:
-            next(db_gen)  # exhaust generator finally -> close
-        except StopIteration:
-            pass
\ No newline at end of file
+        # cerrar la sesión de chat y la DB en un solo paso del pool, aunque cancelen la tarea
+        await asyncio.shield(run_blocking(_finish, db_gen, sesion))
\ No newline at end of file
@@ -0,0 +1,43 @@
+"""
+Reconstruye los sketches HyperLogLog de usuarios activos por día (usuarios_activos_hll)
+a partir de pedidos y mensajes de chat. crear_pedido y el chat los mantienen al día;
+este script sirve para cargar el historial o corregir un rango.
+
+    python scripts/backfill_usuarios_activos.py                        # todo el historial
+    python scripts/backfill_usuarios_activos.py --desde 2025-01-01 --hasta 2025-01-31
+"""
+import argparse
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+CUR = Path(__file__).resolve()
+ROOT = CUR.parents[1]  # backend/
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.database import Base, engine, SessionLocal
+from app.models import (  # noqa: F401  (registra las tablas)
+    usuario, producto, pedido, detalle_pedido, chat, mensaje,
+    token_recuperacion, verificacion, comprobante, actividad_hll,
+)
+from app.services import activos
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--desde", type=date.fromisoformat, help="primer día (YYYY-MM-DD), inclusive")
+    ap.add_argument("--hasta", type=date.fromisoformat, help="último día (YYYY-MM-DD), inclusive")
+    args = ap.parse_args()
+
+    Base.metadata.create_all(bind=engine)  # crea usuarios_activos_hll si todavía no existe
+    db = SessionLocal()
+    try:
+        t0 = time.perf_counter()
+        filas = activos.backfill(db, args.desde, args.hasta)
+        print(f"usuarios_activos_hll: {filas} registros escritos en {time.perf_counter() - t0:.2f}s")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Reconstruye el rollup ventas_diarias (pedidos, ingresos y compradores por día) a partir
+de pedidos/detalles_pedido. crear_pedido lo mantiene al día; este script sirve para
+cargar el historial, corregir un rango o reconciliar después de editar pedidos a mano.
+
+    python scripts/backfill_ventas_diarias.py                          # todo el historial
+    python scripts/backfill_ventas_diarias.py --desde 2025-01-01 --hasta 2025-01-31
+"""
+import argparse
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+CUR = Path(__file__).resolve()
+ROOT = CUR.parents[1]  # backend/
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.database import Base, engine, SessionLocal
+from app.models import (  # noqa: F401  (registra las tablas)
+    usuario, producto, pedido, detalle_pedido, chat, mensaje,
+    token_recuperacion, verificacion, comprobante, venta_diaria,
+)
+from app.services import ventas
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--desde", type=date.fromisoformat, help="primer día (YYYY-MM-DD), inclusive")
+    ap.add_argument("--hasta", type=date.fromisoformat, help="último día (YYYY-MM-DD), inclusive")
+    args = ap.parse_args()
+
+    Base.metadata.create_all(bind=engine)  # crea ventas_diarias si todavía no existe
+    db = SessionLocal()
+    try:
+        t0 = time.perf_counter()
+        dias = ventas.backfill(db, args.desde, args.hasta)
+        print(f"ventas_diarias: {dias} días escritos en {time.perf_counter() - t0:.2f}s "
+              f"(ventas totales {ventas.ventas_totales(db):.2f})")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
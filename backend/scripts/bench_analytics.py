@@ -0,0 +1,149 @@
+"""
+Benchmark de los endpoints de analytics (/analytics/resumen y /analytics/dashboard).
+
+Carga una base SQLite temporal con N pedidos por día durante las últimas dos semanas
+(con detalles y mensajes de chat), para varios volúmenes, y llama a los handlers reales.
+Por cada volumen reporta la latencia media y la cantidad de sentencias SQL por llamada.
+
+La cantidad de sentencias no debe depender del volumen de datos: si cambia entre
+volúmenes (un loop por día o por pedido que volvió), el script termina con código 1.
+
+    python scripts/bench_analytics.py
+    python scripts/bench_analytics.py --orders-per-day 5,50,200 --repeat 20
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+CUR = Path(__file__).resolve()
+ROOT = CUR.parents[1]  # backend/
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+_DB_FILE = Path(tempfile.mkdtemp()) / "bench_analytics.sqlite"
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_FILE}"
+os.environ["ANALYTICS_CACHE_TTL"] = "0"   # se mide el cálculo, no la caché de respuestas
+
+from sqlalchemy import event
+
+from app.database import Base, engine, SessionLocal
+from app.models import (  # noqa: F401  (registra las tablas)
+    usuario, producto, pedido, detalle_pedido, chat, mensaje,
+    token_recuperacion, verificacion, comprobante, venta_diaria, kpi_contador, actividad_hll,
+)
+from app.models.usuario import Usuario
+from app.models.producto import Producto
+from app.models.pedido import Pedido
+from app.models.detalle_pedido import DetallePedido
+from app.models.chat import ChatSession
+from app.models.mensaje import ChatMessage
+from app.routers import analytics
+from app.services import ventas, contadores, activos
+
+ENDPOINTS = {"resumen": analytics.resumen, "dashboard": analytics.dashboard}
+
+class StatementCounter:
+    """Cuenta las sentencias que el engine manda a la base mientras está activo."""
+
+    def __init__(self):
+        self.count = 0
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine, "before_cursor_execute", self._on_execute)
+
+def seed(orders_per_day: int, users: int = 50, products: int = 20, days: int = 14) -> None:
+    """Base desde cero con `orders_per_day` pedidos por día (1-3 detalles) y un mensaje de chat
+    por pedido; después reconstruye el rollup ventas_diarias, reconcilia los contadores de KPIs
+    y arma los sketches de usuarios activos."""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    rnd = random.Random(7)
+    db = SessionLocal()
+    try:
+        db.add_all([
+            Usuario(id=i, nombre=f"u{i}", apellido="bench", correo=f"u{i}@bench.local",
+                    contrasena_hash="x", rol="cliente", is_verificado=True)
+            for i in range(1, users + 1)
+        ])
+        db.add_all([
+            Producto(id=i, nombre=f"p{i}", descripcion="bench", precio=float(i * 10), imagen_url="")
+            for i in range(1, products + 1)
+        ])
+        db.add_all([ChatSession(id=i, usuario_id=i) for i in range(1, users + 1)])
+        db.flush()
+
+        now = datetime.utcnow()
+        for d in range(days):
+            for _ in range(orders_per_day):
+                uid = rnd.randint(1, users)
+                fecha = now - timedelta(days=d, minutes=rnd.randint(0, 600))
+                detalles = [
+                    DetallePedido(producto_id=pid, cantidad=rnd.randint(1, 3), precio_unitario=float(pid * 10))
+                    for pid in rnd.sample(range(1, products + 1), rnd.randint(1, 3))
+                ]
+                db.add(Pedido(usuario_id=uid, fecha=fecha, estado=rnd.choice(["abierto", "pagado", "enviado"]),
+                              total=sum(x.cantidad * x.precio_unitario for x in detalles), detalles=detalles))
+                db.add(ChatMessage(sesion_id=uid, role="user", content="hola", creado_en=fecha))
+        db.commit()
+        ventas.backfill(db)
+        contadores.reconciliar(db)
+        activos.backfill(db)
+    finally:
+        db.close()
+
+def measure(fn, repeat: int):
+    """(ms por llamada, sentencias por llamada) del handler con una sesión nueva por llamada."""
+    db = SessionLocal()   # calentamiento
+    try:
+        fn(None, db)
+    finally:
+        db.close()
+    counts, elapsed = [], 0.0
+    for _ in range(repeat):
+        db = SessionLocal()
+        try:
+            with StatementCounter() as counter:
+                t = time.perf_counter()
+                fn(None, db)
+                elapsed += time.perf_counter() - t
+            counts.append(counter.count)
+        finally:
+            db.close()
+    return elapsed / repeat * 1000, max(counts)
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--orders-per-day", default="2,20,100", help="volúmenes a comparar")
+    ap.add_argument("--repeat", type=int, default=10, help="llamadas medidas por endpoint")
+    args = ap.parse_args()
+
+    print(f"{'pedidos/día':>11} {'endpoint':<10} {'ms':>8} {'sentencias':>10}")
+    statements = {name: set() for name in ENDPOINTS}
+    for n in (int(x) for x in args.orders_per_day.split(",")):
+        seed(n)
+        for name, fn in ENDPOINTS.items():
+            ms, count = measure(fn, args.repeat)
+            statements[name].add(count)
+            print(f"{n:>11} {name:<10} {ms:>8.2f} {count:>10}")
+
+    growing = [name for name, counts in statements.items() if len(counts) > 1]
+    if growing:
+        print(f"ERROR: la cantidad de sentencias depende del volumen en: {', '.join(growing)}")
+        sys.exit(1)
+    print("OK: cantidad de sentencias constante en todos los volúmenes")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Reporte recall vs. latencia vs. memoria de los backends FAISS del RAG (flat, ivf_flat,
+ivf_pq, hnsw), con vectores comprimidos (--codecs none,fp16,sq8,pq), dimensiones
+reducidas (--dims 512,256: truncar y renormalizar, equivalente a pedir `dimensions`
+a text-embedding-3) y rerank exacto de los candidatos (--rerank 4).
+
+Usa los vectores del snapshot publicado o, con --synthetic N, vectores
+sintéticos agrupados (no requiere OPENAI_API_KEY). El baseline es la búsqueda exacta
+(flat, float32, dimensión completa); recall@k = fracción de los k vecinos exactos que
+devuelve cada configuración (sobre min(k, N) si hay menos de k vectores).
+bytes/vec = tamaño serializado del índice / N. Si IVF/PQ no tienen vectores suficientes
+para entrenar se mide una sola vez el flat que los reemplaza ("fallback de").
+El recall con --dims solo es representativo con vectores reales (los sintéticos no
+concentran la información en las primeras dimensiones como text-embedding-3).
+
+    python scripts/bench_index.py --synthetic 20000 --dim 1536 --out data/bench_index.json
+    python scripts/bench_index.py --backends flat,hnsw --codecs none,fp16,sq8,pq --dims 0,512
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+CUR = Path(__file__).resolve()
+ROOT = CUR.parents[1]  # backend/
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.services import rag
+
+SWEEPS = {
+    "flat": [None],
+    "ivf_flat": [1, 4, 8, 16, 32],
+    "ivf_pq": [1, 4, 8, 16, 32],
+    "hnsw": [16, 32, 64, 128],
+}
+
+def synthetic_vectors(n: int, d: int, seed: int = 0) -> np.ndarray:
+    """Mezcla de gaussianas normalizada (más parecida a embeddings reales que ruido uniforme)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(8, n // 200), d)).astype("float32")
+    x = centers[rng.integers(0, len(centers), n)] + 0.6 * rng.standard_normal((n, d)).astype("float32")
+    return x / (np.linalg.norm(x, axis=1, keepdims=True) + 1e-12)
+
+def index_vectors() -> np.ndarray:
+    if not rag.ensure_loaded():
+        raise SystemExit("No hay índice en data/; usa --synthetic N")
+    # el store conserva chunks de snapshots anteriores (rollback): solo los del publicado
+    live = rag._current()[2]
+    vids = live.tolist() if live is not None else rag._store.vids()
+    exact = rag._store.get_vectors(vids)   # índice comprimido: los exactos están en el store
+    return np.vstack([exact[v] if v in exact else rag._index.reconstruct(int(v)) for v in vids])
+
+def reduce_dims(x: np.ndarray, dims: int) -> np.ndarray:
+    if not dims or dims >= x.shape[1]:
+        return x
+    r = np.ascontiguousarray(x[:, :dims])
+    return r / (np.linalg.norm(r, axis=1, keepdims=True) + 1e-12)
+
+def make_queries(x: np.ndarray, nq: int, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    q = x[rng.integers(0, len(x), nq)] + 0.05 * rng.standard_normal((nq, x.shape[1])).astype("float32")
+    return (q / (np.linalg.norm(q, axis=1, keepdims=True) + 1e-12)).astype("float32")
+
+def run_backend(kind: str, codec: str, dims: int, x: np.ndarray, q: np.ndarray,
+                truth: np.ndarray, k: int, rerank: int):
+    xr, qr = reduce_dims(x, dims), reduce_dims(q, dims)
+    spec = rag.index_spec(len(xr), xr.shape[1], kind, codec)
+    t0 = time.perf_counter()
+    index = rag._new_index(spec, xr)
+    index.add_with_ids(xr, np.arange(len(xr), dtype="int64"))
+    build_s = time.perf_counter() - t0
+    bytes_per_vec = len(faiss.serialize_index(index)) / len(xr)
+
+    # rerank (como en rag._vector_ranking): k * rerank candidatos, reordenados con los exactos
+    factors = [1] + ([rerank] if rerank > 1 and rag._is_lossy(spec) else [])
+    # sin vectores para entrenar, IVF/PQ caen a flat (o sin codec): una sola fila, marcada
+    fallback = kind if spec["type"] != kind else ("pq" if codec == "pq" and spec["codec"] != "pq" else None)
+    # con menos de k vectores hay a lo sumo N vecinos (faiss rellena con -1)
+    n_true = min(k, len(xr))
+    rows = []
+    for knob in SWEEPS[spec["type"]]:
+        for factor in factors:
+            fetch = k * factor
+            if spec["type"] in ("ivf_flat", "ivf_pq"):
+                params = faiss.SearchParametersIVF(nprobe=knob)
+            elif spec["type"] == "hnsw":
+                params = faiss.SearchParametersHNSW(efSearch=max(knob, fetch))
+            else:
+                params = None
+            lat = []
+            found = np.empty_like(truth)
+            for i in range(len(qr)):
+                t = time.perf_counter()
+                _, I = index.search(qr[i:i + 1], fetch, params=params)
+                ids = I[0]
+                if factor > 1:
+                    ids = ids[ids >= 0]
+                    ids = ids[np.argsort(-(xr[ids] @ qr[i]))]
+                    ids = np.pad(ids, (0, max(0, k - len(ids))), constant_values=-1)
+                lat.append((time.perf_counter() - t) * 1000)
+                found[i] = ids[:k]
+            recall = np.mean([
+                len(set(found[i][found[i] >= 0]) & set(truth[i][truth[i] >= 0])) / n_true
+                for i in range(len(q))
+            ])
+            rows.append({
+                "backend": spec["type"],
+                "codec": spec["codec"],
+                "dims": int(xr.shape[1]),
+                "factory": spec["factory"],
+                "knob": knob,
+                "rerank": factor if factor > 1 else None,
+                "recall_at_k": round(float(recall), 4),
+                "p50_ms": round(float(np.percentile(lat, 50)), 4),
+                "p95_ms": round(float(np.percentile(lat, 95)), 4),
+                "bytes_per_vec": round(bytes_per_vec, 1),
+                "build_s": round(build_s, 3),
+                "fallback": fallback,
+            })
+    return rows
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--synthetic", type=int, default=0, help="N vectores sintéticos (0 = índice actual)")
+    ap.add_argument("--dim", type=int, default=1536)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("-k", type=int, default=4)
+    ap.add_argument("--backends", default=",".join(rag.INDEX_TYPES))
+    ap.add_argument("--codecs", default="none", help=f"lista de {', '.join(rag.VECTOR_CODECS)}")
+    ap.add_argument("--dims", default="0", help="dimensiones a probar (0 = completas)")
+    ap.add_argument("--rerank", type=int, default=4, help="factor de candidatos para rerank exacto")
+    ap.add_argument("--out", type=Path, help="guardar resultados en JSON")
+    args = ap.parse_args()
+
+    x = synthetic_vectors(args.synthetic, args.dim) if args.synthetic else index_vectors()
+    x = np.ascontiguousarray(x, dtype="float32")
+    q = make_queries(x, args.queries)
+    exact = faiss.IndexFlatIP(x.shape[1])
+    exact.add(x)
+    _, truth = exact.search(q, args.k)
+
+    print(f"{len(x)} vectores, dim {x.shape[1]}, {len(q)} consultas, k={args.k}")
+    print(f"{'backend':<10} {'codec':<6} {'dims':>5} {'factory':<18} {'knob':>6} {'rerank':>6} "
+          f"{'recall':>8} {'p50 ms':>9} {'p95 ms':>9} {'bytes/vec':>10} {'build s':>8}  fallback de")
+    results = []
+    for dims in (int(d) for d in args.dims.split(",")):
+        for kind in args.backends.split(","):
+            for codec in args.codecs.split(","):
+                for r in run_backend(kind.strip(), codec.strip(), dims, x, q, truth, args.k, args.rerank):
+                    results.append(r)
+                    print(f"{r['backend']:<10} {r['codec']:<6} {r['dims']:>5} {r['factory']:<18} "
+                          f"{str(r['knob'] or '-'):>6} {str(r['rerank'] or '-'):>6} "
+                          f"{r['recall_at_k']:>8.3f} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} "
+                          f"{r['bytes_per_vec']:>10.1f} {r['build_s']:>8.2f}  {r['fallback'] or '-'}")
+
+    if args.out:
+        args.out.write_text(json.dumps({
+            "n": len(x), "dim": int(x.shape[1]), "queries": len(q), "k": args.k, "results": results,
+        }, indent=2), encoding="utf-8")
+        print(f"Guardado en {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Benchmark de calidad y latencia del RAG completo (chunking -> índice -> búsqueda -> contexto).
+
+Indexa un corpus de prueba (scripts/fixtures/rag_corpus) con sync_index en una carpeta
+de datos temporal y responde un set de preguntas etiquetadas (scripts/fixtures/
+rag_questions.json: [{q, relevant: [archivos]}]). Por cada combinación de tipo de índice,
+modo de búsqueda y tamaño de chunk reporta:
+
+  - recall@k: fracción de preguntas con algún archivo relevante entre los k primeros hits
+  - MRR: 1 / posición del primer hit relevante (0 si no aparece en el top-k máximo)
+  - p50 / p95 de latencia de búsqueda (ms), tiempo de construcción del índice (s)
+  - memoria: bytes del índice FAISS, tamaño del chunk store y RSS máximo del proceso
+  - tokens estimados del contexto que arma search_context (MMR + presupuesto) y del
+    contexto ingenuo (los k hits pegados tal cual), con --context-k hits
+
+Los embeddings son locales (EMBED_PROVIDER=hashing): determinista y sin red. Mide
+cambios de chunking, top-k, índice o contexto, no la calidad de text-embedding-3.
+El JSON de salida (--out) tiene orden estable para comparar dos corridas en review;
+con --baseline se imprimen las diferencias contra una corrida anterior.
+
+    python scripts/bench_rag.py --out data/bench_rag.json
+    python scripts/bench_rag.py --index-types flat,hnsw --modes hybrid,vector --chunk-sizes 400,900
+    python scripts/bench_rag.py --baseline data/bench_rag.json
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+CUR = Path(__file__).resolve()
+ROOT = CUR.parents[1]  # backend/
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# antes de importar la app: embeddings locales y parseo en el mismo proceso
+os.environ["EMBED_PROVIDER"] = "hashing"
+os.environ["INGEST_WORKERS"] = "1"
+
+import faiss
+import numpy as np
+
+from app.services import rag, doc_ingest
+from app.services.chunk_store import ChunkStore
+
+FIXTURES = CUR.parent / "fixtures"
+CORPUS_DIR = FIXTURES / "rag_corpus"
+QUESTIONS_PATH = FIXTURES / "rag_questions.json"
+METRICS = ("mrr", "p50_ms", "p95_ms", "build_s", "index_bytes", "context_tokens", "naive_context_tokens")
+
+def use_data_dir(path: Path) -> None:
+    """Apunta el RAG a una carpeta de datos vacía (no toca backend/data)."""
+    rag.INDEX_PATH = path / "rag.index"
+    rag.META_PATH = path / "rag.meta.json"
+    rag.MANIFEST_PATH = path / "rag.manifest.json"
+    rag.SNAPSHOTS_DIR = path / "rag_snapshots"
+    rag.CURRENT_PATH = rag.SNAPSHOTS_DIR / "CURRENT"
+    rag.LOCK_PATH = path / "rag.lock"
+    rag._store = ChunkStore(path / "rag.chunks.sqlite")
+    rag._publish(None, {"type": "flat"})
+    rag._generation = None
+
+def is_relevant(hit: Dict, relevant: List[str]) -> bool:
+    # un chunk deduplicado cuenta para todos los archivos que lo contienen
+    meta = hit.get("meta", {})
+    names = {s.get("filename") for s in meta.get("sources", [])} | {meta.get("filename")}
+    return bool(names & set(relevant))
+
+def run_config(corpus: Path, questions: List[Dict], index_type: str, mode: str,
+               chunk_size: int, overlap: int, ks: List[int], repeat: int, context_k: int) -> Dict:
+    use_data_dir(Path(tempfile.mkdtemp(prefix="bench_rag_")))
+    rag.RAG_INDEX_TYPE = index_type
+    doc_ingest.RAG_CHUNK_SIZE, doc_ingest.RAG_CHUNK_OVERLAP = chunk_size, overlap
+
+    t0 = time.perf_counter()
+    built = rag.sync_index(corpus, full=True)
+    build_s = time.perf_counter() - t0
+    index, info, _ = rag._current()
+
+    top = max(ks)
+    found_at: List[int] = []   # posición (1..top) del primer hit relevante; 0 = no está
+    lat: List[float] = []
+    ctx_tokens: List[int] = []
+    naive_tokens: List[int] = []
+    misses: List[str] = []
+    for item in questions:
+        rag.search(item["q"], top, mode=mode)   # calentamiento (primeras lecturas del store)
+        for _ in range(repeat):
+            t = time.perf_counter()
+            hits = rag.search(item["q"], top, mode=mode)
+            lat.append((time.perf_counter() - t) * 1000)
+        rank = next((i for i, h in enumerate(hits, start=1) if is_relevant(h, item["relevant"])), 0)
+        found_at.append(rank)
+        if not rank:
+            misses.append(item["q"])
+        _, _, _, stats = rag.search_context(item["q"], context_k, mode=mode)
+        ctx_tokens.append(stats["tokens"])
+        naive_tokens.append(stats["naive_tokens"])
+
+    row = {
+        "index_type": index_type,
+        "backend": info.get("type"),
+        "mode": mode,
+        "chunk_size": chunk_size,
+        "overlap": overlap,
+        "chunks": built["chunks"],
+        "build_s": round(build_s, 4),
+        "index_bytes": len(faiss.serialize_index(index)) if index is not None else 0,
+        "store_bytes": rag._store.path.stat().st_size,
+    }
+    for k in ks:
+        row[f"recall@{k}"] = round(float(np.mean([0 < r <= k for r in found_at])), 4)
+    row["mrr"] = round(float(np.mean([1.0 / r if r else 0.0 for r in found_at])), 4)
+    row["p50_ms"] = round(float(np.percentile(lat, 50)), 4)
+    row["p95_ms"] = round(float(np.percentile(lat, 95)), 4)
+    row["context_tokens"] = round(float(np.mean(ctx_tokens)), 1)
+    row["naive_context_tokens"] = round(float(np.mean(naive_tokens)), 1)
+    row["misses"] = misses
+    return row
+
+def row_key(r: Dict) -> tuple:
+    return (r["index_type"], r["mode"], r["chunk_size"], r["overlap"])
+
+def print_baseline(results: List[Dict], baseline_path: Path, ks: List[int]) -> None:
+    base = {row_key(r): r for r in json.loads(baseline_path.read_text(encoding="utf-8"))["results"]}
+    print(f"\nDiferencias contra {baseline_path} (actual - baseline):")
+    for r in results:
+        old = base.get(row_key(r))
+        if old is None:
+            print(f"  {row_key(r)}: sin equivalente en el baseline")
+            continue
+        parts = []
+        for m in [f"recall@{k}" for k in ks] + list(METRICS):
+            if m in old and old[m] != r[m]:
+                parts.append(f"{m} {r[m] - old[m]:+.4g}")
+        print(f"  {row_key(r)}: {', '.join(parts) or 'sin cambios'}")
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--corpus", type=Path, default=CORPUS_DIR)
+    ap.add_argument("--questions", type=Path, default=QUESTIONS_PATH)
+    ap.add_argument("--index-types", default="flat,hnsw", help=f"lista de {', '.join(rag.INDEX_TYPES)}")
+    ap.add_argument("--modes", default=",".join(rag.SEARCH_MODES))
+    ap.add_argument("--chunk-sizes", default=str(doc_ingest.RAG_CHUNK_SIZE))
+    ap.add_argument("--overlap", type=int, default=doc_ingest.RAG_CHUNK_OVERLAP)
+    ap.add_argument("-k", default="1,3,5", help="valores de k para recall@k (se busca con el mayor)")
+    ap.add_argument("--repeat", type=int, default=5, help="búsquedas medidas por pregunta")
+    ap.add_argument("--context-k", type=int, default=4, help="hits por contexto (como el chat)")
+    ap.add_argument("--out", type=Path, help="guardar resultados en JSON")
+    ap.add_argument("--baseline", type=Path, help="JSON de una corrida anterior para comparar")
+    args = ap.parse_args()
+
+    questions = json.loads(args.questions.read_text(encoding="utf-8"))
+    ks = sorted(int(k) for k in args.k.split(","))
+    print(f"{len(questions)} preguntas sobre {args.corpus} | embeddings {rag.EMBED_CACHE_MODEL}")
+    recall_cols = " ".join(f"{'R@' + str(k):>6}" for k in ks)
+    print(f"{'índice':<9} {'modo':<8} {'chunk':>6} {'chunks':>6} {recall_cols} {'MRR':>6} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'build s':>8} {'idx KB':>8} {'ctx tok':>8} {'ingenuo':>8}")
+
+    results = []
+    for chunk_size in (int(c) for c in args.chunk_sizes.split(",")):
+        for index_type in args.index_types.split(","):
+            for mode in args.modes.split(","):
+                r = run_config(args.corpus, questions, index_type.strip(), mode.strip(),
+                               chunk_size, args.overlap, ks, args.repeat, args.context_k)
+                results.append(r)
+                recalls = " ".join(f"{r[f'recall@{k}']:>6.3f}" for k in ks)
+                print(f"{r['backend']:<9} {r['mode']:<8} {r['chunk_size']:>6} {r['chunks']:>6} {recalls} "
+                      f"{r['mrr']:>6.3f} {r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f} {r['build_s']:>8.3f} "
+                      f"{r['index_bytes'] / 1024:>8.1f} {r['context_tokens']:>8.1f} "
+                      f"{r['naive_context_tokens']:>8.1f}")
+
+    # ru_maxrss está en KB en Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"RSS máximo del proceso: {peak_rss_mb:.1f} MB")
+    if args.baseline:
+        print_baseline(results, args.baseline, ks)
+
+    if args.out:
+        args.out.write_text(json.dumps({
+            "corpus": args.corpus.name, "questions": len(questions), "embedder": rag.EMBED_CACHE_MODEL,
+            "k": ks, "repeat": args.repeat, "peak_rss_mb": round(peak_rss_mb, 1), "results": results,
+        }, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"Guardado en {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Benchmark de concurrencia del WebSocket /ws/support.
+
+Abre N sesiones simultáneas contra el handler real (`websocket_support`) en un solo
+event loop, con RAG y OpenAI simulados por latencias fijas (time.sleep, igual que
+las llamadas síncronas reales). Compara:
+
+  - inline: el trabajo bloqueante corre en el event loop (comportamiento anterior)
+  - pool:   el trabajo bloqueante va al executor dedicado (run_blocking)
+
+Reporta tiempo total y el retraso máximo del event loop (lag) en cada modo.
+Usa una base SQLite temporal; no requiere OPENAI_API_KEY.
+
+    python scripts/bench_ws_concurrency.py --sessions 20 --messages 3 --llm-ms 400
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+CUR = Path(__file__).resolve()
+ROOT = CUR.parents[1]  # backend/
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+_DB_FILE = Path(tempfile.mkdtemp()) / "bench_ws.sqlite"
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_FILE}"
+
+from fastapi import WebSocketDisconnect
+from starlette.websockets import WebSocketState
+
+from app.database import Base, engine, SessionLocal
+from app.models import (  # noqa: F401  (registra las tablas)
+    usuario, producto, pedido, detalle_pedido, chat, mensaje,
+    token_recuperacion, verificacion, comprobante,
+)
+from app.services import answer_cache
+from app.utils.seguridad import crear_token_acceso
+from app.ws import chat as ws_chat
+
+class FakeWebSocket:
+    """Cliente mínimo: manda `messages` y espera la respuesta de cada uno."""
+
+    def __init__(self, token: str, messages, stream: bool):
+        self.query_params = {"token": f"Bearer {token}", "stream": "1" if stream else "0"}
+        self.application_state = WebSocketState.CONNECTING
+        self._pending = list(messages)
+        self._reply = asyncio.Event()
+        self.replies = 0
+
+    async def accept(self):
+        self.application_state = WebSocketState.CONNECTED
+
+    async def close(self, code: int = 1000):
+        self.application_state = WebSocketState.DISCONNECTED
+
+    async def send_json(self, payload):
+        if payload.get("role") == "assistant" and payload.get("type") in (None, "done"):
+            self.replies += 1
+            self._reply.set()
+
+    async def receive_json(self):
+        await self._reply.wait()   # bienvenida o respuesta anterior
+        self._reply.clear()
+        if not self._pending:
+            raise WebSocketDisconnect(code=1000)
+        return {"content": self._pending.pop(0)}
+
+def patch_services(rag_ms: float, llm_ms: float):
+    def rag_context(q, top_k=4):
+        time.sleep(rag_ms / 1000)
+        return [], "", None, {}
+
+    def ask_openai(messages, context=None):
+        time.sleep(llm_ms / 1000)
+        return "respuesta"
+
+    def stream_openai(messages, context=None):
+        for _ in range(4):
+            time.sleep(llm_ms / 4000)
+            yield "parte "
+
+    ws_chat.rag_context = rag_context
+    ws_chat.ask_openai = ask_openai
+    ws_chat.stream_openai = stream_openai
+
+def set_mode(mode: str, originals):
+    if mode == "pool":
+        ws_chat.run_blocking, ws_chat.iterate_blocking = originals
+        return
+
+    async def run_inline(fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+    async def iterate_inline(make_iter):
+        for item in make_iter():
+            yield item
+
+    ws_chat.run_blocking, ws_chat.iterate_blocking = run_inline, iterate_inline
+
+async def measure_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        t = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - t - interval)
+    return worst * 1000
+
+async def run_sessions(n: int, messages: int, stream: bool, token: str):
+    # preguntas distintas: ninguna respuesta sale de la caché de respuestas
+    clients = [
+        FakeWebSocket(token, [f"pregunta {i}.{j}" for j in range(messages)], stream) for i in range(n)
+    ]
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_lag(stop))
+    t0 = time.perf_counter()
+    await asyncio.gather(*(ws_chat.websocket_support(ws) for ws in clients))
+    wall = time.perf_counter() - t0
+    stop.set()
+    lag = await lag_task
+    replies = sum(ws.replies for ws in clients)
+    return wall, lag, replies
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sessions", type=int, default=20)
+    ap.add_argument("--messages", type=int, default=3, help="mensajes por sesión")
+    ap.add_argument("--rag-ms", type=float, default=80)
+    ap.add_argument("--llm-ms", type=float, default=400)
+    ap.add_argument("--stream", action="store_true", help="usar respuestas en streaming")
+    ap.add_argument("--out", type=Path, help="guardar resultados en JSON")
+    args = ap.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add(usuario.Usuario(nombre="Bench", apellido="WS", correo="bench@local", contrasena_hash="x"))
+    db.commit(); db.close()
+    token = crear_token_acceso({"sub": "bench@local"})
+
+    patch_services(args.rag_ms, args.llm_ms)
+    originals = (ws_chat.run_blocking, ws_chat.iterate_blocking)
+    per_msg = (args.rag_ms + args.llm_ms) / 1000
+
+    print(f"{args.sessions} sesiones x {args.messages} mensajes, "
+          f"rag {args.rag_ms:.0f} ms + llm {args.llm_ms:.0f} ms por respuesta")
+    print(f"{'modo':<8} {'total s':>9} {'serial s':>9} {'speedup':>8} {'lag máx ms':>11} {'respuestas':>11}")
+    results = []
+    for mode in ("inline", "pool"):
+        set_mode(mode, originals)
+        answer_cache.invalidate()
+        wall, lag, replies = asyncio.run(run_sessions(args.sessions, args.messages, args.stream, token))
+        serial = per_msg * args.sessions * args.messages
+        results.append({
+            "mode": mode, "wall_s": round(wall, 3), "serial_s": round(serial, 3),
+            "speedup": round(serial / wall, 2), "max_loop_lag_ms": round(lag, 1), "replies": replies,
+        })
+        r = results[-1]
+        print(f"{mode:<8} {r['wall_s']:>9.2f} {r['serial_s']:>9.2f} {r['speedup']:>8.1f} "
+              f"{r['max_loop_lag_ms']:>11.1f} {r['replies']:>11}")
+    set_mode("pool", originals)
+
+    if args.out:
+        args.out.write_text(json.dumps({
+            "sessions": args.sessions, "messages": args.messages, "rag_ms": args.rag_ms,
+            "llm_ms": args.llm_ms, "stream": args.stream, "results": results,
+        }, indent=2), encoding="utf-8")
+        print(f"Guardado en {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Chequeo de regresión: chunks deduplicados cuando se borra o modifica el archivo dueño.
+
+Un chunk casi duplicado entre varios archivos se guarda una sola vez, con el texto (y
+el vector) de su archivo representativo. Arma dos archivos que comparten un chunk, hace
+sync_index incremental tras cada escenario y verifica que:
+
+  - cada chunk vivo tiene el texto de un chunk actual de su archivo representativo,
+    con el chunk_id de ese archivo, y solo referencia archivos que existen
+  - el contenido que se fue ya no aparece en la búsqueda léxica
+  - rollback al snapshot inicial devuelve exactamente los chunks (texto, id y
+    referencias) con los que se construyó, aunque después cambiaran sus referencias
+
+Escenarios: borrar el representativo, modificar el representativo, sumar un archivo
+duplicado y borrar uno que no es el representativo (y volver al snapshot inicial).
+Embeddings locales (EMBED_PROVIDER=hashing), sin red. Termina con código 1 si algo falla.
+
+    python scripts/check_dedup_sources.py
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+CUR = Path(__file__).resolve()
+ROOT = CUR.parents[1]  # backend/
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# antes de importar la app: embeddings locales y parseo en el mismo proceso
+os.environ["EMBED_PROVIDER"] = "hashing"
+os.environ["INGEST_WORKERS"] = "1"
+
+from app.services import rag
+from app.services.doc_ingest import doc_name, file_chunks
+from bench_rag import use_data_dir
+
+# ~800 caracteres en común: los chunks de a.txt y b.txt quedan por encima del umbral de dedup
+COMMON = " ".join(f"Paso {i}: ajuste el parámetro P{i} al valor {i * 7} y confirme." for i in range(1, 14))
+
+def setup(tmp: Path) -> Path:
+    (tmp / "data").mkdir()
+    use_data_dir(tmp / "data")
+    docs = tmp / "docs"
+    docs.mkdir()
+    (docs / "a.txt").write_text(f"Manual del televisor modelo TV-100. {COMMON}", encoding="utf-8")
+    (docs / "b.txt").write_text(f"Manual del monitor modelo TV-100. {COMMON}", encoding="utf-8")
+    rag.sync_index(docs, full=True)
+    return docs
+
+def invariant_errors(docs: Path, label: str) -> List[str]:
+    """Chunks vivos cuyo texto, id o referencias no coinciden con los archivos actuales."""
+    manifest = rag._load_manifest() or {}
+    live = {vid for entry in manifest.get("files", {}).values() for vid in entry["ids"]}
+    current = {doc_name(p, docs): {c["text"]: c["id"] for c in file_chunks(p, doc_name(p, docs))}
+               for p in docs.iterdir()}
+    errors = []
+    for vid, c in rag._store.get_many(live).items():
+        meta = c["meta"]
+        owner = current.get(meta.get("filename"), {})
+        if c["text"] not in owner:
+            errors.append(f"{label}: {c['id']} tiene un texto que no está en {meta.get('filename')}")
+        elif owner[c["text"]] != c["id"]:
+            errors.append(f"{label}: {c['id']} debería ser {owner[c['text']]}")
+        missing = {s["filename"] for s in meta.get("sources", [])} - set(current)
+        if missing:
+            errors.append(f"{label}: {c['id']} referencia archivos que no existen: {sorted(missing)}")
+    return errors
+
+def gone_errors(term: str, label: str) -> List[str]:
+    hits = rag.search(term, top_k=4, mode="lexical")
+    return [f"{label}: '{term}' sigue apareciendo en {h['id']}: {h['text'][:50]!r}" for h in hits]
+
+def run(label: str, change) -> List[str]:
+    docs = setup(Path(tempfile.mkdtemp(prefix="check_dedup_")))
+    built = rag._store.get_many(rag._current()[2].tolist())
+    shared = [c for c in built.values() if len(c["meta"].get("sources", [])) > 1]
+    if not shared:
+        return [f"{label}: a.txt y b.txt no comparten ningún chunk (revisar RAG_DEDUP_THRESHOLD)"]
+    change(docs)
+    stats = rag.sync_index(docs)
+    print(f"{label}: reprocesados {stats.get('reprocessed_files')}, {stats['chunks']} chunks")
+    return invariant_errors(docs, label) + gone_errors("televisor", label)
+
+def snapshot_chunks() -> Dict[int, Dict]:
+    live = rag._current()[2]
+    return rag._store.get_many(live.tolist() if live is not None else [])
+
+def run_rollback(label: str) -> List[str]:
+    docs = setup(Path(tempfile.mkdtemp(prefix="check_dedup_")))
+    first, before = rag._read_current(), snapshot_chunks()
+    (docs / "c.txt").write_text(f"Manual del parlante modelo TV-100. {COMMON}", encoding="utf-8")
+    rag.sync_index(docs)
+    (docs / "b.txt").unlink()
+    rag.sync_index(docs)
+    errors = invariant_errors(docs, label)
+    after = snapshot_chunks()
+    if sorted(s["filename"] for c in after.values() for s in c["meta"].get("sources", [])) != ["a.txt", "c.txt"]:
+        errors.append(f"{label}: referencias inesperadas {[c['meta'] for c in after.values()]}")
+    rag.rollback(first)
+    if snapshot_chunks() != before:
+        errors.append(f"{label}: el snapshot {first} cambió después del rollback: {snapshot_chunks()}")
+    print(f"{label}: {len(after)} chunks, rollback a {first}")
+    return errors
+
+def main():
+    if not rag.RAG_DEDUP:
+        raise SystemExit("RAG_DEDUP está desactivado: no hay chunks compartidos que chequear")
+    errors = []
+    errors += run("borrar representativo", lambda docs: (docs / "a.txt").unlink())
+    errors += run("modificar representativo", lambda docs: (docs / "a.txt").write_text(
+        f"Manual del proyector modelo TV-100. {COMMON}", encoding="utf-8"))
+    errors += run_rollback("referencias y rollback")
+    for e in errors:
+        print(f"ERROR {e}")
+    if errors:
+        sys.exit(1)
+    print("OK: los chunks compartidos siguen al archivo que los contiene")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Chequeo de regresión: borrar archivos y seguir encontrando los chunks que quedan.
+
+Por cada tipo de índice (flat, ivf_flat, ivf_pq, hnsw y sus codecs) indexa un corpus
+sintético con sync_index en una carpeta de datos temporal y luego, en varias rondas,
+borra y modifica archivos y vuelve a sincronizar (incremental); al final reemplaza todos
+los archivos y después los borra todos. Después de cada paso verifica que:
+
+  - el índice tiene exactamente los vectores que lista el manifiesto
+  - cada chunk vivo se encuentra a sí mismo como primer resultado vectorial
+    (nprobe = nlist y ef_search alto: la búsqueda es prácticamente exacta)
+
+Embeddings locales (EMBED_PROVIDER=hashing), sin red. Termina con código 1 si alguna
+combinación falla.
+
+    python scripts/check_index_deletes.py
+    python scripts/check_index_deletes.py --index-types ivf_flat,ivf_pq --files 40 --rounds 4
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+CUR = Path(__file__).resolve()
+ROOT = CUR.parents[1]  # backend/
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# antes de importar la app: embeddings locales y parseo en el mismo proceso
+os.environ["EMBED_PROVIDER"] = "hashing"
+os.environ["INGEST_WORKERS"] = "1"
+
+from app.services import rag
+from bench_rag import use_data_dir
+
+CONFIGS = {
+    "flat": ("flat", "none"),
+    "flat+sq8": ("flat", "sq8"),
+    "ivf_flat": ("ivf_flat", "none"),
+    "ivf_pq": ("ivf_pq", "pq"),
+    "hnsw": ("hnsw", "none"),
+    "hnsw+sq8": ("hnsw", "sq8"),
+    "hnsw+pq": ("hnsw", "pq"),
+}
+MIN_SELF_HIT = 0.95   # los codecs con pérdida pueden confundir algún chunk casi duplicado
+
+def write_corpus(docs: Path, files: int, paragraphs: int, seed: int = 0) -> None:
+    """Archivos .txt con párrafos de palabras al azar (sin duplicados entre archivos)."""
+    rnd = random.Random(seed)
+    vocab = [f"w{i}" for i in range(3000)]
+    docs.mkdir(parents=True, exist_ok=True)
+    for i in range(files):
+        text = "\n\n".join(" ".join(rnd.choices(vocab, k=140)) for _ in range(paragraphs))
+        (docs / f"doc{i:03d}.txt").write_text(text, encoding="utf-8")
+
+def check(label: str) -> Tuple[int, int, Optional[str]]:
+    """(encontrados, vivos, error) del índice publicado."""
+    index, info, _ = rag._current()
+    manifest = rag._load_manifest() or {}
+    live = sorted({vid for entry in manifest.get("files", {}).values() for vid in entry["ids"]})
+    if index is None:
+        return 0, len(live), None if not live else f"{label}: sin índice con {len(live)} vectores vivos"
+    if index.ntotal != len(live):
+        return 0, len(live), f"{label}: ntotal={index.ntotal}, manifiesto={len(live)}"
+
+    chunks = rag._store.get_many(live)
+    found = 0
+    for vid in live:
+        qv = rag.embed_query(chunks[vid]["text"])
+        ranked = rag._vector_ranking(qv, 1, info.get("nlist"), 256)
+        if ranked and ranked[0][0] == vid:
+            found += 1
+        elif ranked and ranked[0][0] not in chunks:
+            return found, len(live), f"{label}: devolvió el id {ranked[0][0]}, que no está vivo"
+    if found < MIN_SELF_HIT * len(live):
+        return found, len(live), f"{label}: {found}/{len(live)} chunks se encuentran a sí mismos"
+    return found, len(live), None
+
+def run_config(name: str, kind: str, codec: str, files: int, paragraphs: int, rounds: int) -> List[str]:
+    tmp = Path(tempfile.mkdtemp(prefix="check_deletes_"))
+    (tmp / "data").mkdir()
+    use_data_dir(tmp / "data")
+    rag.RAG_INDEX_TYPE, rag.RAG_VECTOR_CODEC = kind, codec
+    docs = tmp / "docs"
+    write_corpus(docs, files, paragraphs)
+    rag.sync_index(docs, full=True)
+    built = rag._current()[1]
+    print(f"{name}: {built.get('factory')} ({built.get('type')}, codec {built.get('codec')})")
+
+    errors = []
+    rnd = random.Random(1)
+    for r in range(rounds + 1):
+        if r:
+            names = sorted(p.name for p in docs.iterdir())
+            for fn in rnd.sample(names, max(1, len(names) // 8)):
+                (docs / fn).unlink()
+            # un archivo modificado: se borran sus vectores y se agregan los nuevos
+            changed = docs / rnd.choice(sorted(p.name for p in docs.iterdir()))
+            changed.write_text(changed.read_text(encoding="utf-8") + "\n\nw1 w2 w3 nuevo párrafo",
+                               encoding="utf-8")
+            rag.sync_index(docs)
+        found, live, error = check(f"{name} ronda {r}")
+        print(f"  ronda {r}: {found}/{live}" + (f"  ERROR {error}" if error else ""))
+        if error:
+            errors.append(error)
+
+    # sin vectores anteriores que conservar: todos los archivos reemplazados y después borrados
+    for fn in sorted(p.name for p in docs.iterdir()):
+        (docs / fn).unlink()
+    write_corpus(docs / "nuevos", max(2, files // 4), paragraphs, seed=2)
+    for step in ("reemplazo total", "borrado total"):
+        if step == "borrado total":
+            for p in sorted((docs / "nuevos").iterdir()):
+                p.unlink()
+        rag.sync_index(docs, recursive=True)
+        found, live, error = check(f"{name} {step}")
+        print(f"  {step}: {found}/{live}" + (f"  ERROR {error}" if error else ""))
+        if error:
+            errors.append(error)
+    return errors
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--index-types", default=",".join(CONFIGS), help=f"de {', '.join(CONFIGS)}")
+    ap.add_argument("--files", type=int, default=40)
+    ap.add_argument("--paragraphs", type=int, default=20, help="párrafos por archivo (~1 chunk c/u)")
+    ap.add_argument("--rounds", type=int, default=3, help="rondas de borrado incremental")
+    args = ap.parse_args()
+
+    errors = []
+    for name in args.index_types.split(","):
+        if name not in CONFIGS:
+            raise SystemExit(f"Tipo desconocido: {name} (usa {', '.join(CONFIGS)})")
+        errors += run_config(name, *CONFIGS[name], args.files, args.paragraphs, args.rounds)
+    if errors:
+        print(f"ERROR: {len(errors)} chequeos fallaron")
+        sys.exit(1)
+    print("OK: los borrados incrementales conservan la búsqueda en todos los índices")
+
+if __name__ == "__main__":
+    main()
@@ -1,92 +1,197 @@
-import os, re, json
-from pathlib import Path
-from typing import List, Dict
-from pypdf import PdfReader
+"""
+Ingesta masiva de documentos al índice RAG, sobre app/services (mismos chunks
+{id, text, meta} y el mismo manifiesto que POST /rag/reindex).
+
+    python scripts/ingest_docs.py                       # incremental sobre backend/docs
+    python scripts/ingest_docs.py --recursive --full    # reconstruye incluyendo subcarpetas
+    python scripts/ingest_docs.py --dry-run             # chunks y tokens a embeber, sin gastar API
+    python scripts/ingest_docs.py --workers 8 --group 50
+
+Los archivos pendientes se parsean en paralelo y se embeben por grupos (--group).
+Cada grupo terminado se anota en el checkpoint (data/ingest.checkpoint.json) y los
+chunks y vectores de cada archivo quedan en data/ingest.checkpoint.d/: si la ejecución
+se corta, la siguiente retoma sin volver a parsear ni embeber esos archivos (aunque la
+caché de embeddings ya los haya descartado). Al final se publica el índice con
+sync_index a partir de esos chunks y vectores, y se borra el checkpoint.
 
+Nota: el índice es uno solo; indexar otra carpeta reemplaza los documentos de backend/docs.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
 import sys
-# Hacer que `from app.services.rag import build_index` funcione si ejecutas este script
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
 CUR = Path(__file__).resolve()
 ROOT = CUR.parents[1]  # backend/
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from app.services.rag import build_index
+from app.config import INGEST_WORKERS, INGEST_FILE_TIMEOUT, RAG_DEDUP
+from app.services import rag
+from app.services.dedup import dedup_chunks
+from app.services.doc_ingest import iter_doc_files, doc_name, file_sha256, parse_files
+from app.services.embed_cache import cached_count
+from app.services.embeddings import estimate_tokens
 
 DOCS_DIR = ROOT / "docs"
+CHECKPOINT_PATH = rag.DATA_DIR / "ingest.checkpoint.json"
 
-def read_txt_md(path: Path) -> str:
-    return path.read_text(encoding="utf-8", errors="ignore")
-
-def read_pdf(path: Path) -> str:
-    reader = PdfReader(str(path))
-    texts = []
-    for page in reader.pages:
-        t = page.extract_text() or ""
-        texts.append(t)
-    return "\n".join(texts)
-
-def clean_text(s: str) -> str:
-    s = re.sub(r"[ \t]+", " ", s)
-    s = re.sub(r"\n{3,}", "\n\n", s)
-    return s.strip()
-
-def chunk_text(text: str, max_chars=900, overlap=150) -> List[str]:
-    """Troceado simple por caracteres, conservando solapamiento."""
-    text = text.strip()
-    if not text:
-        return []
-    chunks = []
-    start = 0
-    n = len(text)
-    while start < n:
-        end = min(n, start + max_chars)
-        chunk = text[start:end]
-        chunks.append(chunk)
-        start = end - overlap
-        if start < 0:
-            start = 0
-        if start >= n:
-            break
-    return chunks
-
-def collect_chunks() -> List[Dict[str, str]]:
-    chunks: List[Dict[str, str]] = []
-    if not DOCS_DIR.exists():
-        print(f"Docs dir {DOCS_DIR} no existe, creando...")
-        DOCS_DIR.mkdir(parents=True, exist_ok=True)
-        return chunks
-
-    for path in DOCS_DIR.glob("**/*"):
-        if path.is_dir():
-            continue
-        ext = path.suffix.lower()
-        if ext not in {".pdf", ".txt", ".md"}:
-            continue
-        try:
-            if ext == ".pdf":
-                raw = read_pdf(path)
-            else:
-                raw = read_txt_md(path)
-            raw = clean_text(raw)
-            parts = chunk_text(raw, max_chars=900, overlap=150)
-            for i, ch in enumerate(parts):
-                chunks.append({
-                    "text": ch,
-                    "source": f"{path.name}#chunk{i}"
-                })
-            print(f"[OK] {path.name} -> {len(parts)} chunks")
-        except Exception as e:
-            print(f"[ERR] {path.name}: {e}")
-    return chunks
+def load_checkpoint(path: Path, docs_dir: Path) -> Dict[str, str]:
+    """{nombre: sha256} de los archivos ya embebidos en una ejecución anterior."""
+    if not path.exists():
+        return {}
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if data.get("docs_dir") != str(docs_dir):
+        return {}
+    return data.get("files", {})
+
+def save_checkpoint(path: Path, docs_dir: Path, files: Dict[str, str]) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"docs_dir": str(docs_dir), "files": files}, indent=2), encoding="utf-8")
+    os.replace(tmp, path)  # atómico: un corte a mitad no deja un checkpoint roto
+
+def entry_path(path: Path, filename: str) -> Path:
+    """Archivo del checkpoint con los chunks y vectores de `filename`."""
+    return path.with_suffix(".d") / (hashlib.sha1(filename.encode("utf-8")).hexdigest() + ".npz")
+
+def save_entry(path: Path, result: Dict, vectors: Dict[str, np.ndarray]) -> None:
+    """Guarda el resultado de parse_files de un archivo y los vectores de sus chunks."""
+    texts = list(dict.fromkeys(c["text"] for c in result["chunks"] if c["text"] in vectors))
+    vecs = np.vstack([vectors[t] for t in texts]) if texts else np.zeros((0, rag.EMBEDDER.dim), "float32")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.stem + ".tmp.npz")
+    np.savez(tmp, parsed=np.array(json.dumps(result, ensure_ascii=False)),
+             texts=np.array(texts, dtype=str), vectors=vecs)
+    os.replace(tmp, path)
+
+def load_entry(path: Path) -> Optional[Tuple[Dict, Dict[str, np.ndarray]]]:
+    """(resultado de parse_files, {texto: vector}) o None si falta o está roto."""
+    try:
+        with np.load(path) as z:
+            return json.loads(str(z["parsed"])), dict(zip(z["texts"].tolist(), z["vectors"]))
+    except (OSError, ValueError, KeyError):
+        return None
+
+def print_parsed(parsed: List[Dict]) -> None:
+    for r in parsed:
+        if r["error"]:
+            print(f"[ERR] {r['filename']}: {r['error']}")
+        else:
+            print(f"[OK] {r['filename']} -> {len(r['chunks'])} chunks ({r['parse_ms']:.0f} ms)")
+
+def unique_texts(parsed: List[Dict]) -> Tuple[List[str], int]:
+    """Textos a embeber (sin los chunks casi duplicados, igual que hará el índice)."""
+    chunks = [c for r in parsed for c in r["chunks"]]
+    removed = 0
+    if RAG_DEDUP and chunks:
+        chunks, _, _, removed = dedup_chunks(chunks)
+    return [c["text"] for c in chunks], removed
+
+def progress_line(prefix: str):
+    def progress(done: int, total: int) -> None:
+        end = "\n" if done >= total else ""
+        print(f"\r  {prefix} embebidos {done}/{total}", end=end, flush=True)
+    return progress
 
 def main():
-    ch = collect_chunks()
-    if not ch:
-        print("No hay chunks. Coloca PDFs/TXT/MD en backend/docs/ y reintenta.")
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("docs_dir", nargs="?", type=Path, default=DOCS_DIR)
+    ap.add_argument("-r", "--recursive", action=argparse.BooleanOptionalAction, default=None,
+                    help="incluir subcarpetas (por defecto, lo que usó el índice actual)")
+    ap.add_argument("--full", action="store_true", help="reconstruir todo el índice")
+    ap.add_argument("--workers", type=int, default=INGEST_WORKERS, help="procesos de parseo")
+    ap.add_argument("--timeout", type=float, default=INGEST_FILE_TIMEOUT, help="segundos máx. por archivo")
+    ap.add_argument("--group", type=int, default=20, help="archivos por grupo (un checkpoint por grupo)")
+    ap.add_argument("--dry-run", action="store_true", help="solo contar chunks/tokens, sin embeber")
+    ap.add_argument("--checkpoint", type=Path, default=CHECKPOINT_PATH)
+    args = ap.parse_args()
+
+    docs_dir = args.docs_dir.resolve()
+    if not docs_dir.exists():
+        raise SystemExit(f"No existe {docs_dir}")
+    rag.migrate_legacy_index()
+    manifest = rag._load_manifest() or {}
+    recursive = rag.docs_recursive(args.recursive)
+    paths = {doc_name(p, docs_dir): p for p in iter_doc_files(docs_dir, recursive)}
+    if not paths:
+        raise SystemExit(f"No hay PDF/TXT/MD en {docs_dir}")
+    hashes = {name: file_sha256(p) for name, p in paths.items()}
+
+    # ya indexados con el mismo contenido (salvo --full) o embebidos en una corrida anterior
+    indexed = {} if args.full else {
+        fn: e.get("sha256") for fn, e in manifest.get("files", {}).items()
+    }
+    done = {fn: h for fn, h in load_checkpoint(args.checkpoint, docs_dir).items() if hashes.get(fn) == h}
+    # chunks y vectores fijados para toda la corrida: sync_index no vuelve a parsear ni embeber
+    parsed: Dict[str, Dict] = {}
+    vectors: Dict[str, np.ndarray] = {}
+    for fn in list(done):
+        entry = load_entry(entry_path(args.checkpoint, fn))
+        if entry is None:
+            del done[fn]  # sin sus vectores se procesa de nuevo
+            continue
+        parsed[fn] = {**entry[0], "sha256": done[fn]}
+        vectors.update(entry[1])
+    pending = [fn for fn in paths if indexed.get(fn) != hashes[fn] and fn not in done]
+    print(f"{len(paths)} archivos en {docs_dir}: {len(pending)} pendientes, "
+          f"{len(done)} retomados del checkpoint, {len(paths) - len(pending) - len(done)} sin cambios")
+
+    if args.dry_run:
+        parsed = parse_files([paths[fn] for fn in pending], args.workers, args.timeout, names=pending)
+        print_parsed(parsed)
+        texts, removed = unique_texts(parsed)
+        if not rag.EMBEDDER.remote:
+            print(f"Chunks: {len(texts)} ({removed} duplicados descartados). "
+                  f"Embeddings locales ({rag.EMBED_CACHE_MODEL}): sin costo de API.")
+            return
+        cached = cached_count(texts, rag.EMBED_CACHE_MODEL)
+        tokens = sum(estimate_tokens(t) for t in texts)
+        print(f"Chunks: {len(texts)} ({removed} duplicados descartados, {cached} ya en caché). "
+              f"Tokens estimados: {tokens}. Sin llamadas a la API (--dry-run).")
         return
-    print(f"Construyendo índice con {len(ch)} chunks...")
-    build_index(ch)
-    print("Listo. Índice guardado en app/rag_store/")
+
+    t0 = time.perf_counter()
+    size = max(1, args.group)
+    for n, g in enumerate(range(0, len(pending), size), start=1):
+        group = pending[g:g + size]
+        print(f"Grupo {n}: {len(group)} archivos")
+        results = parse_files([paths[fn] for fn in group], args.workers, args.timeout, names=group)
+        print_parsed(results)
+        texts, _ = unique_texts(results)
+        if texts and rag.EMBEDDER.remote:
+            vecs = rag.embed_texts(texts, progress_line(f"grupo {n}:"), known=vectors)
+            vectors.update(zip(texts, vecs))
+        for r in results:
+            fn = r["filename"]
+            # los que fallaron también: sync_index los reporta sin esperar otro timeout
+            parsed[fn] = {**r, "sha256": hashes[fn]}
+            if not r["error"]:
+                save_entry(entry_path(args.checkpoint, fn), r, vectors)
+                done[fn] = hashes[fn]
+        save_checkpoint(args.checkpoint, docs_dir, done)
+
+    print("Publicando índice...")
+    result = rag.sync_index(docs_dir, full=args.full, progress=progress_line("índice:"),
+                            recursive=recursive, parsed=parsed, vectors=vectors)
+    if args.checkpoint.exists():
+        args.checkpoint.unlink()
+    shutil.rmtree(args.checkpoint.with_suffix(".d"), ignore_errors=True)
+    print(f"Listo en {time.perf_counter() - t0:.1f}s: {result['chunks']} chunks en el índice, "
+          f"{len(result['added_files'])} archivos nuevos/modificados, "
+          f"{len(result['removed_files'])} eliminados, "
+          f"{result.get('deduplicated', 0)} chunks duplicados colapsados.")
+    for fn, err in result.get("failed_files", {}).items():
+        print(f"[ERR] {fn}: {err}")
 
 if __name__ == "__main__":
     main()